@@ -0,0 +1,116 @@
+# Backend/benchmarks/ann_bench.py
+"""
+Recall and speed of the IVF face index against exact search.
+
+Builds synthetic face galleries (identities with several samples each, spread
+like 128-d dlib encodings: ~0.3 between photos of one person, ~1.0 between
+people) at several sizes and, for each nprobe, reports recall@1 (the index
+returns the same nearest encoding as the exact scan) and single-face
+queries/second for both.
+
+Run from Backend/:
+
+    python benchmarks/ann_bench.py
+    python benchmarks/ann_bench.py --sizes 10000,100000 --nprobe 4,16,64 --output ann.json
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+from detection.ann_index import IVFIndex      # noqa: E402
+from detection.watchlist import Watchlist     # noqa: E402
+
+DIM = 128
+CENTER_SPREAD = 1.0 / np.sqrt(2 * DIM)    # ~1.0 between two identities
+SAMPLE_SPREAD = 0.3 / np.sqrt(2 * DIM)    # ~0.3 between two photos of one identity
+
+
+def parse_args(argv=None):
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--sizes", default="1000,10000,50000,100000", help="gallery sizes (encodings)")
+    p.add_argument("--per-identity", type=int, default=10, help="samples per identity")
+    p.add_argument("--nprobe", default="1,4,8,16,32", help="nprobe values to try")
+    p.add_argument("--nlist", type=int, help="partitions (default: 4*sqrt(size))")
+    p.add_argument("--queries", type=int, default=500, help="query faces per measurement")
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--output", help="write the JSON report here")
+    return p.parse_args(argv)
+
+
+def gallery(size: int, per_identity: int, rng):
+    identities = max(1, size // per_identity)
+    centers = rng.normal(0.0, CENTER_SPREAD, (identities, DIM)).astype(np.float32)
+    labels = np.arange(size) % identities
+    vectors = centers[labels] + rng.normal(0.0, SAMPLE_SPREAD, (size, DIM)).astype(np.float32)
+    return vectors, labels, centers
+
+
+def timed_qps(fn, queries) -> float:
+    started = time.perf_counter()
+    for q in queries:
+        fn(q[None, :])
+    return len(queries) / (time.perf_counter() - started)
+
+
+def run_size(size: int, args, rng) -> dict:
+    vectors, labels, centers = gallery(size, args.per_identity, rng)
+    picked = rng.integers(0, len(centers), args.queries)
+    queries = centers[picked] + rng.normal(0.0, SAMPLE_SPREAD, (args.queries, DIM)).astype(np.float32)
+
+    exact = Watchlist(vectors, [str(i) for i in range(size)])   # one identity per row = plain nearest neighbour
+    truth = np.array([int(exact.identities[int(exact.distances(q).argmin())]) for q in queries])
+    exact_qps = timed_qps(exact.distances, queries)
+
+    started = time.perf_counter()
+    index = IVFIndex(DIM).train(vectors, nlist=args.nlist, seed=args.seed)
+    index.add(range(size), vectors)
+    build_s = time.perf_counter() - started
+
+    rows = []
+    for nprobe in (int(n) for n in args.nprobe.split(",") if n.strip()):
+        if nprobe > index.nlist:
+            continue
+        _, found = index.search(queries, k=1, nprobe=nprobe)
+        recall = float(np.mean(found[:, 0] == truth))
+        qps = timed_qps(lambda q: index.search(q, k=1, nprobe=nprobe), queries)
+        rows.append({"nprobe": nprobe, "recall_at_1": round(recall, 4), "qps": round(qps, 1),
+                     "speedup": round(qps / exact_qps, 2)})
+    return {"size": size, "nlist": index.nlist, "build_s": round(build_s, 2),
+            "exact_qps": round(exact_qps, 1), "ivf": rows}
+
+
+def print_report(results):
+    print(f"{'size':>8} {'nlist':>6} {'build s':>8} {'exact q/s':>10} {'nprobe':>7} {'recall@1':>9} {'q/s':>9} {'speedup':>8}")
+    for r in results:
+        for i, row in enumerate(r["ivf"]):
+            head = (f"{r['size']:>8} {r['nlist']:>6} {r['build_s']:>8} {r['exact_qps']:>10}" if i == 0
+                    else " " * 35)
+            print(f"{head} {row['nprobe']:>7} {row['recall_at_1']:>9.3f} {row['qps']:>9} {row['speedup']:>7}x")
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    rng = np.random.default_rng(args.seed)
+    results = []
+    for size in (int(s) for s in args.sizes.split(",") if s.strip()):
+        print(f"[ann] gallery of {size} encodings ...")
+        results.append(run_size(size, args, rng))
+    print_report(results)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"per_identity": args.per_identity, "queries": args.queries, "results": results}, f, indent=2)
+        print(f"[ann] Report written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
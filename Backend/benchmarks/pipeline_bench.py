@@ -0,0 +1,417 @@
+# Backend/benchmarks/pipeline_bench.py
+"""
+End-to-end benchmark of the crowd / weapon / criminal pipelines.
+
+Drives the real CameraStream -> FrameBus -> worker pool -> handle_* path from
+recorded clips, image directories or synthetic frames and reports, per stage,
+capture-to-result latency percentiles, model time and sustained FPS per
+camera, plus process CPU use and peak RSS. Stub models (the default) isolate
+framework overhead; --models real runs the actual YOLO weights and dlib.
+Alerts always go to counters, never to Telegram or MongoDB.
+
+Run from Backend/:
+
+    python benchmarks/pipeline_bench.py --cameras 4 --duration 30
+    python benchmarks/pipeline_bench.py --source clips/lobby.mp4 --mode unthrottled --models real
+    python benchmarks/pipeline_bench.py --output bench.json --compare baseline.json
+
+With --compare the run fails (exit code 1) when a stage's FPS drops or its
+p50/p99 latency grows by more than --tolerance against the baseline file.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+STAGES = ("crowd", "weapon", "criminal")
+
+
+# ===================== MEASUREMENTS =====================
+def percentiles(values, points=(50, 90, 99)) -> dict:
+    """{"p50": ..., "p90": ..., "p99": ..., "max": ..., "mean": ...} in milliseconds."""
+    if not values:
+        return {}
+    data = sorted(values)
+    out = {f"p{p}": round(1000 * data[min(len(data) - 1, int(round(p / 100 * (len(data) - 1))))], 2) for p in points}
+    out["max"] = round(1000 * data[-1], 2)
+    out["mean"] = round(1000 * sum(data) / len(data), 2)
+    return out
+
+
+class Recorder:
+    """Thread-safe sample store; samples before start() (the warm-up) are discarded."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.recording = False
+        self.samples = defaultdict(list)        # (kind, stage) -> seconds
+        self.results = defaultdict(int)         # (stage, camera_id) -> results applied
+
+    def start(self):
+        with self._lock:
+            self.samples.clear()
+            self.results.clear()
+            self.recording = True
+
+    def stop(self):
+        with self._lock:
+            self.recording = False
+
+    def add(self, kind, stage, seconds, camera_id=None):
+        with self._lock:
+            if not self.recording:
+                return
+            self.samples[(kind, stage)].append(seconds)
+            if camera_id is not None:
+                self.results[(stage, camera_id)] += 1
+
+
+def _timed(fn, recorder, kind, stage):
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            recorder.add(kind, stage, time.perf_counter() - started)
+    wrapper.__wrapped__ = fn
+    return wrapper
+
+
+def _handled(fn, recorder, stage):
+    """Wrap handle_<stage>(cam, result, packet): capture-to-result latency per applied result."""
+    def wrapper(cam, result, packet):
+        try:
+            return fn(cam, result, packet)
+        finally:
+            if result is not None:
+                recorder.add("e2e", stage, time.time() - packet.ts, cam.camera_id)
+    wrapper.__wrapped__ = fn
+    return wrapper
+
+
+def _peak_rss_mb(children: bool = False):
+    try:
+        import resource
+        who = resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF
+        peak = resource.getrusage(who).ru_maxrss
+        return round(peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024, 1)
+    except ImportError:
+        pass
+    try:
+        import psutil
+        if children:
+            return None
+        info = psutil.Process().memory_info()
+        return round(getattr(info, "peak_wset", info.rss) / (1024 * 1024), 1)
+    except ImportError:
+        return None
+
+
+def _git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+                             capture_output=True, text=True, timeout=5)
+        return out.stdout.strip() or None
+    except Exception:
+        return None
+
+
+# ===================== SETUP =====================
+def parse_args(argv=None):
+    p = argparse.ArgumentParser(description="Benchmark the detection pipelines end to end.")
+    p.add_argument("--cameras", type=int, default=2, help="number of simulated cameras")
+    p.add_argument("--source", action="append", default=[],
+                   help="video file / image directory / URL (repeat for several; used round-robin). Default: synthetic")
+    p.add_argument("--config", help="cameras.json to benchmark instead of --cameras/--source")
+    p.add_argument("--mode", choices=("paced", "unthrottled"), default="paced",
+                   help="paced = native frame rate, unthrottled = as fast as frames decode")
+    p.add_argument("--fps", type=float, default=25.0, help="frame rate of synthetic sources")
+    p.add_argument("--resolution", default="640x480", help="synthetic frame size WxH")
+    p.add_argument("--duration", type=float, default=20.0, help="measured seconds")
+    p.add_argument("--warmup", type=float, default=3.0, help="seconds run before measuring")
+
+    p.add_argument("--models", choices=("stub", "real"), default="stub")
+    p.add_argument("--stub-ms", default="crowd=12,weapon=10,criminal=25",
+                   help="stub model cost per frame in ms, e.g. crowd=12,weapon=10,criminal=25")
+    p.add_argument("--stub-batch-ms", type=float, default=2.0, help="fixed stub cost per model call in ms")
+    p.add_argument("--gallery-size", type=int, default=200, help="random face gallery size for --models stub")
+
+    p.add_argument("--worker-mode", choices=("threads", "processes"), help="default: WORKER_MODE")
+    p.add_argument("--workers", type=int, help="INFERENCE_WORKERS for thread mode")
+    p.add_argument("--batch", type=int, help="BATCH_MAX_SIZE (1 = no batching)")
+    p.add_argument("--batch-wait", type=float, help="BATCH_MAX_WAIT in seconds")
+    p.add_argument("--no-motion-gate", action="store_true", help="run the models on every frame")
+
+    p.add_argument("--output", help="write the JSON report here")
+    p.add_argument("--compare", help="baseline JSON report to check for regressions")
+    p.add_argument("--tolerance", type=float, default=0.10, help="allowed relative regression (0.10 = 10%%)")
+    return p.parse_args(argv)
+
+
+def _stub_costs(spec: str) -> dict:
+    costs = {stage: 10.0 for stage in STAGES}
+    for part in filter(None, (s.strip() for s in spec.split(","))):
+        name, _, value = part.partition("=")
+        costs[name.strip()] = float(value)
+    return costs
+
+
+def configure(args):
+    """Apply the CLI settings to shared_state and install the stubs; returns the patched modules."""
+    from benchmarks import stubs
+
+    stubs.install_sink_stubs()
+    costs = _stub_costs(args.stub_ms)
+    if args.models == "stub":
+        stubs.install_face_recognition_stub(per_frame_ms=costs["criminal"])
+
+    import shared_state as state
+    if args.worker_mode:
+        state.WORKER_MODE = args.worker_mode
+    if args.workers:
+        state.INFERENCE_WORKERS = args.workers
+    if args.batch is not None:
+        state.BATCH_MAX_SIZE = args.batch
+    if args.batch_wait is not None:
+        state.BATCH_MAX_WAIT = args.batch_wait
+    if args.no_motion_gate:
+        state.MOTION_DEFAULTS = {**state.MOTION_DEFAULTS, "enabled": False}
+
+    import detection.crowd as crowd
+    import detection.weapon as weapon
+    import detection.criminal as criminal
+    from detection.runtime import load_models
+    from detection.watchlist import Watchlist
+
+    if args.models == "stub":
+        if state.WORKER_MODE == "processes":
+            raise SystemExit("--worker-mode processes loads the models in child processes: use --models real")
+        state.model_factories = {
+            "crowd": lambda: stubs.StubDetector(costs["crowd"], args.stub_batch_ms, boxes=12),
+            "weapon": lambda: stubs.StubDetector(costs["weapon"], args.stub_batch_ms, boxes=2, hit_rate=0.01),
+        }
+        state.yolo_crowd_model = state.model_factories["crowd"]()
+        state.yolo_weapon_model = state.model_factories["weapon"]()
+        crowd.new_tracker = lambda frame_rate=30: stubs.StubTracker()
+        criminal.watchlist = Watchlist(*stubs.random_gallery(args.gallery_size))
+    else:
+        load_models()
+
+    return state, crowd, weapon, criminal
+
+
+def instrument(recorder, crowd, weapon, criminal):
+    """Swap timed wrappers into the stage modules (looked up at call time by the pool and steps)."""
+    crowd.detect_crowd_batch = _timed(crowd.detect_crowd_batch, recorder, "model", "crowd")
+    weapon.detect_weapon_batch = _timed(weapon.detect_weapon_batch, recorder, "model", "weapon")
+    criminal.analyze_faces = _timed(criminal.analyze_faces, recorder, "model", "criminal")
+    crowd.handle_crowd = _handled(crowd.handle_crowd, recorder, "crowd")
+    weapon.handle_weapon = _handled(weapon.handle_weapon, recorder, "weapon")
+    criminal.handle_criminal = _handled(criminal.handle_criminal, recorder, "criminal")
+
+
+def camera_configs(args) -> list:
+    from benchmarks.stubs import SyntheticSource
+    from utils.camera_utils import load_camera_config
+
+    if args.config:
+        configs = load_camera_config(args.config, [])
+        for cfg in configs:
+            cfg.setdefault("mode", args.mode)
+            cfg.setdefault("loop", True)
+        return configs
+
+    width, height = (int(v) for v in args.resolution.lower().split("x"))
+    configs = []
+    for i in range(args.cameras):
+        if args.source:
+            src, fps = args.source[i % len(args.source)], None
+        else:
+            src, fps = SyntheticSource(width, height, fps=args.fps, seed=i), None
+        configs.append({"id": f"bench{i + 1}", "src": src, "location": f"Bench {i + 1}",
+                        "mode": args.mode, "loop": True, "fps": fps})
+    return configs
+
+
+# ===================== RUN =====================
+def run(args) -> dict:
+    recorder = Recorder()
+    state, crowd, weapon, criminal = configure(args)
+    instrument(recorder, crowd, weapon, criminal)
+
+    from detection.pipeline import CameraRegistry
+    from detection.runtime import start_inference, stop_inference
+    from benchmarks import stubs
+
+    registry = CameraRegistry()
+    cameras = registry.start_all(camera_configs(args))
+    if not cameras:
+        raise SystemExit("No camera source could be opened")
+    state.camera_registry = registry
+    start_inference(cameras)
+
+    print(f"[bench] {len(cameras)} camera(s), {args.models} models, {state.WORKER_MODE} mode; "
+          f"warming up {args.warmup:g}s, measuring {args.duration:g}s ...")
+    time.sleep(args.warmup)
+
+    def snapshot():
+        return {
+            "times": os.times(),
+            "wall": time.time(),
+            "seqs": {c.camera_id: c.buses["camera"].seq for c in cameras},
+            "stats": {c.camera_id: {s: dict(v) for s, v in c.stats.items()} for c in cameras},
+            "skipped": {c.camera_id: dict(c.motion.skipped) for c in cameras},
+            "alerts": dict(stubs.alerts),
+            "batching": {n: dict(s.stats) for n, s in state.schedulers.items()},
+        }
+
+    recorder.start()
+    before = snapshot()
+    time.sleep(args.duration)
+    after = snapshot()
+    recorder.stop()
+
+    stop_inference()
+    registry.stop_all()
+    return build_report(args, state, before, after, recorder)
+
+
+def build_report(args, state, before, after, recorder) -> dict:
+    wall = after["wall"] - before["wall"]
+    t0, t1 = before["times"], after["times"]
+    cpu = (t1.user - t0.user) + (t1.system - t0.system)
+    child_cpu = (t1.children_user - t0.children_user) + (t1.children_system - t0.children_system)
+
+    cameras = {}
+    for camera_id, seq in after["seqs"].items():
+        stages = {}
+        for stage in STAGES:
+            s0 = before["stats"][camera_id].get(stage, {})
+            s1 = after["stats"][camera_id].get(stage, {})
+            results = recorder.results.get((stage, camera_id), 0)
+            stages[stage] = {
+                "fps": round(results / wall, 2),
+                "results": results,
+                "frames_taken": s1.get("processed", 0) - s0.get("processed", 0),
+                "frames_dropped": s1.get("dropped", 0) - s0.get("dropped", 0),
+                "frames_skipped": (after["skipped"][camera_id].get(stage, 0)
+                                   - before["skipped"][camera_id].get(stage, 0)),
+            }
+        cameras[camera_id] = {"capture_fps": round((seq - before["seqs"][camera_id]) / wall, 2), "stages": stages}
+
+    stages = {}
+    for stage in STAGES:
+        results = sum(recorder.results.get((stage, c), 0) for c in cameras)
+        stages[stage] = {
+            "fps_total": round(results / wall, 2),
+            "fps_per_camera": round(results / wall / max(1, len(cameras)), 2),
+            "latency_ms": percentiles(recorder.samples.get(("e2e", stage), [])),
+            "model_ms": percentiles(recorder.samples.get(("model", stage), [])),
+        }
+
+    batching = {}
+    for name, s1 in after["batching"].items():
+        s0 = before["batching"].get(name, {})
+        batches = s1["batches"] - s0.get("batches", 0)
+        frames = s1["frames"] - s0.get("frames", 0)
+        batching[name] = {
+            "batches": batches,
+            "mean_batch": round(frames / batches, 2) if batches else 0,
+            "max_batch": s1["max_batch_seen"],
+            "busy_fraction": round((s1["busy_s"] - s0.get("busy_s", 0.0)) / wall, 3),
+        }
+
+    alerts = {k: v - before["alerts"].get(k, 0) for k, v in after["alerts"].items()}
+    return {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "args": {k: v for k, v in vars(args).items() if k not in ("output", "compare")},
+            "worker_mode": state.WORKER_MODE,
+            "workers": state.INFERENCE_WORKERS,
+            "batch_max_size": state.BATCH_MAX_SIZE,
+        },
+        "system": {
+            "wall_s": round(wall, 2),
+            "cpu_percent": round(100 * cpu / wall, 1),
+            "children_cpu_percent": round(100 * child_cpu / wall, 1),
+            "peak_rss_mb": _peak_rss_mb(),
+            "children_peak_rss_mb": _peak_rss_mb(children=True),
+        },
+        "stages": stages,
+        "cameras": cameras,
+        "batching": batching,
+        "alerts": alerts,
+    }
+
+
+# ===================== REPORTING =====================
+def print_report(report: dict):
+    sysinfo = report["system"]
+    print(f"\n[bench] {report['meta']['commit'] or 'unknown commit'}  "
+          f"wall {sysinfo['wall_s']}s  cpu {sysinfo['cpu_percent']}%  peak rss {sysinfo['peak_rss_mb']} MB")
+    print(f"{'stage':<10}{'fps/cam':>9}{'fps':>9}{'p50 ms':>9}{'p90 ms':>9}{'p99 ms':>9}{'model p50':>11}")
+    for stage, s in report["stages"].items():
+        lat, model = s["latency_ms"], s["model_ms"]
+        print(f"{stage:<10}{s['fps_per_camera']:>9}{s['fps_total']:>9}{lat.get('p50', '-'):>9}"
+              f"{lat.get('p90', '-'):>9}{lat.get('p99', '-'):>9}{model.get('p50', '-'):>11}")
+    for camera_id, c in report["cameras"].items():
+        per_stage = ", ".join(f"{n} {s['fps']}fps/{s['frames_dropped']} dropped" for n, s in c["stages"].items())
+        print(f"  {camera_id}: capture {c['capture_fps']}fps; {per_stage}")
+    for name, b in report["batching"].items():
+        print(f"  batch {name}: mean {b['mean_batch']} max {b['max_batch']} busy {b['busy_fraction']:.0%}")
+
+
+def compare(report: dict, baseline: dict, tolerance: float) -> list:
+    """Regressions of `report` against `baseline` beyond `tolerance`, as readable strings."""
+    problems = []
+    for stage, s in report["stages"].items():
+        base = baseline.get("stages", {}).get(stage)
+        if not base:
+            continue
+        if base["fps_per_camera"] and s["fps_per_camera"] < base["fps_per_camera"] * (1 - tolerance):
+            problems.append(f"{stage}: fps/camera {s['fps_per_camera']} < baseline {base['fps_per_camera']}")
+        for key in ("p50", "p99"):
+            old, new = base["latency_ms"].get(key), s["latency_ms"].get(key)
+            if old and new and new > old * (1 + tolerance):
+                problems.append(f"{stage}: {key} latency {new} ms > baseline {old} ms")
+    return problems
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    report = run(args)
+    print_report(report)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"[bench] Report written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        problems = compare(report, baseline, args.tolerance)
+        for problem in problems:
+            print(f"[bench] REGRESSION {problem}")
+        if problems:
+            return 1
+        print(f"[bench] No regressions against {args.compare} (tolerance {args.tolerance:.0%})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,237 @@
+# Backend/benchmarks/stubs.py
+"""
+Stand-ins for the models and alert sinks, so a benchmark can measure the
+pipeline framework on its own (and run on machines without the weights,
+a GPU, dlib or a Telegram token).
+
+Stub models cost a configurable, fixed amount of time per call and per
+frame (time.sleep, which releases the GIL just like real inference does)
+and return results shaped like the real libraries' so the normal parsing,
+tracking and alert code still runs.
+"""
+import sys
+import threading
+import time
+import types
+from collections import Counter
+
+import numpy as np
+
+from utils.frame_sources import FrameSource
+
+
+# ===================== FRAMES =====================
+class SyntheticSource(FrameSource):
+    """Recorded-style source of generated frames: a bright square drifting over noise."""
+    live = False
+
+    def __init__(self, width: int = 640, height: int = 480, fps: float = 25.0, frames: int = 64, seed: int = 0):
+        super().__init__(f"synthetic {width}x{height}@{fps:g}")
+        rng = np.random.default_rng(seed)
+        background = rng.integers(0, 60, (height, width, 3), dtype=np.uint8)
+        size = max(8, min(width, height) // 5)
+        self.frames = []
+        for i in range(frames):
+            frame = background.copy()
+            x = int((width - size) * i / max(1, frames - 1))
+            y = (height - size) // 2
+            frame[y:y + size, x:x + size] = 220
+            self.frames.append(frame)
+        self._fps = float(fps)
+        self._index = 0
+
+    @property
+    def fps(self) -> float:
+        return self._fps
+
+    def read(self):
+        # never runs out: the clip bounces back and forth forever
+        n = len(self.frames)
+        i = self._index % (2 * n - 2) if n > 1 else 0
+        self._index += 1
+        return True, self.frames[i if i < n else 2 * n - 2 - i]
+
+
+# ===================== YOLO =====================
+class _StubTensor:
+    """Just enough of torch.Tensor for the box helpers in detection.weapon."""
+
+    def __init__(self, value):
+        self.value = np.asarray(value)
+
+    def __len__(self):
+        return len(self.value)
+
+    def __getitem__(self, i):
+        return _StubTensor(self.value[i])
+
+    def item(self):
+        return self.value.item()
+
+    def int(self):
+        return _StubTensor(self.value.astype(int))
+
+    def tolist(self):
+        return self.value.tolist()
+
+
+class _StubBox:
+    def __init__(self, row):
+        self.xyxy = _StubTensor([row[:4]])
+        self.conf = _StubTensor([row[4]])
+        self.cls = _StubTensor([int(row[5])])
+
+
+class _StubBoxes:
+    def __init__(self, rows: np.ndarray):
+        self.rows = rows
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __iter__(self):
+        return (_StubBox(row) for row in self.rows)
+
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return self.rows
+
+
+class _StubResult:
+    def __init__(self, rows):
+        self.boxes = _StubBoxes(rows)
+
+
+class StubDetector:
+    """
+    YOLO look-alike: predict() sleeps batch_ms + per_frame_ms * len(frames)
+    and returns `boxes` detections per frame. `hit_rate` of the frames also
+    get one box of class 1 (a "pistol" for the weapon stage).
+    """
+
+    def __init__(self, per_frame_ms: float = 10.0, batch_ms: float = 2.0, boxes: int = 10,
+                 names=None, hit_rate: float = 0.0, seed: int = 0):
+        self.per_frame_ms = per_frame_ms
+        self.batch_ms = batch_ms
+        self.boxes = boxes
+        self.names = names or {0: "person", 1: "pistol"}
+        self.hit_rate = hit_rate
+        self._rng = np.random.default_rng(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.frames = 0
+
+    def _rows(self, frame) -> np.ndarray:
+        h, w = frame.shape[:2]
+        with self._lock:
+            xy = self._rng.uniform(0, 0.8, (self.boxes, 2))
+            hit = self._rng.random() < self.hit_rate
+        rows = np.zeros((self.boxes + int(hit), 6), dtype=np.float32)
+        rows[:self.boxes, 0] = xy[:, 0] * w
+        rows[:self.boxes, 1] = xy[:, 1] * h
+        rows[:self.boxes, 2] = rows[:self.boxes, 0] + 0.1 * w
+        rows[:self.boxes, 3] = rows[:self.boxes, 1] + 0.2 * h
+        rows[:self.boxes, 4] = 0.8
+        if hit:
+            rows[-1] = [w * 0.4, h * 0.4, w * 0.6, h * 0.6, 0.9, 1]
+        return rows
+
+    def predict(self, frames, conf=None, verbose=False, **kwargs):
+        frames = list(frames)
+        time.sleep((self.batch_ms + self.per_frame_ms * len(frames)) / 1000.0)
+        with self._lock:
+            self.calls += 1
+            self.frames += len(frames)
+        return [_StubResult(self._rows(f)) for f in frames]
+
+    __call__ = predict
+
+
+class StubTracker:
+    """ByteTrack look-alike: every detection becomes a track, ids are stable per row index."""
+
+    def update(self, det, frame=None):
+        rows = np.asarray(det)
+        if len(rows) == 0:
+            return np.zeros((0, 8), dtype=np.float32)
+        ids = np.arange(1, len(rows) + 1, dtype=np.float32)[:, None]
+        idx = np.arange(len(rows), dtype=np.float32)[:, None]
+        return np.hstack([rows[:, :4], ids, rows[:, 4:6], idx])
+
+
+# ===================== FACE RECOGNITION =====================
+def install_face_recognition_stub(per_frame_ms: float = 20.0, faces: int = 1, seed: int = 0):
+    """
+    Put a fake `face_recognition` module in sys.modules (before detection.criminal
+    is imported). Detection costs per_frame_ms; matching runs through the real watchlist.
+    """
+    rng = np.random.default_rng(seed)
+    lock = threading.Lock()
+    module = types.ModuleType("face_recognition")
+
+    def face_locations(rgb, *args, **kwargs):
+        time.sleep(per_frame_ms / 1000.0)
+        h, w = rgb.shape[:2]
+        side = max(4, min(h, w) // 6)
+        return [(side, (i + 2) * side, 2 * side, (i + 1) * side) for i in range(faces)]
+
+    def face_encodings(rgb, locations=None, *args, **kwargs):
+        with lock:
+            return [rng.random(128) for _ in (locations or [])]
+
+    def face_distance(known, encoding):
+        if len(known) == 0:
+            return np.empty(0)
+        return np.linalg.norm(np.asarray(known) - encoding, axis=1)
+
+    module.face_locations = face_locations
+    module.face_encodings = face_encodings
+    module.face_distance = face_distance
+    sys.modules["face_recognition"] = module
+    return module
+
+
+def random_gallery(size: int = 200, seed: int = 1):
+    """(encodings, names) to load into detection.criminal when the stub is used."""
+    rng = np.random.default_rng(seed)
+    return [rng.random(128) for _ in range(size)], [f"person_{i}" for i in range(size)]
+
+
+# ===================== ALERT SINKS =====================
+alerts = Counter()
+
+
+def install_sink_stubs():
+    """
+    Replace the Telegram and MongoDB helpers with counters so a benchmark never
+    talks to the network (nor writes alert snapshots to disk); must run before
+    the detection modules are imported.
+    """
+    import shared_state as state
+    state.EVIDENCE_DIR = ""
+    telegram = types.ModuleType("utils.telegram_utils")
+    db = types.ModuleType("utils.db_utils")
+
+    def send_telegram_alert(message, frame=None, key=None):
+        alerts["telegram"] += 1
+
+    def save_alert_to_db(alert_type, notify=True, **kwargs):
+        alerts[alert_type] += 1
+        if notify:
+            alerts["telegram"] += 1
+        return True
+
+    def update_alert(alert_id, fields):
+        alerts["incidents_closed"] += 1
+
+    def alert_key(alert_type, **kwargs):
+        return alert_type
+
+    telegram.send_telegram_alert = send_telegram_alert
+    db.save_alert_to_db = save_alert_to_db
+    db.update_alert = update_alert
+    db.alert_key = alert_key
+    sys.modules["utils.telegram_utils"] = telegram
+    sys.modules["utils.db_utils"] = db
@@ -0,0 +1,223 @@
+# Backend/detection/ann_index.py
+"""
+Inverted-file (IVF) approximate nearest-neighbour index in plain NumPy.
+
+train() runs k-means over the gallery to get `nlist` centroids; every vector
+is filed under its nearest centroid. A search only scans the `nprobe` lists
+whose centroids are closest to the query, so it reads roughly
+nprobe / nlist of the gallery instead of all of it. nprobe is the
+recall/latency knob: nprobe = nlist is an exact (if slower) scan.
+
+Each list is a contiguous float32 block with spare capacity, so add() appends
+in place and remove() swaps the last row into the hole; neither retrains.
+Centroids go stale only when the gallery drifts a lot; train() again then.
+save()/load() keep the index in a single .npz file.
+"""
+import os
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple
+
+import numpy as np
+
+CHUNK = 8192   # rows per distance block while training / assigning (bounds temporary memory)
+
+
+def _sq_dist(a: np.ndarray, b: np.ndarray, b_sq: Optional[np.ndarray] = None) -> np.ndarray:
+    """(len(a), len(b)) squared Euclidean distances."""
+    b_sq = np.einsum("ij,ij->i", b, b) if b_sq is None else b_sq
+    d2 = np.einsum("ij,ij->i", a, a)[:, None] - 2.0 * (a @ b.T) + b_sq[None, :]
+    return np.maximum(d2, 0.0, out=d2)
+
+
+class _InvList:
+    def __init__(self, dim: int, capacity: int = 16):
+        self.vectors = np.empty((capacity, dim), dtype=np.float32)
+        self.sq_norms = np.empty(capacity, dtype=np.float32)
+        self.ids = np.empty(capacity, dtype=np.int64)
+        self.size = 0
+
+    def append(self, vectors: np.ndarray, ids: np.ndarray) -> int:
+        """Append rows; returns the position of the first one."""
+        start, n = self.size, len(ids)
+        if start + n > len(self.ids):
+            capacity = max(2 * len(self.ids), start + n)
+            for name in ("vectors", "sq_norms", "ids"):
+                old = getattr(self, name)
+                new = np.empty((capacity,) + old.shape[1:], dtype=old.dtype)
+                new[:start] = old[:start]
+                setattr(self, name, new)
+        self.vectors[start:start + n] = vectors
+        self.sq_norms[start:start + n] = np.einsum("ij,ij->i", vectors, vectors)
+        self.ids[start:start + n] = ids
+        self.size += n
+        return start
+
+
+class IVFIndex:
+    def __init__(self, dim: int = 128, nprobe: int = 8):
+        self.dim = int(dim)
+        self.nprobe = int(nprobe)
+        self.centroids: Optional[np.ndarray] = None
+        self._centroid_sq: Optional[np.ndarray] = None
+        self._lists = []
+        self._where: Dict[int, Tuple[int, int]] = {}   # id -> (list, position)
+
+    def __len__(self) -> int:
+        return len(self._where)
+
+    @property
+    def nlist(self) -> int:
+        return 0 if self.centroids is None else len(self.centroids)
+
+    @property
+    def trained(self) -> bool:
+        return self.centroids is not None
+
+    # ---------------- building ----------------
+    def train(self, vectors, nlist: Optional[int] = None, iters: int = 15, sample: int = 100_000, seed: int = 0):
+        """k-means on (a sample of) `vectors`; clears the lists (add() the vectors afterwards)."""
+        x = np.ascontiguousarray(vectors, dtype=np.float32)
+        if len(x) == 0:
+            raise ValueError("cannot train an index on an empty gallery")
+        rng = np.random.default_rng(seed)
+        if len(x) > sample:
+            x = x[rng.choice(len(x), sample, replace=False)]
+        k = int(nlist or max(1, round(4 * np.sqrt(len(vectors)))))
+        k = max(1, min(k, len(x)))
+
+        centroids = x[rng.choice(len(x), k, replace=False)].copy()
+        for _ in range(iters):
+            labels = self._nearest(x, centroids)
+            counts = np.bincount(labels, minlength=k)
+            sums = np.zeros_like(centroids)
+            present = np.flatnonzero(counts)
+            starts = (np.cumsum(counts) - counts)[present]
+            sums[present] = np.add.reduceat(x[np.argsort(labels, kind="stable")], starts, axis=0)
+            empty = counts == 0
+            centroids = np.where(empty[:, None], centroids, sums / np.maximum(counts, 1)[:, None]).astype(np.float32)
+            if empty.any():   # re-seed dead clusters on random points
+                centroids[empty] = x[rng.choice(len(x), int(empty.sum()), replace=False)]
+
+        self.centroids = np.ascontiguousarray(centroids)
+        self._centroid_sq = np.einsum("ij,ij->i", self.centroids, self.centroids)
+        self._lists = [_InvList(self.dim) for _ in range(k)]
+        self._where = {}
+        return self
+
+    @staticmethod
+    def _nearest(x: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+        if not len(x):
+            return np.empty(0, dtype=np.intp)
+        c_sq = np.einsum("ij,ij->i", centroids, centroids)
+        return np.concatenate([_sq_dist(x[i:i + CHUNK], centroids, c_sq).argmin(axis=1)
+                               for i in range(0, len(x), CHUNK)])
+
+    def add(self, ids: Iterable[int], vectors):
+        """Insert (or replace) vectors under integer ids."""
+        if not self.trained:
+            raise RuntimeError("train() the index before adding vectors")
+        ids = np.asarray(list(ids), dtype=np.int64)
+        x = np.ascontiguousarray(vectors, dtype=np.float32).reshape(len(ids), self.dim)
+        self.remove(i for i in ids.tolist() if i in self._where)
+        labels = self._nearest(x, self.centroids)
+        order = np.argsort(labels, kind="stable")
+        bounds = np.flatnonzero(np.diff(labels[order])) + 1
+        for group in np.split(order, bounds):
+            if not len(group):
+                continue
+            lst = int(labels[group[0]])
+            start = self._lists[lst].append(x[group], ids[group])
+            for offset, vid in enumerate(ids[group].tolist()):
+                self._where[vid] = (lst, start + offset)
+
+    def remove(self, ids: Iterable[int]) -> int:
+        """Delete vectors by id (unknown ids are ignored); returns how many were removed."""
+        removed = 0
+        for vid in list(ids):
+            where = self._where.pop(int(vid), None)
+            if where is None:
+                continue
+            lst, pos = where
+            inv = self._lists[lst]
+            last = inv.size - 1
+            if pos != last:   # move the last row into the hole
+                inv.vectors[pos] = inv.vectors[last]
+                inv.sq_norms[pos] = inv.sq_norms[last]
+                inv.ids[pos] = inv.ids[last]
+                self._where[int(inv.ids[pos])] = (lst, pos)
+            inv.size -= 1
+            removed += 1
+        return removed
+
+    # ---------------- searching ----------------
+    def search(self, queries, k: int = 1, nprobe: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        (distances, ids), both (len(queries), k), closest first; Euclidean
+        distances. Missing neighbours (tiny index) come back as inf / -1.
+        """
+        q = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        out_d = np.full((len(q), k), np.inf, dtype=np.float32)
+        out_i = np.full((len(q), k), -1, dtype=np.int64)
+        if not self.trained or not len(self) or not len(q):
+            return out_d, out_i
+
+        nprobe = max(1, min(int(nprobe or self.nprobe), self.nlist))
+        to_centroids = _sq_dist(q, self.centroids, self._centroid_sq)
+        probes = (np.argpartition(to_centroids, nprobe - 1, axis=1)[:, :nprobe]
+                  if nprobe < self.nlist else np.broadcast_to(np.arange(self.nlist), to_centroids.shape))
+
+        # scan list by list, each against all the queries that probe it
+        found_d = [[] for _ in range(len(q))]
+        found_i = [[] for _ in range(len(q))]
+        for lst in np.unique(probes):
+            inv = self._lists[lst]
+            if not inv.size:
+                continue
+            rows = np.flatnonzero((probes == lst).any(axis=1))
+            d2 = _sq_dist(q[rows], inv.vectors[:inv.size], inv.sq_norms[:inv.size])
+            for r, dist in zip(rows.tolist(), d2):
+                found_d[r].append(dist)
+                found_i[r].append(inv.ids[:inv.size])
+
+        for r in range(len(q)):
+            if not found_d[r]:
+                continue
+            dist, ids = np.concatenate(found_d[r]), np.concatenate(found_i[r])
+            n = min(k, len(dist))
+            top = np.argpartition(dist, n - 1)[:n] if n < len(dist) else np.arange(len(dist))
+            top = top[np.argsort(dist[top], kind="stable")]
+            out_d[r, :n] = np.sqrt(dist[top])
+            out_i[r, :n] = ids[top]
+        return out_d, out_i
+
+    # ---------------- persistence ----------------
+    def save(self, path, fingerprint: str = ""):
+        """Write the index to one .npz (atomically); `fingerprint` identifies the gallery it was built from."""
+        if not self.trained:
+            raise RuntimeError("nothing to save: the index is not trained")
+        sizes = np.array([inv.size for inv in self._lists], dtype=np.int64)
+        vectors = np.concatenate([inv.vectors[:inv.size] for inv in self._lists])
+        ids = np.concatenate([inv.ids[:inv.size] for inv in self._lists])
+        path = Path(path)
+        tmp = path.with_name(path.name + ".tmp")
+        with open(tmp, "wb") as f:
+            np.savez(f, version=np.array(1), dim=np.array(self.dim), nprobe=np.array(self.nprobe),
+                     centroids=self.centroids, sizes=sizes, vectors=vectors, ids=ids,
+                     fingerprint=np.array(fingerprint))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path) -> Tuple["IVFIndex", str]:
+        """(index, fingerprint) from a file written by save()."""
+        with np.load(path, allow_pickle=False) as data:
+            index = cls(int(data["dim"]), int(data["nprobe"]))
+            index.centroids = np.ascontiguousarray(data["centroids"], dtype=np.float32)
+            index._centroid_sq = np.einsum("ij,ij->i", index.centroids, index.centroids)
+            index._lists = [_InvList(index.dim) for _ in range(len(index.centroids))]
+            vectors, ids, start = data["vectors"], data["ids"], 0
+            for lst, size in enumerate(data["sizes"].tolist()):
+                if size:
+                    index._lists[lst].append(vectors[start:start + size], ids[start:start + size])
+                    index._where.update((int(v), (lst, p)) for p, v in enumerate(ids[start:start + size].tolist()))
+                start += size
+            return index, str(data["fingerprint"])
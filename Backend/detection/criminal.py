@@ -2,118 +2,143 @@
 import time
 import cv2
 import face_recognition
-import pickle
 from datetime import datetime
 import shared_state as state
-from utils.telegram_utils import send_telegram_alert
-from utils.db_utils import save_alert_to_db
+from detection.watchlist import Watchlist
+from utils.encodings_store import EncodingsStore
+from utils.metrics_utils import INFERENCE_TIME
 from pathlib import Path
 
 # Configuration
 PROCESS_EVERY_N_FRAMES = 2
 TOLERANCE = 0.45   # face distance tolerance
 
-# Load known encodings
+# Known faces: the encodings store written by models/face_recognition/encode_faces.py
 BASE_DIR = Path(__file__).resolve().parent.parent
-ENCODINGS_PATH = BASE_DIR / "models" / "face_recognition" / "encodings.pkl"
-
-known_encodings = []
-known_names = []
-try:
-    with open(str(ENCODINGS_PATH), "rb") as f:
-        data = pickle.load(f)
-        known_encodings = data.get("encodings", [])
-        known_names = data.get("names", [])
-    print(f"[criminal] Loaded {len(known_names)} known identities from encodings.")
-except Exception as e:
-    print(f"[criminal] Warning: could not load encodings.pkl: {e}")
-    # The module will still run, but no matches will be found until encodings exist.
-
-def criminal_detection():
-    """Replace violence thread: perform face recognition and raise criminal alerts."""
-    print("[INFO] Criminal (face) detection thread started.")
-    frame_count = 0
-    last_alert_time = None
-
-    while state.detection_active:
-        # Try get the weapon/processed frame, else camera direct
-        with state.frame_lock:
-            frame = state.processed_frames.get('weapon')
-
-        if frame is None:
-            ok, tmp = state.camera_manager.read()
-            if not ok:
-                time.sleep(0.01)
-                continue
-            frame = tmp.copy()
-
-        frame_count += 1
-        annotated = frame.copy()
-
-        # Only process every N frames to save CPU
-        if frame_count % PROCESS_EVERY_N_FRAMES == 0 and len(known_encodings) > 0:
-            # Resize to speed up
-            small = cv2.resize(annotated, (0, 0), fx=0.25, fy=0.25)
-            rgb_small = cv2.cvtColor(small, cv2.COLOR_BGR2RGB)
-
-            face_locations = face_recognition.face_locations(rgb_small)
-            face_encodings = face_recognition.face_encodings(rgb_small, face_locations)
-
-            # For each detected face, compare to known encodings
-            for (top, right, bottom, left), face_encoding in zip(face_locations, face_encodings):
-                distances = face_recognition.face_distance(known_encodings, face_encoding)
-                if len(distances) == 0:
-                    continue
-                best_idx = int(distances.argmin())
-                best_distance = float(distances[best_idx])
-                match = best_distance <= TOLERANCE
-                name = "Unknown"
-                if match:
-                    name = known_names[best_idx]
-
-                # scale coords back to original
-                top *= 4; right *= 4; bottom *= 4; left *= 4
-
-                color = (0, 0, 255) if name == "Unknown" else (0, 255, 0)
-                cv2.rectangle(annotated, (left, top), (right, bottom), color, 2)
-                cv2.rectangle(annotated, (left, bottom - 30), (right, bottom), color, cv2.FILLED)
-                cv2.putText(annotated, name, (left + 6, bottom - 8), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255,255,255), 2)
-
-                # If name is a *known criminal* (you decide what names are criminals — here we just treat all known names as notable)
-                if name != "Unknown":
-                    now = time.time()
-                    if not last_alert_time or (now - last_alert_time >= state.ALERT_COOLDOWN):
-                        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                        # Send telegram alert (image + message)
-                        send_telegram_alert(f"🚨 CRIMINAL IDENTIFIED: {name} at {timestamp}", annotated)
-                        # Save in DB with combined context (include crowd_count if present)
-                        try:
-                            people_count_val = None
-                            if isinstance(state.crowd_count, str):
-                                import re
-                                m = re.search(r'\d+', state.crowd_count)
-                                if m:
-                                    people_count_val = int(m.group(0))
-                            elif isinstance(state.crowd_count, int):
-                                people_count_val = state.crowd_count
-
-                            save_alert_to_db(alert_type="Criminal",
-                                             sub_type=name,
-                                             person_name=name,
-                                             confidence=1.0 - best_distance,   # higher = more confident
-                                             people_count=people_count_val)
-                        except Exception as e:
-                            print(f"[criminal] DB save error: {e}")
-
-                        with state.status_lock:
-                            state.last_violence_detection_time = now   # reuse violence timestamp fields
-                            state.last_violence_info = f"CRIMINAL: {name}"
-
-                        last_alert_time = now
-
-        # Update the "violence" output frame so frontend shows annotated frame
-        with state.frame_lock:
-            state.processed_frames['violence'] = annotated
-
-        time.sleep(0.01)
-
+GALLERY_DIR = BASE_DIR / "models" / "face_recognition" / "gallery"
+
+
+def load_watchlist(path=GALLERY_DIR) -> Watchlist:
+    """The gallery from the encodings store, memory-mapped; empty (no matches) if it cannot be read."""
+    store = EncodingsStore(path)
+    try:
+        if not store.exists():
+            print(f"[criminal] Warning: no encodings store at {path} "
+                  f"(run encode_faces.py, or `python manage.py convert-encodings` for an old encodings.pkl)")
+            return Watchlist(aggregate=state.WATCHLIST_AGGREGATE)
+        data = store.open()
+        gallery = Watchlist.from_labels(data.embeddings, data.labels, data.identities,
+                                        aggregate=state.WATCHLIST_AGGREGATE)
+        print(f"[criminal] Loaded {len(gallery)} encodings of {len(gallery.identities)} known identities.")
+    except Exception as e:
+        print(f"[criminal] Warning: could not load the encodings store {path}: {e}")
+        # The module will still run, but no matches will be found until encodings exist.
+        return Watchlist(aggregate=state.WATCHLIST_AGGREGATE)
+
+    if state.WATCHLIST_ANN_MIN and len(gallery) >= state.WATCHLIST_ANN_MIN:
+        try:
+            # kept inside the store, extended on appends, rebuilt when rows change
+            gallery.enable_index(store.path / "index.ivf.npz", nprobe=state.WATCHLIST_ANN_NPROBE)
+        except Exception as e:
+            print(f"[criminal] ANN index unavailable, using exact matching: {e}")
+    return gallery
+
+
+watchlist = load_watchlist()
+
+
+def analyze_faces(frame) -> dict:
+    """
+    Detect and identify faces; returns {"faces": [{"box": (top, right, bottom, left), "name", "distance",
+    "candidates": [(name, distance), ...]}]} with the WATCHLIST_TOP_K closest identities as candidates.
+    """
+    faces = []
+    if len(watchlist) == 0:
+        return {"faces": faces}
+
+    # Resize to speed up
+    small = cv2.resize(frame, (0, 0), fx=0.25, fy=0.25)
+    rgb_small = cv2.cvtColor(small, cv2.COLOR_BGR2RGB)
+
+    with INFERENCE_TIME.labels("criminal").time():
+        face_locations = face_recognition.face_locations(rgb_small)
+        face_encodings = face_recognition.face_encodings(rgb_small, face_locations)
+    if not face_encodings:
+        return {"faces": faces}
+
+    # Every face of the frame against the whole gallery in one matrix product
+    matches = watchlist.identify(face_encodings, TOLERANCE, k=state.WATCHLIST_TOP_K)
+    for (top, right, bottom, left), match in zip(face_locations, matches):
+        # scale coords back to original
+        faces.append({"box": (top * 4, right * 4, bottom * 4, left * 4), **match})
+
+    return {"faces": faces}
+
+
+def draw_faces(frame, result: dict):
+    for face in result["faces"]:
+        top, right, bottom, left = face["box"]
+        name = face["name"]
+        color = (0, 0, 255) if name == "Unknown" else (0, 255, 0)
+        cv2.rectangle(frame, (left, top), (right, bottom), color, 2)
+        cv2.rectangle(frame, (left, bottom - 30), (right, bottom), color, cv2.FILLED)
+        cv2.putText(frame, name, (left + 6, bottom - 8), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255,255,255), 2)
+    return frame
+
+
+def handle_criminal(cam, result, packet):
+    """Apply a face result (None = frame skipped, keep the previous faces): raise criminal alerts."""
+    # not at module level: the criminal detection process imports this file too (see handle_crowd)
+    from utils.alert_dispatcher import dispatch_alert
+    from detection.incidents import observe
+
+    if result is None:
+        return
+    cam.set_detection("criminal", packet.seq, result)
+
+    # best match per identity in this frame; each identity has its own incident
+    seen = {}
+    for face in result["faces"]:
+        name = face["name"]
+        # If name is a *known criminal* (you decide what names are criminals — here we just treat all known names as notable)
+        if name != "Unknown" and (name not in seen or face["distance"] < seen[name]["distance"]):
+            seen[name] = face
+
+    for name, face in seen.items():
+        confidence = 1.0 - face["distance"]   # higher = more confident
+        incident, opened = observe(cam, "criminal", name, confidence,
+                                   snapshot=lambda: draw_faces(packet.frame.copy(), result))
+        if opened:
+            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            # Queue telegram alert (image + message; the only place this stage draws) and the
+            # DB record with combined context (include crowd_count if present)
+            dispatch_alert(
+                "criminal",
+                f"🚨 CRIMINAL IDENTIFIED: {name} at {timestamp} ({cam.location})",
+                incident.snapshot(),
+                db=dict(alert_type="Criminal",
+                        sub_type=name,
+                        person_name=name,
+                        confidence=confidence,
+                        people_count=cam.people_count(),
+                        location=cam.location,
+                        camera=cam.camera_id,
+                        alert_id=incident.id,
+                        incident=incident.opening_doc()),
+            )
+
+        with cam.status_lock:
+            cam.last_violence_detection_time = time.time()   # reuse violence timestamp fields
+            cam.last_violence_info = f"CRIMINAL: {name}"
+
+    cam.publish_status()
+
+
+def criminal_step(cam, packet):
+    """Thread-mode stage: face recognition on one raw camera frame, every N frames."""
+    frame_count = cam.frame_counts.get("criminal", 0) + 1
+    cam.frame_counts["criminal"] = frame_count
+
+    # Only process every N frames to save CPU
+    if frame_count % PROCESS_EVERY_N_FRAMES == 0:
+        handle_criminal(cam, analyze_faces(packet.frame), packet)
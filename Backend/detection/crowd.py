@@ -2,44 +2,102 @@
 # detection/crowd.py
 # ==============================
 
-import time, cv2
+import cv2
 from datetime import datetime
 import shared_state as state
-from utils.telegram_utils import send_telegram_alert
-from utils.db_utils import save_alert_to_db
+from detection.pipeline import worker_model
+from utils.frame_bus import FramePacket
+from utils.metrics_utils import INFERENCE_TIME, BATCH_SIZE
 
-def crowd_detection():
-    print("[INFO] Crowd detection thread started.")
-    last_crowd_alert_time = None
+CROWD_ALERT_THRESHOLD = 35
+CROWD_CONF = 0.35
 
-    while state.detection_active and state.yolo_crowd_model:
-        _, frame = state.camera_manager.read()
-        if frame is None or not _:
-            time.sleep(0.01)
-            continue
 
-        annotated = frame.copy()
-        results = state.yolo_crowd_model.track(annotated, conf=0.35, persist=True, tracker="bytetrack.yaml")
+def new_tracker(frame_rate: int = 30):
+    """Fresh ByteTrack instance; each camera owns one so tracks never mix between feeds."""
+    from ultralytics.trackers.byte_tracker import BYTETracker
+    from ultralytics.utils import IterableSimpleNamespace, yaml_load
+    from ultralytics.utils.checks import check_yaml
 
-        people_count = 0
-        if results and results[0].boxes.id is not None:
-            track_ids = results[0].boxes.id.int().tolist()
-            people_count = len(set(track_ids))
+    cfg = IterableSimpleNamespace(**yaml_load(check_yaml("bytetrack.yaml")))
+    return BYTETracker(args=cfg, frame_rate=frame_rate)
 
-        if people_count > 35:
-            now = time.time()
-            if not last_crowd_alert_time or (now - last_crowd_alert_time >= state.ALERT_COOLDOWN):
-                timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                send_telegram_alert(f"🚨 CROWD ALERT at {timestamp}\nPeople Count: {people_count}", annotated)
-                save_alert_to_db(alert_type="Crowd", people_count=people_count)
-                last_crowd_alert_time = now
 
-        state.crowd_count = str(people_count)
-        annotated = results[0].plot() if results else annotated
-        cv2.putText(annotated, f'Count: {people_count}', (10,30), cv2.FONT_HERSHEY_SIMPLEX, 1, (0,255,0), 2)
+def detect_crowd_batch(model, frames) -> list:
+    """One forward pass over frames from any number of cameras."""
+    frames = list(frames)
+    BATCH_SIZE.labels("crowd").observe(len(frames))
+    with INFERENCE_TIME.labels("crowd").time():
+        return model.predict(frames, conf=CROWD_CONF, verbose=False)
 
-        with state.frame_lock:
-            state.processed_frames['crowd'] = annotated
 
-        time.sleep(0.01)
+def track_crowd(tracker, result, frame) -> dict:
+    """Feed one camera's detections to its tracker. Result is a small picklable dict."""
+    det = result.boxes.cpu().numpy()
+    tracks = tracker.update(det, frame)
 
+    # rows: x1, y1, x2, y2, track_id, score, cls, det_index
+    boxes = [[int(t[0]), int(t[1]), int(t[2]), int(t[3]), int(t[4])] for t in tracks]
+    return {"people_count": len({b[4] for b in boxes}), "boxes": boxes}
+
+
+def analyze_crowd(model, tracker, frame) -> dict:
+    """Detect and track people on a single raw frame."""
+    return track_crowd(tracker, detect_crowd_batch(model, [frame])[0], frame)
+
+
+def draw_crowd(frame, result: dict):
+    for x1, y1, x2, y2, tid in result["boxes"]:
+        cv2.rectangle(frame, (x1, y1), (x2, y2), (255, 128, 0), 2)
+        cv2.putText(frame, f"id:{tid}", (x1, max(12, y1 - 6)), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 128, 0), 2)
+    cv2.putText(frame, f'Count: {result["people_count"]}', (10,30), cv2.FONT_HERSHEY_SIMPLEX, 1, (0,255,0), 2)
+    return frame
+
+
+def handle_crowd(cam, result: dict, packet: FramePacket):
+    """Apply a crowd result: publish the detections, update the count and raise alerts."""
+    # main process only: detection processes import this module for its analyzer, without MongoDB/Telegram
+    from utils.alert_dispatcher import dispatch_alert
+    from detection.incidents import observe
+
+    people_count = result["people_count"]
+    cam.set_detection("crowd", packet.seq, result)
+
+    if people_count > CROWD_ALERT_THRESHOLD:
+        # one incident while the area stays over the threshold; the alert goes out when it opens
+        incident, opened = observe(cam, "crowd", "crowd", people_count,
+                                   snapshot=lambda: draw_crowd(packet.frame.copy(), result))
+        if opened:
+            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            dispatch_alert(
+                "crowd",
+                f"🚨 CROWD ALERT at {timestamp} ({cam.location})\nPeople Count: {people_count}", incident.snapshot(),
+                db=dict(alert_type="Crowd", people_count=people_count, location=cam.location, camera=cam.camera_id,
+                        alert_id=incident.id, incident=incident.opening_doc()),
+            )
+
+    cam.crowd_count = str(people_count)
+    cam.publish_status()
+
+
+def crowd_step(cam, packet: FramePacket):
+    """Thread-mode stage (unbatched): count people on one raw camera frame."""
+    if cam.crowd_tracker is None:
+        cam.crowd_tracker = new_tracker()
+
+    handle_crowd(cam, analyze_crowd(worker_model("crowd"), cam.crowd_tracker, packet.frame), packet)
+
+
+def crowd_submit(cam, packet: FramePacket, done):
+    """Thread-mode stage (batched): queue the frame on the crowd scheduler, finish in the callback."""
+    if cam.crowd_tracker is None:
+        cam.crowd_tracker = new_tracker()
+
+    def finish(result, error):
+        try:
+            if error is None:
+                handle_crowd(cam, track_crowd(cam.crowd_tracker, result, packet.frame), packet)
+        finally:
+            done()
+
+    state.schedulers["crowd"].submit(packet.frame, finish, ts=packet.ts)
@@ -0,0 +1,198 @@
+# Backend/detection/incidents.py
+"""
+Incident aggregation: one alert per thing seen, not one per frame.
+
+Consecutive detections of the same thing on the same camera (a weapon class,
+a recognised person, an over-threshold crowd) are merged into one open
+incident. The stage handlers call observe() on every detection; only the call
+that opens an incident should raise the alert (DB row + Telegram message),
+stored under the incident's id. When nothing has been observed for
+idle_timeout seconds (or the incident has lasted max_duration) the engine
+closes it and queues a single update of that row with the end time, frame
+count and peak value (incident.peak; the alert's own confidence / people_count
+keep their opening values, which the rollups were folded from), plus the best
+(peak) frame as incident.best when it is not the one the alert was opened with.
+
+The peak frame is rendered as soon as it becomes the peak, on the handler's
+thread: the packet's frame may be a shared-memory ring slot (process mode)
+that is reused long before the incident closes.
+
+Each key has its own incident, so one person staying in view never silences
+the alert for another.
+"""
+import atexit
+import threading
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from bson import ObjectId
+
+import shared_state as state
+from utils.alert_dispatcher import get_dispatcher, dispatch_update
+from utils.event_hub import publish
+
+
+class Incident:
+    def __init__(self, camera: str, kind: str, key: str):
+        self.id = ObjectId()
+        self.camera = camera
+        self.kind = kind
+        self.key = key
+        self.started = datetime.now()
+        self.opened_at = self.last_seen = time.time()
+        self.frames = 0
+        self.peak = None
+        self.best = None   # the rendered peak frame (an own copy, never a view of the camera's buffers)
+        self._opening_best = None
+        self.closed = False
+
+    def add(self, value: float) -> bool:
+        """Count one detection; True when it is the new peak."""
+        self.frames += 1
+        self.last_seen = time.time()
+        if self.peak is None or value > self.peak:
+            self.peak = value
+            return True
+        return False
+
+    def set_best(self, frame):
+        self.best = frame
+        if self._opening_best is None:
+            self._opening_best = frame
+
+    def snapshot(self):
+        """The best (peak) frame so far."""
+        return self.best
+
+    @property
+    def best_changed(self) -> bool:
+        """True when a later frame beat the one the opening alert was sent with."""
+        return self.best is not None and self.best is not self._opening_best
+
+    @property
+    def duration(self) -> float:
+        return max(0.0, self.last_seen - self.opened_at)
+
+    def opening_doc(self) -> Dict[str, Any]:
+        """The "incident" subdocument stored with the opening alert."""
+        return {"status": "open", "key": self.key, "started": self.started, "ended": None,
+                "frames": self.frames, "duration_s": 0.0}
+
+    def closing_fields(self) -> Dict[str, Any]:
+        return {
+            "incident.status": "closed",
+            "incident.ended": datetime.fromtimestamp(self.last_seen),
+            "incident.frames": self.frames,
+            "incident.duration_s": round(self.duration, 1),
+            "incident.peak": self.peak,
+        }
+
+    def summary(self) -> Dict[str, Any]:
+        return {"_id": self.id, "camera": self.camera, "type": self.kind, "key": self.key,
+                "started": self.started, "frames": self.frames, "peak": self.peak,
+                "duration_s": round(self.duration, 1), "status": "closed" if self.closed else "open"}
+
+
+class IncidentEngine:
+    def __init__(self, idle_timeout: float = 10.0, max_duration: float = 600.0):
+        self.idle_timeout = float(idle_timeout)
+        self.max_duration = float(max_duration)
+        self._lock = threading.Lock()
+        self._open: Dict[Tuple[str, str, str], Incident] = {}
+        self.stats = {"opened": 0, "closed": 0, "observations": 0}
+
+    def _expired(self, incident: Incident, now: float) -> bool:
+        return (now - incident.last_seen >= self.idle_timeout
+                or now - incident.opened_at >= self.max_duration)
+
+    def observe(self, camera: str, kind: str, key: str, value: float,
+                snapshot: Optional[Callable[[], Any]] = None) -> Tuple[Incident, bool]:
+        """
+        Record one detection; returns (incident, opened). `snapshot` is a
+        callable rendering a copy of the annotated frame; it is only called
+        (right away) when this detection is the new peak.
+        """
+        now = time.time()
+        ident = (camera, kind, str(key))
+        stale = None
+        with self._lock:
+            incident = self._open.get(ident)
+            if incident is not None and self._expired(incident, now):
+                stale = self._open.pop(ident)
+                incident = None
+            opened = incident is None
+            if opened:
+                incident = self._open[ident] = Incident(camera, kind, str(key))
+                self.stats["opened"] += 1
+            is_peak = incident.add(value)
+            self.stats["observations"] += 1
+        if is_peak and snapshot is not None:
+            incident.set_best(snapshot())   # outside the lock: drawing takes a while
+        if stale is not None:
+            self._close(stale)
+        return incident, opened
+
+    def sweep(self) -> List[Incident]:
+        """Close every incident that went quiet (or ran too long)."""
+        now = time.time()
+        with self._lock:
+            done = [k for k, inc in self._open.items() if self._expired(inc, now)]
+            closed = [self._open.pop(k) for k in done]
+        for incident in closed:
+            self._close(incident)
+        return closed
+
+    def close_all(self) -> List[Incident]:
+        with self._lock:
+            closed = list(self._open.values())
+            self._open.clear()
+        for incident in closed:
+            self._close(incident)
+        return closed
+
+    def open_incidents(self) -> List[Incident]:
+        with self._lock:
+            return list(self._open.values())
+
+    def _close(self, incident: Incident):
+        incident.closed = True
+        self.stats["closed"] += 1
+        # through the dispatcher, so the update is queued behind the opening insert (and the
+        # best frame is encoded and stored there, off this thread)
+        dispatch_update(incident.kind, incident.id, incident.closing_fields(),
+                        snapshot=incident.snapshot if incident.best_changed else None, camera=incident.camera)
+        publish("incident", incident.summary())
+        print(f"[incidents] Closed {incident.kind} '{incident.key}' on {incident.camera}: "
+              f"{incident.frames} frame(s), {incident.duration:.0f}s, peak {incident.peak}")
+
+
+# ===================== DEFAULT ENGINE =====================
+_lock = threading.Lock()
+
+
+def get_incident_engine() -> IncidentEngine:
+    """The process-wide engine (state.incident_engine), with its sweeper thread, created on first use."""
+    with _lock:
+        if state.incident_engine is None:
+            get_dispatcher()   # exists first, so its atexit stop runs after close_all() queued the updates
+            engine = IncidentEngine(state.INCIDENT_IDLE_TIMEOUT, state.INCIDENT_MAX_DURATION)
+
+            def sweeper():
+                while True:
+                    time.sleep(min(1.0, engine.idle_timeout / 2))
+                    try:
+                        engine.sweep()
+                    except Exception as e:
+                        print(f"[incidents] Sweep failed: {e}")
+
+            threading.Thread(target=sweeper, name="incident-sweeper", daemon=True).start()
+            atexit.register(engine.close_all)
+            state.incident_engine = engine
+        return state.incident_engine
+
+
+def observe(cam, kind: str, key: str, value: float,
+            snapshot: Optional[Callable[[], Any]] = None) -> Tuple[Incident, bool]:
+    """Shortcut for the stage handlers: observe on the default engine for camera `cam`."""
+    return get_incident_engine().observe(cam.camera_id, kind, key, value, snapshot)
@@ -0,0 +1,83 @@
+# Backend/detection/motion.py
+import threading
+from typing import Dict, Optional
+
+import cv2
+import numpy as np
+
+
+class MotionGate:
+    """
+    Cheap per-camera activity detector placed in front of the heavy models.
+
+    Each frame is downscaled to `width` pixels, blurred and compared with a
+    running-average background; if more than `sensitivity` of the pixels
+    differ by over `pixel_threshold` grey levels the camera counts as active
+    for the next `hold` seconds. Stages skip inference on inactive frames,
+    except that every stage still runs at least once per `refresh_interval`
+    seconds so counts and tracks never go stale.
+
+    The background update runs once per frame (memoised on seq), however many
+    stages ask about it.
+    """
+
+    def __init__(self, enabled: bool = True, sensitivity: float = 0.01, pixel_threshold: int = 25,
+                 width: int = 160, hold: float = 2.0, refresh_interval: float = 5.0, learning_rate: float = 0.05):
+        self.enabled = enabled
+        self.sensitivity = float(sensitivity)
+        self.pixel_threshold = int(pixel_threshold)
+        self.width = int(width)
+        self.hold = float(hold)
+        self.refresh_interval = float(refresh_interval)
+        self.learning_rate = float(learning_rate)
+
+        self._lock = threading.Lock()
+        self._background: Optional[np.ndarray] = None
+        self._checked_seq = 0
+        self._active = True
+        self._last_motion = 0.0
+        self._last_run: Dict[str, float] = {}
+        self.motion_ratio = 0.0
+        self.skipped: Dict[str, int] = {}
+
+    def _measure(self, frame) -> float:
+        h, w = frame.shape[:2]
+        small = cv2.resize(frame, (self.width, max(1, int(h * self.width / w))), interpolation=cv2.INTER_AREA)
+        gray = cv2.GaussianBlur(cv2.cvtColor(small, cv2.COLOR_BGR2GRAY), (5, 5), 0)
+
+        if self._background is None or self._background.shape != gray.shape:
+            self._background = gray.astype(np.float32)
+            return 1.0
+
+        diff = cv2.absdiff(gray, cv2.convertScaleAbs(self._background))
+        ratio = float(np.count_nonzero(diff > self.pixel_threshold)) / diff.size
+        cv2.accumulateWeighted(gray, self._background, self.learning_rate)
+        return ratio
+
+    @property
+    def active(self) -> bool:
+        """State as of the last checked frame (does not touch the background)."""
+        return not self.enabled or self._active
+
+    def is_active(self, packet) -> bool:
+        """True while the scene is moving (or was within the last `hold` seconds)."""
+        if not self.enabled:
+            return True
+        with self._lock:
+            if packet.seq > self._checked_seq:
+                self._checked_seq = packet.seq
+                self.motion_ratio = self._measure(packet.frame)
+                if self.motion_ratio >= self.sensitivity:
+                    self._last_motion = packet.ts
+                self._active = packet.ts - self._last_motion <= self.hold
+            return self._active
+
+    def should_run(self, stage: str, packet) -> bool:
+        """Decide whether `stage` runs its model on this frame; counts the skips."""
+        active = self.is_active(packet)
+        with self._lock:
+            if active or packet.ts - self._last_run.get(stage, 0.0) >= self.refresh_interval:
+                self._last_run[stage] = packet.ts
+                return True
+            self.skipped[stage] = self.skipped.get(stage, 0) + 1
+            return False
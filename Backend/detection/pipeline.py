@@ -0,0 +1,324 @@
+# Backend/detection/pipeline.py
+import queue
+import re
+import threading
+import time
+import traceback
+from collections import OrderedDict
+from typing import Callable, Dict, NamedTuple, Optional, List, Any
+
+import shared_state as state
+from detection.motion import MotionGate
+from utils.camera_utils import CameraStream
+from utils.event_hub import publish
+from utils.frame_bus import FrameBus
+from utils.metrics_utils import FRAME_WAIT, FRAMES_PROCESSED, FRAMES_DROPPED, FRAMES_SKIPPED
+
+
+# ==================================================================================
+#                              PER-CAMERA PIPELINE STATE
+# ==================================================================================
+class CameraContext:
+    """Everything the crowd/weapon/criminal pipelines keep for one camera."""
+
+    def __init__(self, camera_id: str, stream, location: Optional[str] = None, config: Optional[Dict[str, Any]] = None):
+        self.camera_id = camera_id
+        self.location = location or camera_id
+        self.config = config or {}
+        self.stream = stream
+        self.active = True
+
+        # Static scenes skip the heavy models (per-camera "motion" settings override the defaults)
+        self.motion = MotionGate(**{**state.MOTION_DEFAULTS, **self.config.get("motion", {})})
+
+        self.status_lock = threading.Lock()
+        # "camera" carries raw frames; every model reads from it
+        self.buses: Dict[str, FrameBus] = {"camera": stream.bus}
+
+        # Latest structured result per stage: stage -> (seq, result dict). Overlays are
+        # drawn from these by detection/render.py, and only for connected viewers.
+        self.detection_lock = threading.Lock()
+        self.detections: Dict[str, tuple] = {}
+        self.viewers: Dict[str, int] = {}
+
+        # --- TRACKING DATA ---
+        self.crowd_count = "0"
+        self.last_weapon_detection_time = None
+        self.last_weapon_info = "Safe"
+        self.last_weapon_confidence = None
+        self.last_violence_detection_time = None
+        self.last_violence_info = "Safe"
+        self._published_status = None   # last status pushed to /events
+
+        # --- PIPELINE STATE ---
+        # Models are shared between cameras; ByteTrack state is not.
+        self.crowd_tracker = None
+        self.frame_counts: Dict[str, int] = {}
+        self.last_seqs: Dict[str, int] = {}
+        self.stats: Dict[str, Dict[str, int]] = {}
+
+    def record_frame(self, stage: str, dropped: int):
+        stats = self.stats.setdefault(stage, {"processed": 0, "dropped": 0})
+        stats["processed"] += 1
+        stats["dropped"] += dropped
+        FRAMES_PROCESSED.labels(self.camera_id, stage).inc()
+        if dropped:
+            FRAMES_DROPPED.labels(self.camera_id, stage).inc(dropped)
+
+    def set_detection(self, stage: str, seq: int, result: Any):
+        with self.detection_lock:
+            current = self.detections.get(stage)
+            if current is None or seq >= current[0]:
+                self.detections[stage] = (seq, result)
+
+    def get_detections(self) -> Dict[str, tuple]:
+        with self.detection_lock:
+            return dict(self.detections)
+
+    def add_viewer(self, feed: str, delta: int = 1):
+        with self.detection_lock:
+            self.viewers[feed] = max(0, self.viewers.get(feed, 0) + delta)
+
+    def people_count(self) -> Optional[int]:
+        """Best-effort integer crowd count for alert context."""
+        try:
+            if isinstance(self.crowd_count, int):
+                return self.crowd_count
+            m = re.search(r"\d+", str(self.crowd_count))
+            return int(m.group(0)) if m else None
+        except Exception:
+            return None
+
+    def status(self) -> Dict[str, Any]:
+        now = time.time()
+        with self.status_lock:
+            weapon_status = self.last_weapon_info if (self.last_weapon_detection_time and now - self.last_weapon_detection_time <= state.ALERT_COOLDOWN) else "Safe"
+            violence_status = self.last_violence_info if (self.last_violence_detection_time and now - self.last_violence_detection_time <= state.ALERT_COOLDOWN) else "Safe"
+        return {
+            "crowd_count": self.crowd_count,
+            "weapon_status": weapon_status,
+            "violence_status": violence_status,
+        }
+
+    def publish_status(self):
+        """Push a "status" event to /events subscribers if the status changed since the last one."""
+        status = self.status()
+        with self.status_lock:
+            if status == self._published_status:
+                return
+            self._published_status = status
+            publish("status", {"camera": self.camera_id, **status})
+
+
+# ==================================================================================
+#                                  CAMERA REGISTRY
+# ==================================================================================
+class CameraRegistry:
+    """Ordered map of camera id -> CameraContext; the first camera is the primary one."""
+
+    def __init__(self):
+        self._cameras: "OrderedDict[str, CameraContext]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, config: Dict[str, Any]) -> CameraContext:
+        stream = CameraStream(
+            src=config["src"], name=config["id"],
+            mode=config.get("mode", "paced"), loop=config.get("loop", False), fps=config.get("fps"),
+        ).start()
+        cam = CameraContext(config["id"], stream, location=config.get("location"), config=config)
+        with self._lock:
+            self._cameras[cam.camera_id] = cam
+        print(f"[camera] {cam.camera_id} ({cam.location}) started from {config['src']}")
+        return cam
+
+    def start_all(self, configs: List[Dict[str, Any]]) -> List[CameraContext]:
+        started = []
+        for cfg in configs:
+            try:
+                started.append(self.add(cfg))
+            except Exception as e:
+                # One dead feed must not keep the rest of the site offline
+                print(f"[camera] Could not start {cfg.get('id')}: {e}")
+        return started
+
+    def get(self, camera_id: Optional[str] = None) -> Optional[CameraContext]:
+        with self._lock:
+            if camera_id is None:
+                return next(iter(self._cameras.values()), None)
+            return self._cameras.get(camera_id)
+
+    def primary(self) -> Optional[CameraContext]:
+        return self.get(None)
+
+    def all(self) -> List[CameraContext]:
+        with self._lock:
+            return list(self._cameras.values())
+
+    def ids(self) -> List[str]:
+        with self._lock:
+            return list(self._cameras.keys())
+
+    def __len__(self):
+        with self._lock:
+            return len(self._cameras)
+
+    def watch_status(self, interval: float = 0.5):
+        """
+        Background check for statuses that change without a new result (weapon /
+        violence info expiring after ALERT_COOLDOWN); the stage handlers publish
+        their own changes immediately.
+        """
+        def loop():
+            while state.detection_active:
+                for cam in self.all():
+                    if cam.active:
+                        cam.publish_status()
+                time.sleep(interval)
+
+        threading.Thread(target=loop, name="status-events", daemon=True).start()
+
+    def stop_all(self):
+        for cam in self.all():
+            cam.active = False
+            for bus in cam.buses.values():
+                bus.close()
+            try:
+                cam.stream.stop()
+            except Exception as e:
+                print(f"[camera] Error stopping {cam.camera_id}: {e}")
+
+
+# ==================================================================================
+#                               SHARED INFERENCE WORKERS
+# ==================================================================================
+_worker_local = threading.local()
+
+
+def worker_model(name: str):
+    """
+    Model instance owned by the calling worker thread.
+
+    Ultralytics predictors are not thread safe, so each worker lazily builds its
+    own copy from state.model_factories instead of sharing one instance (memory
+    grows with INFERENCE_WORKERS, hence its small default).
+    """
+    model = getattr(_worker_local, name, None)
+    if model is None:
+        model = state.model_factories[name]()
+        setattr(_worker_local, name, model)
+    return model
+
+
+class Stage(NamedTuple):
+    name: str
+    source: str                                        # bus the stage reads from
+    run: Callable[..., None]                           # run(cam, packet) or, if batched, run(cam, packet, done)
+    batched: bool = False                              # run() only submits; done() re-arms the stage
+
+
+class InferencePool:
+    """
+    Fixed set of worker threads shared by every camera.
+
+    Work items are (camera, stage) pairs. A pair is only queued when its source
+    bus holds a frame newer than the last one it processed; otherwise it is
+    parked until that bus publishes. The same camera/stage therefore never runs
+    twice at once (ByteTrack and alert cooldowns rely on that), no frame is
+    inferred twice, idle cameras cost nothing, and the number of threads stays
+    tied to the core count rather than to the number of cameras.
+
+    Frames from a static scene are skipped (see MotionGate) before any model
+    runs. Batched stages hand their frame to a BatchScheduler and return at once;
+    the pair is re-armed when the scheduler's callback calls done(), so a
+    camera still has at most one frame in flight per stage. Workers also run
+    arbitrary callables posted with post() (the schedulers' callbacks).
+    """
+
+    def __init__(self, stages: List[Stage], num_workers: int):
+        self.stages = list(stages)
+        self.num_workers = max(1, int(num_workers))
+        self._ready: "queue.Queue" = queue.Queue()
+        self._parked: Dict[tuple, List[tuple]] = {}
+        self._lock = threading.Lock()
+        self._threads: List[threading.Thread] = []
+        self.running = False
+
+    def start(self):
+        if self.running:
+            return self
+        self.running = True
+        for i in range(self.num_workers):
+            t = threading.Thread(target=self._worker, name=f"inference-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+        print(f"[pool] {self.num_workers} inference worker(s) started.")
+        return self
+
+    def add_camera(self, cam: CameraContext):
+        for source in {stage.source for stage in self.stages}:
+            cam.buses[source].subscribe(lambda packet, cam=cam, source=source: self._wake(cam, source))
+        for stage in self.stages:
+            self._schedule(cam, stage)
+
+    def stop(self):
+        self.running = False
+        for t in self._threads:
+            t.join(timeout=2)
+        self._threads = []
+
+    def post(self, fn: Callable[[], None]):
+        """Run fn on one of the workers."""
+        self._ready.put(fn)
+
+    def _schedule(self, cam: CameraContext, stage: Stage):
+        if not cam.active:
+            return  # camera removed: drop its work items
+        with self._lock:
+            if cam.buses[stage.source].seq > cam.last_seqs.get(stage.name, 0):
+                self._ready.put((cam, stage))
+            else:
+                self._parked.setdefault((cam.camera_id, stage.source), []).append((cam, stage))
+
+    def _wake(self, cam: CameraContext, source: str):
+        with self._lock:
+            for task in self._parked.pop((cam.camera_id, source), []):
+                self._ready.put(task)
+
+    def _worker(self):
+        while self.running:
+            try:
+                item = self._ready.get(timeout=0.5)
+            except queue.Empty:
+                continue
+
+            if callable(item):
+                try:
+                    item()
+                except Exception as e:
+                    print(f"[pool] posted task failed: {e}")
+                    traceback.print_exc()
+                continue
+
+            cam, stage = item
+            packet, dropped = cam.buses[stage.source].wait_for(cam.last_seqs.get(stage.name, 0), timeout=0)
+            if packet is None:
+                self._schedule(cam, stage)
+                continue
+
+            cam.last_seqs[stage.name] = packet.seq
+            cam.record_frame(stage.name, dropped)
+            if not cam.motion.should_run(stage.name, packet):
+                FRAMES_SKIPPED.labels(cam.camera_id, stage.name).inc()
+                self._schedule(cam, stage)
+                continue
+            try:
+                if stage.batched:
+                    stage.run(cam, packet, lambda cam=cam, stage=stage: self._schedule(cam, stage))
+                    continue
+                FRAME_WAIT.labels(stage.name).observe(time.time() - packet.ts)
+                stage.run(cam, packet)
+            except Exception as e:
+                print(f"[pool] {stage.name} failed on {cam.camera_id}: {e}")
+                traceback.print_exc()
+
+            self._schedule(cam, stage)
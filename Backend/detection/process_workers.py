@@ -0,0 +1,338 @@
+# Backend/detection/process_workers.py
+import multiprocessing as mp
+import os
+import queue
+import threading
+import time
+import traceback
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+import shared_state as state
+from utils.frame_bus import FramePacket
+from utils.metrics_utils import FRAME_WAIT, INFERENCE_TIME, BATCH_SIZE, FRAMES_SKIPPED
+from utils.shm_ring import SharedFrameRing
+
+
+# ==================================================================================
+#                         CHILD PROCESS SIDE (no Flask, no alerts)
+# ==================================================================================
+def _build_analyzer(stage: str, settings: dict) -> Callable[[List[tuple]], List[Optional[dict]]]:
+    """
+    Return analyze(items) -> results for items [(camera_id, frame), ...].
+
+    The YOLO stages run one batched forward pass over all items; a None result
+    means the frame was deliberately skipped.
+    """
+    if stage == "crowd":
+        from ultralytics import YOLO
+        from detection.crowd import detect_crowd_batch, track_crowd, new_tracker
+
+        model = YOLO(settings["crowd_model"])
+        trackers = {}   # ByteTrack state stays per camera
+
+        def run(items):
+            results = detect_crowd_batch(model, [frame for _, frame in items])
+            out = []
+            for (camera_id, frame), res in zip(items, results):
+                if camera_id not in trackers:
+                    trackers[camera_id] = new_tracker()
+                out.append(track_crowd(trackers[camera_id], res, frame))
+            return out
+        return run
+
+    if stage == "weapon":
+        from ultralytics import YOLO
+        from detection.weapon import detect_weapon_batch, parse_weapon
+
+        model = YOLO(settings["weapon_model"])
+
+        def run(items):
+            results = detect_weapon_batch(model, [frame for _, frame in items])
+            return [parse_weapon(res, model.names) for res in results]
+        return run
+
+    if stage == "criminal":
+        from detection.criminal import analyze_faces, PROCESS_EVERY_N_FRAMES
+
+        counts = {}
+
+        def run(items):
+            out = []
+            for camera_id, frame in items:
+                counts[camera_id] = counts.get(camera_id, 0) + 1
+                out.append(None if counts[camera_id] % PROCESS_EVERY_N_FRAMES else analyze_faces(frame))
+            return out
+        return run
+
+    raise ValueError(f"Unknown stage {stage}")
+
+
+def _worker_main(stage, index, ring_specs, wake, control, results, stop, settings):
+    """
+    Entry point of a detection process.
+
+    Waits on its wake event (set by the capture side after every frame write),
+    gathers the newest frame of each of its cameras (up to max_batch, waiting at
+    most max_wait for stragglers), runs the stage's analyzer directly on the
+    shared-memory views and sends back one small result message per frame.
+    """
+    try:
+        import torch
+        torch.set_num_threads(settings.get("torch_threads", 1))
+    except ImportError:
+        pass
+
+    analyze = _build_analyzer(stage, settings)
+    max_batch = max(1, settings.get("max_batch", 8))
+    max_wait = settings.get("max_wait", 0.03)
+    rings: Dict[str, SharedFrameRing] = {}
+    last_seq: Dict[str, int] = {}
+
+    def attach(camera_id, spec):
+        rings[camera_id] = SharedFrameRing.attach(spec["name"], spec["shape"], spec["slots"], spec["dtype"])
+        last_seq[camera_id] = 0
+
+    def ready_frames(pending):
+        for camera_id, ring in rings.items():
+            if camera_id in pending:
+                continue
+            latest = ring.latest()
+            if latest is not None and latest[0] > last_seq[camera_id]:
+                pending[camera_id] = latest
+
+    for camera_id, spec in ring_specs.items():
+        attach(camera_id, spec)
+    print(f"[proc] {stage}-{index} (pid {os.getpid()}) serving {list(rings)}")
+
+    while not stop.is_set():
+        wake.wait(0.5)
+        wake.clear()
+
+        # camera add/remove requests from the main process
+        while True:
+            try:
+                cmd, camera_id, spec = control.get_nowait()
+            except queue.Empty:
+                break
+            if cmd == "add":
+                attach(camera_id, spec)
+            elif cmd == "remove" and camera_id in rings:
+                rings.pop(camera_id).close()
+                last_seq.pop(camera_id, None)
+
+        pending: Dict[str, tuple] = {}
+        ready_frames(pending)
+        if not pending:
+            continue
+
+        # give the other cameras up to max_wait to fill the batch
+        deadline = time.time() + max_wait
+        while len(pending) < min(len(rings), max_batch) and time.time() < deadline:
+            if wake.wait(deadline - time.time()):
+                wake.clear()
+                ready_frames(pending)
+
+        items = list(pending.items())
+        for i in range(0, len(items), max_batch):
+            chunk = items[i:i + max_batch]
+            started = time.time()
+            try:
+                outputs = analyze([(camera_id, frame) for camera_id, (_, _, frame) in chunk])
+            except Exception as e:
+                print(f"[proc] {stage} failed on {[c for c, _ in chunk]}: {e}")
+                traceback.print_exc()
+                outputs = None
+            infer_s = time.time() - started
+
+            for j, (camera_id, (seq, ts, _)) in enumerate(chunk):
+                dropped = seq - last_seq[camera_id] - 1 if last_seq[camera_id] else 0
+                last_seq[camera_id] = seq
+                if outputs is None:
+                    continue
+
+                # the writer lapped us while the model was reading the view: result is unreliable
+                if not rings[camera_id].is_current(seq):
+                    results.put({"camera": camera_id, "stage": stage, "seq": seq, "torn": True})
+                    continue
+
+                results.put({
+                    "camera": camera_id, "stage": stage, "seq": seq, "ts": ts, "dropped": dropped,
+                    "wait_s": started - ts, "infer_s": infer_s, "batch": len(chunk), "batch_index": j,
+                    "result": outputs[j],
+                })
+
+    for ring in rings.values():
+        ring.close()
+
+
+# ==================================================================================
+#                               MAIN PROCESS SIDE
+# ==================================================================================
+class ProcessStage(NamedTuple):
+    name: str
+    handle: Callable       # handle(cam, result, packet) in the main process
+    processes: int = 1
+
+
+class _Proc:
+    def __init__(self, stage: ProcessStage, index: int, ctx):
+        self.stage = stage
+        self.index = index
+        self.wake = ctx.Event()
+        self.control = ctx.Queue()
+        self.cameras: Dict[str, dict] = {}
+        self.process = None
+
+
+class ProcessWorkerPool:
+    """
+    Runs each detection stage in its own OS process(es) so model inference,
+    post-processing and face matching do not share the Flask process's GIL.
+
+    Every camera gets a SharedFrameRing that its capture bus writes into; each
+    stage's cameras are spread round-robin over that stage's processes. Workers
+    send back plain dict results which a collector thread applies through the
+    stage's handle() (detections, status, alerts) in this process.
+    """
+
+    def __init__(self, stages: List[ProcessStage], slots: int = 8, settings: Optional[dict] = None):
+        self.ctx = mp.get_context("spawn")
+        self.stages = {s.name: s for s in stages}
+        self.slots = slots
+        self.settings = dict(settings or {})
+        self.results = self.ctx.Queue()
+        self.stop_event = self.ctx.Event()
+        self.procs: Dict[str, List[_Proc]] = {
+            s.name: [_Proc(s, i, self.ctx) for i in range(max(1, s.processes))] for s in stages
+        }
+        total = sum(len(p) for p in self.procs.values())
+        self.settings.setdefault("torch_threads", max(1, (os.cpu_count() or 1) // total))
+        self.cameras = {}
+        self.rings: Dict[str, SharedFrameRing] = {}
+        # frames the motion gate kept out of each camera's ring: running total, and the total
+        # as of each ring slot's write, so the collector can tell them from real drops
+        self.gated: Dict[str, dict] = {}
+        self._gated_seen: Dict[tuple, int] = {}
+        self._assigned = 0
+        self._collector = None
+        self.running = False
+
+    # ---------------- cameras ----------------
+    def add_camera(self, cam):
+        first = cam.buses["camera"].latest()
+        shape = first.frame.shape if first is not None else (480, 640, 3)
+        ring = SharedFrameRing.create(shape, slots=self.slots)
+        self.rings[cam.camera_id] = ring
+        self.cameras[cam.camera_id] = cam
+        gated = self.gated[cam.camera_id] = {"total": 0, "at": [0] * self.slots}
+
+        targets = []
+        for procs in self.procs.values():
+            proc = procs[self._assigned % len(procs)]
+            proc.cameras[cam.camera_id] = ring.spec()
+            targets.append(proc)
+            if self.running:
+                proc.control.put(("add", cam.camera_id, ring.spec()))
+        self._assigned += 1
+
+        def on_frame(packet: FramePacket, ring=ring, targets=targets, gated=gated):
+            # static scene: don't hand the frame to the detection processes at all
+            if not cam.motion.should_run("frames", packet):
+                FRAMES_SKIPPED.labels(cam.camera_id, "all").inc()
+                gated["total"] += 1
+                return
+            gated["at"][packet.seq % self.slots] = gated["total"]
+            ring.write(packet.frame, packet.seq, packet.ts)
+            for proc in targets:
+                proc.wake.set()
+
+        cam.buses["camera"].subscribe(on_frame)
+        if first is not None:
+            on_frame(first)
+
+    # ---------------- lifecycle ----------------
+    def start(self):
+        if self.running:
+            return self
+        self.running = True
+        for procs in self.procs.values():
+            for proc in procs:
+                proc.process = self.ctx.Process(
+                    target=_worker_main,
+                    args=(proc.stage.name, proc.index, dict(proc.cameras), proc.wake, proc.control,
+                          self.results, self.stop_event, self.settings),
+                    name=f"detect-{proc.stage.name}-{proc.index}",
+                    daemon=True,
+                )
+                proc.process.start()
+        self._collector = threading.Thread(target=self._collect, name="proc-results", daemon=True)
+        self._collector.start()
+        print(f"[proc] {sum(len(p) for p in self.procs.values())} detection process(es) started.")
+        return self
+
+    def stop(self):
+        self.running = False
+        self.stop_event.set()
+        for procs in self.procs.values():
+            for proc in procs:
+                proc.wake.set()
+                if proc.process is not None:
+                    proc.process.join(timeout=5)
+        rings, self.rings = self.rings, {}   # the collector stops looking them up first
+        for ring in rings.values():
+            ring.close()
+
+    # ---------------- results ----------------
+    def _collect(self):
+        while self.running:
+            try:
+                msg = self.results.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            except (EOFError, OSError):
+                break
+
+            cam = self.cameras.get(msg["camera"])
+            stage = self.stages.get(msg["stage"])
+            if cam is None or stage is None or not cam.active:
+                continue
+            ring = self.rings.get(cam.camera_id)   # gone once stop() closed the rings
+            if ring is None:
+                continue
+            item = ring.get(msg["seq"])
+
+            # the seq gap the worker saw includes the frames the motion gate skipped on purpose
+            gated = self.gated[cam.camera_id]
+            gated_now = gated["at"][msg["seq"] % self.slots] if item is not None else gated["total"]
+            gated_since = gated_now - self._gated_seen.get((cam.camera_id, stage.name), 0)
+            self._gated_seen[(cam.camera_id, stage.name)] = gated_now
+            if msg.get("torn"):
+                cam.record_frame(stage.name, 1)
+                continue
+
+            cam.last_seqs[stage.name] = msg["seq"]
+            cam.record_frame(stage.name, max(0, msg["dropped"] - gated_since))
+            # metrics recorded inside the child stay there: re-record them from the message
+            FRAME_WAIT.labels(stage.name).observe(msg["wait_s"])
+            if msg["batch_index"] == 0:
+                INFERENCE_TIME.labels(stage.name).observe(msg["infer_s"])
+                BATCH_SIZE.labels(stage.name).observe(msg["batch"])
+
+            # a view of the ring slot, valid only until the ring wraps: handlers copy what they keep
+            # (incidents render their peak frame right away)
+            frame = item[1] if item is not None else cam.buses["camera"].latest().frame
+            try:
+                stage.handle(cam, msg["result"], FramePacket(msg["seq"], msg["ts"], frame))
+            except Exception as e:
+                print(f"[proc] handling {stage.name} result for {cam.camera_id} failed: {e}")
+                traceback.print_exc()
+
+
+def process_settings() -> dict:
+    """Model locations and batching limits handed to every detection process."""
+    return {
+        "crowd_model": str(state.CROWD_MODEL_PATH),
+        "weapon_model": str(state.WEAPON_MODEL_PATH),
+        "max_batch": state.BATCH_MAX_SIZE,
+        "max_wait": state.BATCH_MAX_WAIT,
+    }
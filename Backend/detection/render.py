@@ -0,0 +1,36 @@
+# Backend/detection/render.py
+from detection.crowd import draw_crowd
+from detection.weapon import draw_weapon
+from detection.criminal import draw_faces
+
+# Which stages' overlays each video feed shows (same layering the feeds always had)
+FEED_LAYERS = {
+    "crowd": ("crowd",),
+    "weapon": ("crowd", "weapon"),
+    "violence": ("crowd", "weapon", "criminal"),
+}
+
+DRAWERS = {
+    "crowd": draw_crowd,
+    "weapon": draw_weapon,
+    "criminal": draw_faces,
+}
+
+
+def render_frame(cam, feed: str, frame):
+    """
+    Compose the overlays for a feed on top of a raw camera frame.
+
+    Called from the stream generators, i.e. only while somebody is watching;
+    the detection stages never draw. The raw frame is shared with the models,
+    so it is copied once here and only if there is something to draw.
+    """
+    detections = cam.get_detections()
+    layers = [(name, detections[name][1]) for name in FEED_LAYERS.get(feed, ()) if name in detections]
+    if not layers:
+        return frame
+
+    out = frame.copy()
+    for name, result in layers:
+        DRAWERS[name](out, result)
+    return out
@@ -0,0 +1,103 @@
+# Backend/detection/runtime.py
+import os
+
+try:
+    import torch
+except ImportError:
+    torch = None
+
+import shared_state as state
+import detection.crowd as crowd
+import detection.weapon as weapon
+import detection.criminal as criminal
+from detection.pipeline import InferencePool, Stage
+from detection.process_workers import ProcessWorkerPool, ProcessStage, process_settings
+from detection.scheduler import BatchScheduler
+
+
+def load_models():
+    """Register the YOLO factories and load the shared model instances into shared_state."""
+    from ultralytics import YOLO
+
+    state.model_factories = {
+        "crowd": lambda: YOLO(str(state.CROWD_MODEL_PATH)),
+        "weapon": lambda: YOLO(str(state.WEAPON_MODEL_PATH)),
+    }
+    state.yolo_crowd_model = state.model_factories["crowd"]()
+    state.yolo_weapon_model = state.model_factories["weapon"]()
+
+
+def start_inference(cameras, worker_mode=None):
+    """
+    Build and start the detection workers for `cameras` according to WORKER_MODE
+    and the batching settings; the pool is stored in state.inference_pool.
+
+    Stage functions are looked up on their modules when the pool is built, so a
+    caller (e.g. the benchmarks) may swap in instrumented versions beforehand.
+    """
+    worker_mode = worker_mode or state.WORKER_MODE
+
+    if worker_mode == "processes":
+        # Each stage in its own process(es), reading frames from shared memory
+        pool = ProcessWorkerPool(
+            [
+                ProcessStage("crowd", crowd.handle_crowd, state.PROCESS_WORKERS.get("crowd", 1)),
+                ProcessStage("weapon", weapon.handle_weapon, state.PROCESS_WORKERS.get("weapon", 1)),
+                ProcessStage("criminal", criminal.handle_criminal, state.PROCESS_WORKERS.get("criminal", 1)),
+            ],
+            slots=state.SHM_RING_SLOTS,
+            settings=process_settings(),
+        )
+        for cam in cameras:
+            pool.add_camera(cam)
+        state.inference_pool = pool.start()
+        return pool
+
+    # Workers split the cores between them instead of each grabbing all of them
+    if torch is not None:
+        torch.set_num_threads(max(1, (os.cpu_count() or 1) // state.INFERENCE_WORKERS))
+
+    # One shared worker pool runs every camera's pipelines
+    if state.BATCH_MAX_SIZE > 1:
+        # YOLO stages go through cross-camera batch schedulers (one model instance each)
+        pool = InferencePool(
+            [
+                Stage("crowd", "camera", crowd.crowd_submit, batched=True),
+                Stage("weapon", "camera", weapon.weapon_submit, batched=True),
+                Stage("criminal", "camera", criminal.criminal_step),
+            ],
+            num_workers=state.INFERENCE_WORKERS,
+        )
+        state.schedulers = {
+            "crowd": BatchScheduler(
+                "crowd", lambda frames: crowd.detect_crowd_batch(state.yolo_crowd_model, frames),
+                state.BATCH_MAX_SIZE, state.BATCH_MAX_WAIT, dispatch=pool.post,
+            ).start(),
+            "weapon": BatchScheduler(
+                "weapon", lambda frames: weapon.detect_weapon_batch(state.yolo_weapon_model, frames),
+                state.BATCH_MAX_SIZE, state.BATCH_MAX_WAIT, dispatch=pool.post,
+            ).start(),
+        }
+    else:
+        pool = InferencePool(
+            [
+                Stage("crowd", "camera", crowd.crowd_step),
+                Stage("weapon", "camera", weapon.weapon_step),
+                Stage("criminal", "camera", criminal.criminal_step),
+            ],
+            num_workers=state.INFERENCE_WORKERS,
+        )
+    state.inference_pool = pool.start()
+    for cam in cameras:
+        pool.add_camera(cam)
+    return pool
+
+
+def stop_inference():
+    """Stop the schedulers and the worker pool started by start_inference()."""
+    for scheduler in state.schedulers.values():
+        scheduler.stop()
+    state.schedulers = {}
+    if state.inference_pool is not None:
+        state.inference_pool.stop()
+        state.inference_pool = None
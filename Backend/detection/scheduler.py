@@ -0,0 +1,115 @@
+# Backend/detection/scheduler.py
+import queue
+import threading
+import time
+import traceback
+from typing import Any, Callable, List, NamedTuple, Optional
+
+from utils.metrics_utils import FRAME_WAIT
+
+
+class _Request(NamedTuple):
+    frame: Any
+    callback: Callable[[Any, Optional[Exception]], None]
+    submitted: float
+    captured: float         # capture time of the frame, for the wait metric
+
+
+class BatchScheduler:
+    """
+    Collects frames from every camera into batches for one model.
+
+    A batch is closed when it holds max_batch frames or max_wait seconds after
+    its first frame arrived, whichever comes first, then run_batch(frames) does
+    a single forward pass and each submitter's callback(result, error) is
+    invoked. Callbacks are handed to `dispatch` (e.g. the inference pool) so
+    per-camera post-processing does not run on the scheduler thread.
+
+    The model is only ever touched by the scheduler's own thread, which also
+    makes sharing one predictor across cameras safe.
+    """
+
+    def __init__(self, name: str, run_batch: Callable[[List[Any]], List[Any]],
+                 max_batch: int = 8, max_wait: float = 0.03,
+                 dispatch: Optional[Callable[[Callable[[], None]], None]] = None):
+        self.name = name
+        self.run_batch = run_batch
+        self.max_batch = max(1, int(max_batch))
+        self.max_wait = max(0.0, float(max_wait))
+        self.dispatch = dispatch
+        self._queue: "queue.Queue[_Request]" = queue.Queue()
+        self._thread = None
+        self.running = False
+        self.stats = {"batches": 0, "frames": 0, "max_batch_seen": 0, "busy_s": 0.0}
+
+    def start(self):
+        if not self.running:
+            self.running = True
+            self._thread = threading.Thread(target=self._loop, name=f"batch-{self.name}", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self.running = False
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+
+    def submit(self, frame, callback: Callable[[Any, Optional[Exception]], None], ts: Optional[float] = None):
+        now = time.time()
+        self._queue.put(_Request(frame, callback, now, ts if ts is not None else now))
+
+    def _collect(self) -> List[_Request]:
+        try:
+            first = self._queue.get(timeout=0.5)
+        except queue.Empty:
+            return []
+        batch = [first]
+        deadline = first.submitted + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.time()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _loop(self):
+        while self.running:
+            batch = self._collect()
+            if not batch:
+                continue
+
+            started = time.time()
+            wait = FRAME_WAIT.labels(self.name)
+            for req in batch:
+                wait.observe(started - req.captured)
+            results, error = [None] * len(batch), None
+            try:
+                results = list(self.run_batch([r.frame for r in batch]))
+                if len(results) != len(batch):
+                    raise RuntimeError(f"{self.name}: {len(results)} results for {len(batch)} frames")
+            except Exception as e:
+                print(f"[batch] {self.name} batch of {len(batch)} failed: {e}")
+                traceback.print_exc()
+                results, error = [None] * len(batch), e
+
+            self.stats["batches"] += 1
+            self.stats["frames"] += len(batch)
+            self.stats["max_batch_seen"] = max(self.stats["max_batch_seen"], len(batch))
+            self.stats["busy_s"] += time.time() - started
+
+            for req, res in zip(batch, results):
+                self._deliver(req.callback, res, error)
+
+    def _deliver(self, callback, result, error):
+        def run():
+            try:
+                callback(result, error)
+            except Exception as e:
+                print(f"[batch] {self.name} callback failed: {e}")
+                traceback.print_exc()
+
+        if self.dispatch is not None:
+            self.dispatch(run)
+        else:
+            run()
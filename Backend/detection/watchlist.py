@@ -0,0 +1,242 @@
+# Backend/detection/watchlist.py
+"""
+Face gallery matching with one matrix product per frame.
+
+The gallery is a single C-contiguous float32 matrix (one row per enrolled
+sample, possibly a read-only memory map of an EncodingsStore, used in place)
+with its squared norms computed once.
+match() takes every face found in a frame at once and gets all query-to-sample
+Euclidean distances from
+
+    |q - g|^2 = |q|^2 - 2 q.g + |g|^2
+
+i.e. one BLAS matrix multiply, instead of re-stacking a Python list of
+encodings for every face the way face_recognition.face_distance does.
+
+Distances are then reduced per identity, so a person enrolled with 100 photos
+counts once among the candidates:
+
+    "best"      the closest of the person's samples (same answer as a linear scan)
+    "centroid"  the distance to the mean of the person's samples (one row per person)
+
+For very large galleries enable_index() puts an IVF index (detection.ann_index)
+in front of the "best" search, so a frame scans only a few partitions.
+"""
+import hashlib
+import time
+from typing import List, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+from detection.ann_index import IVFIndex
+
+ANN_ROWS_PER_IDENTITY = 8   # nearest rows fetched per requested identity (a person's samples sit together)
+
+AGGREGATES = ("best", "centroid")
+
+
+class Match(NamedTuple):
+    name: str
+    distance: float
+
+
+class Watchlist:
+    def __init__(self, encodings: Sequence = (), names: Sequence[str] = (), aggregate: str = "best"):
+        if len(encodings) != len(names):
+            raise ValueError(f"{len(encodings)} encodings but {len(names)} names")
+        names = [str(n) for n in names]
+        identities = sorted(set(names))
+        lookup = {name: i for i, name in enumerate(identities)}
+        labels = np.fromiter((lookup[n] for n in names), dtype=np.intp, count=len(names))
+        self._build(encodings, labels, identities, aggregate)
+
+    @classmethod
+    def from_labels(cls, encodings, labels, identities: Sequence[str], aggregate: str = "best") -> "Watchlist":
+        """
+        Build from per-row indices into `identities` (an EncodingsStore gallery).
+        A C-contiguous float32 matrix, e.g. a read-only memory map, is used in place.
+        """
+        if len(encodings) != len(labels):
+            raise ValueError(f"{len(encodings)} encodings but {len(labels)} labels")
+        watchlist = cls.__new__(cls)
+        watchlist._build(encodings, labels, [str(n) for n in identities], aggregate)
+        return watchlist
+
+    def _build(self, encodings, labels, identities: List[str], aggregate: str):
+        if aggregate not in AGGREGATES:
+            raise ValueError(f"Unknown aggregate {aggregate!r} (use one of {AGGREGATES})")
+        self.aggregate = aggregate
+
+        labels = np.asarray(labels, dtype=np.intp)
+        if len(labels):
+            matrix = np.asarray(encodings, dtype=np.float32).reshape(len(labels), -1)
+        else:
+            matrix = np.zeros((0, 128), dtype=np.float32)   # dlib face encodings are 128-d
+        self.matrix = np.ascontiguousarray(matrix)   # no copy when it already is (a shared memory map stays shared)
+        self.sq_norms = np.einsum("ij,ij->i", self.matrix, self.matrix)
+
+        # identity table: identities[i] has counts[i] rows; identities without rows are dropped
+        counts = np.bincount(labels, minlength=len(identities))
+        if len(counts) and not counts.all():
+            kept = np.flatnonzero(counts)
+            remap = np.full(len(counts), -1, dtype=np.intp)
+            remap[kept] = np.arange(len(kept))
+            labels, counts, identities = remap[labels], counts[kept], [identities[i] for i in kept]
+        self.identities: List[str] = list(identities)
+        self.row_identity = labels
+        self.starts = (np.cumsum(counts) - counts).astype(np.intp)
+        # rows stay in gallery order; when a person's rows are not adjacent (appended later),
+        # _order regroups the distance columns by identity before the reduction
+        self._order = None if np.all(labels[:-1] <= labels[1:]) else np.argsort(labels, kind="stable")
+
+        self.index: Optional[IVFIndex] = None
+        self._centroids = None
+        self._centroid_norms = None
+
+    def __len__(self) -> int:
+        return len(self.row_identity)
+
+    @property
+    def names(self) -> List[str]:
+        """Identity of every row, in gallery order."""
+        return [self.identities[i] for i in self.row_identity.tolist()]
+
+    @property
+    def dim(self) -> int:
+        return self.matrix.shape[1]
+
+    def fingerprint(self, rows: Optional[int] = None) -> str:
+        """
+        Hash of the first `rows` rows of the gallery (all by default) and their identities; an
+        index file is reused for the same gallery, or extended when it covers a prefix of it.
+        """
+        rows = len(self) if rows is None else int(rows)
+        digest = hashlib.sha1(self.matrix[:rows].data)   # hashes the (mapped) buffer without copying it
+        digest.update("\n".join(self.identities[i] for i in self.row_identity[:rows].tolist()).encode("utf-8"))
+        return digest.hexdigest()
+
+    def enable_index(self, path=None, nprobe: int = 8, nlist: Optional[int] = None) -> IVFIndex:
+        """
+        Use an IVF index for "best" matching: loaded from `path` when it was built
+        for this gallery, extended with the appended rows when it was built for an
+        earlier state of it, otherwise trained now (and saved to `path`).
+        """
+        fingerprint = self.fingerprint()
+        index = None
+        if path is not None:
+            try:
+                index, stored = IVFIndex.load(path)
+                indexed = len(index)
+                if indexed == len(self) and stored == fingerprint:
+                    pass
+                elif indexed < len(self) <= 2 * indexed and stored == self.fingerprint(indexed):
+                    # rows were only appended (EncodingsStore.append): add them to the trained
+                    # lists; past doubling the centroids are too stale and it is retrained
+                    started = time.time()
+                    index.add(range(indexed, len(self)), self.matrix[indexed:])
+                    print(f"[watchlist] Added {len(self) - indexed} encodings to the IVF index "
+                          f"in {time.time() - started:.1f}s")
+                    index.save(path, fingerprint)
+                else:
+                    print(f"[watchlist] {path} was built for another gallery, rebuilding")
+                    index = None
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                print(f"[watchlist] Could not read {path}, rebuilding: {e}")
+                index = None
+        if index is None:
+            started = time.time()
+            index = IVFIndex(self.dim, nprobe).train(self.matrix, nlist=nlist)
+            index.add(range(len(self)), self.matrix)
+            print(f"[watchlist] IVF index over {len(self)} encodings ({index.nlist} lists) "
+                  f"built in {time.time() - started:.1f}s")
+            if path is not None:
+                index.save(path, fingerprint)
+        index.nprobe = int(nprobe)
+        self.index = index
+        return index
+
+    def _centroid_table(self):
+        if self._centroids is None:
+            grouped = self.matrix if self._order is None else self.matrix[self._order]
+            sums = np.add.reduceat(grouped, self.starts, axis=0) if len(self) else grouped
+            counts = np.diff(np.append(self.starts, len(self)))
+            self._centroids = np.ascontiguousarray(sums / counts[:, None], dtype=np.float32)
+            self._centroid_norms = np.einsum("ij,ij->i", self._centroids, self._centroids)
+        return self._centroids, self._centroid_norms
+
+    @staticmethod
+    def _distances(queries: np.ndarray, matrix: np.ndarray, sq_norms: np.ndarray) -> np.ndarray:
+        q_norms = np.einsum("ij,ij->i", queries, queries)
+        d2 = q_norms[:, None] - 2.0 * (queries @ matrix.T) + sq_norms[None, :]
+        return np.sqrt(np.maximum(d2, 0.0, out=d2), out=d2)
+
+    def distances(self, queries) -> np.ndarray:
+        """(faces, samples) Euclidean distances to every gallery row."""
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        return self._distances(queries, self.matrix, self.sq_norms)
+
+    def identity_distances(self, queries, aggregate: Optional[str] = None) -> np.ndarray:
+        """(faces, identities) distances after the per-identity reduction."""
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        if (aggregate or self.aggregate) == "centroid":
+            return self._distances(queries, *self._centroid_table())
+        dist = self._distances(queries, self.matrix, self.sq_norms)
+        if self._order is not None:
+            dist = dist[:, self._order]
+        return np.minimum.reduceat(dist, self.starts, axis=1)
+
+    def match(self, queries, k: int = 1, aggregate: Optional[str] = None) -> List[List[Match]]:
+        """Top-k identities (closest first) for each query encoding."""
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        if len(self) == 0 or queries.size == 0:
+            return [[] for _ in range(len(queries) if queries.size else 0)]
+        if self.index is not None and (aggregate or self.aggregate) == "best":
+            return self._match_indexed(queries, k)
+        dist = self.identity_distances(queries, aggregate)
+        k = max(1, min(int(k), dist.shape[1]))
+        if k < dist.shape[1]:
+            top = np.argpartition(dist, k - 1, axis=1)[:, :k]
+        else:
+            top = np.broadcast_to(np.arange(dist.shape[1]), dist.shape)
+        out = []
+        for row, cols in zip(dist, top):
+            cols = cols[np.argsort(row[cols], kind="stable")]
+            out.append([Match(self.identities[c], float(row[c])) for c in cols])
+        return out
+
+    def _match_indexed(self, queries: np.ndarray, k: int) -> List[List[Match]]:
+        # nearest rows from the probed partitions, then the first k distinct identities among them
+        k = max(1, min(int(k), len(self.identities)))
+        dist, rows = self.index.search(queries, k=k * ANN_ROWS_PER_IDENTITY)
+        out = []
+        for row_dist, row_ids in zip(dist, rows):
+            matches, seen = [], set()
+            for d, r in zip(row_dist.tolist(), row_ids.tolist()):
+                if r < 0 or len(matches) == k:
+                    break
+                ident = int(self.row_identity[r])
+                if ident not in seen:
+                    seen.add(ident)
+                    matches.append(Match(self.identities[ident], d))
+            out.append(matches)
+        return out
+
+    def identify(self, queries, tolerance: float, k: int = 1, aggregate: Optional[str] = None) -> List[dict]:
+        """
+        Per face: {"name", "distance", "candidates": [(name, distance), ...]}; the
+        name is "Unknown" when even the closest identity is farther than `tolerance`.
+        """
+        results = []
+        for matches in self.match(queries, k, aggregate):
+            if not matches:
+                results.append({"name": "Unknown", "distance": 1.0, "candidates": []})
+                continue
+            best = matches[0]
+            results.append({
+                "name": best.name if best.distance <= tolerance else "Unknown",
+                "distance": best.distance,
+                "candidates": [(m.name, round(m.distance, 4)) for m in matches],
+            })
+        return results
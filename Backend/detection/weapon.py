@@ -1,15 +1,14 @@
 # Backend/detection/weapon.py
 import time
 from datetime import datetime
-import traceback
 from typing import Tuple, Optional
 
 import cv2
 import numpy as np
 
 import shared_state as state
-from utils.telegram_utils import send_telegram_alert
-from utils.db_utils import save_alert_to_db
+from detection.pipeline import worker_model
+from utils.metrics_utils import INFERENCE_TIME, BATCH_SIZE
 
 
 # -------------------------
@@ -74,180 +73,173 @@ CLASS_COLOR_MAP = {
 
 
 # ==================================================================================
-#                                WEAPON DETECTION THREAD
+#                                WEAPON DETECTION STEP
 # ==================================================================================
-def weapon_detection():
-    print("[weapon] Weapon detection thread started.")
-
-    # Wait until the main app has loaded the model & signalled detection_active
-    while True:
-        if getattr(state, "detection_active", False) and getattr(state, "yolo_weapon_model", None) is not None:
-            break
-        time.sleep(0.1)
-
-    # Print model class map for debug
-    try:
-        print(f"[weapon] Loaded YOLO Weapon Model classes: {state.yolo_weapon_model.names}")
-    except Exception:
-        print("[weapon] WARNING: Could not print model.names")
-
-    # Tweak these to adjust sensitivity
-    MIN_CONF = getattr(state, "DETECTION_CONF_THRESHOLD", 0.55)  # default high confidence
-    VALID_CLASS_KEYWORDS = ["gun", "knife", "pistol", "revolver", "firearm", "rifle", "weapon"]
-
-    COOLDOWN = getattr(state, "ALERT_COOLDOWN", 12)  # seconds between alerts for same detection
-    last_alert_time = None
-
-    while True:
-        try:
-            # Acquire a frame (prefer crowd-processed frame)
-            with state.frame_lock:
-                frame = state.processed_frames.get("crowd")
-
-            if frame is None:
-                ok, cam_frame = state.camera_manager.read()
-                if not ok or cam_frame is None:
-                    time.sleep(0.01)
-                    continue
-                frame = cam_frame.copy()
-            else:
-                frame = frame.copy()
-
-            annotated = frame.copy()
-
-            # Run inference (we pass conf=MIN_CONF to YOLO call to prefilter)
-            results = state.yolo_weapon_model(frame, conf=MIN_CONF)
-
-            if not results:
-                # no detections: still push the frame for frontend
-                with state.frame_lock:
-                    state.processed_frames["weapon"] = annotated
-                time.sleep(0.01)
+# Tweak these to adjust sensitivity
+MIN_CONF = getattr(state, "DETECTION_CONF_THRESHOLD", 0.55)  # default high confidence
+VALID_CLASS_KEYWORDS = ["gun", "knife", "pistol", "revolver", "firearm", "rifle", "weapon"]
+
+COOLDOWN = getattr(state, "ALERT_COOLDOWN", 12)  # seconds the weapon status stays up after the last sighting
+
+
+def detect_weapon_batch(model, frames) -> list:
+    """One forward pass over frames from any number of cameras."""
+    # Run inference (we pass conf=MIN_CONF to YOLO call to prefilter)
+    frames = list(frames)
+    BATCH_SIZE.labels("weapon").observe(len(frames))
+    with INFERENCE_TIME.labels("weapon").time():
+        return model.predict(frames, conf=MIN_CONF, verbose=False)
+
+
+def parse_weapon(res, names) -> dict:
+    """
+    Turn one YOLO result into {"detections": [{"name", "conf", "box"}, ...], "best": <first valid weapon or None>};
+    plain python values only, so results can cross process boundaries.
+    """
+    detections = []
+    best = None
+    if res is None:
+        return {"detections": detections, "best": best}
+
+    boxes = getattr(res, "boxes", None)
+
+    # iterate boxes if present
+    if boxes is not None and len(boxes) > 0:
+        for box in boxes:
+            conf_val, cls_val = _safe_get_conf_and_cls(box)
+            if conf_val is None:
                 continue
 
-            res = results[0]
-
-            boxes = getattr(res, "boxes", None)
-            weapon_detected = False
-            detected_name = None
-            detected_conf = None
-            detected_box = None
-
-            # iterate boxes if present
-            if boxes is not None and len(boxes) > 0:
-                for box in boxes:
-                    conf_val, cls_val = _safe_get_conf_and_cls(box)
-                    if conf_val is None:
-                        continue
-
-                    # get label string (fallback to cls index)
-                    try:
-                        name = state.yolo_weapon_model.names.get(cls_val, str(cls_val))
-                    except Exception:
-                        name = str(cls_val)
-
-                    name = str(name).lower()
-
-                    # quick filter: class keyword match + confidence
-                    if any(k in name for k in VALID_CLASS_KEYWORDS) and conf_val >= MIN_CONF:
-                        # small box filtering (optional) — reduce false positives for tiny detections
-                        xy = _safe_get_xyxy(box)
-                        if xy:
-                            x1, y1, x2, y2 = xy
-                            box_area = max(0, (x2 - x1) * (y2 - y1))
-                            # ignore extremely small boxes; threshold tuned for 480x640 input (adjust if needed)
-                            min_box_area = getattr(state, "WEAPON_MIN_BOX_AREA", 1500)
-                            if box_area < min_box_area:
-                                # skip tiny detection
-                                continue
-
-                        weapon_detected = True
-                        detected_name = name
-                        detected_conf = float(conf_val)
-                        detected_box = _safe_get_xyxy(box)
-                        break  # take first confident valid detection
-
-            # Draw using YOLO's plot if available (it is helpful) then overlay custom colored box for clarity
+            # get label string (fallback to cls index)
             try:
-                if hasattr(res, "plot"):
-                    annotated = res.plot(annotated)
+                name = names.get(cls_val, str(cls_val))
             except Exception:
-                pass
-
-            # If we have a detection, draw clearer color-coded rectangle & label
-            if detected_box is not None:
-                x1, y1, x2, y2 = detected_box
-                color = DEFAULT_COLOR
-                # choose color by best matching keyword
-                for k, c in CLASS_COLOR_MAP.items():
-                    if k in detected_name:
-                        color = c
-                        break
-                # rectangle & label
-                cv2.rectangle(annotated, (x1, y1), (x2, y2), color, 2)
-                label_text = f"{detected_name} {detected_conf:.2f}"
-                cv2.rectangle(annotated, (x1, y2 - 24), (x2, y2), color, -1)
-                cv2.putText(annotated, label_text, (x1 + 6, y2 - 6), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
-
-            # If weapon confirmed, handle alerting & DB save
-            if weapon_detected and detected_name is not None:
-                now = time.time()
-                if not last_alert_time or (now - last_alert_time >= COOLDOWN):
-                    last_alert_time = now
-                    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                    alert_text = f"🚨 WEAPON DETECTED: {detected_name.upper()} ({detected_conf:.2f}) at {timestamp}"
-
-                    # Send telegram (annotated image)
-                    try:
-                        send_telegram_alert(alert_text, annotated)
-                    except Exception as e:
-                        print(f"[weapon] Telegram send failed: {e}")
-
-                    # determine people_count from shared_state (best-effort)
-                    people_count_val = None
-                    try:
-                        if isinstance(state.crowd_count, str):
-                            import re
-                            m = re.search(r"\d+", state.crowd_count)
-                            if m:
-                                people_count_val = int(m.group(0))
-                        elif isinstance(state.crowd_count, int):
-                            people_count_val = state.crowd_count
-                    except Exception:
-                        people_count_val = None
-
-                    # Save to DB — store subtype as detected_name (lowercase)
-                    try:
-                        save_alert_to_db(
-                            alert_type="Weapon",
-                            sub_type=str(detected_name),
-                            confidence=float(detected_conf) if detected_conf is not None else None,
-                            people_count=people_count_val,
-                            person_name=None,
-                            violence_detected=(getattr(state, "last_violence_info", "Safe") != "Safe"),
-                        )
-                    except Exception as e:
-                        print(f"[weapon] DB save error: {e}")
-
-                    # update shared status fields
-                    with state.status_lock:
-                        state.last_weapon_detection_time = now
-                        state.last_weapon_info = f"{detected_name} ({detected_conf:.2f})"
-                        state.last_weapon_confidence = detected_conf
-
-            # clear "weapon" info after cooldown
-            if last_alert_time and (time.time() - last_alert_time > COOLDOWN):
-                with state.status_lock:
-                    state.last_weapon_info = "Safe"
-                    state.last_weapon_confidence = None
-
-            # always push annotated frame for frontend
-            with state.frame_lock:
-                state.processed_frames["weapon"] = annotated
-
-        except Exception as e:
-            print(f"[weapon] Unexpected error: {e}")
-            traceback.print_exc()
-
-        # tiny sleep to yield CPU
-        time.sleep(0.01)
+                name = str(cls_val)
+
+            name = str(name).lower()
+            xy = _safe_get_xyxy(box)
+            det = {"name": name, "conf": float(conf_val), "box": list(xy) if xy else None}
+            detections.append(det)
+
+            # quick filter: class keyword match + confidence
+            if best is None and any(k in name for k in VALID_CLASS_KEYWORDS) and conf_val >= MIN_CONF:
+                # small box filtering (optional) — reduce false positives for tiny detections
+                if xy:
+                    x1, y1, x2, y2 = xy
+                    box_area = max(0, (x2 - x1) * (y2 - y1))
+                    # ignore extremely small boxes; threshold tuned for 480x640 input (adjust if needed)
+                    min_box_area = getattr(state, "WEAPON_MIN_BOX_AREA", 1500)
+                    if box_area < min_box_area:
+                        # skip tiny detection
+                        continue
+
+                best = det  # take first confident valid detection
+
+    return {"detections": detections, "best": best}
+
+
+def analyze_weapon(model, frame) -> dict:
+    """Run the weapon model on a single frame."""
+    results = detect_weapon_batch(model, [frame])
+    return parse_weapon(results[0] if results else None, model.names)
+
+
+def _color_for(name: str):
+    # choose color by best matching keyword
+    for k, c in CLASS_COLOR_MAP.items():
+        if k in name:
+            return c
+    return DEFAULT_COLOR
+
+
+def draw_weapon(frame, result: dict):
+    # thin boxes for every raw detection, then a clearer color-coded box & label for the confirmed one
+    for det in result["detections"]:
+        if det["box"] and det is not result["best"]:
+            x1, y1, x2, y2 = det["box"]
+            cv2.rectangle(frame, (x1, y1), (x2, y2), _color_for(det["name"]), 1)
+
+    best = result["best"]
+    if best is not None and best["box"]:
+        x1, y1, x2, y2 = best["box"]
+        color = _color_for(best["name"])
+        # rectangle & label
+        cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
+        label_text = f"{best['name']} {best['conf']:.2f}"
+        cv2.rectangle(frame, (x1, y2 - 24), (x2, y2), color, -1)
+        cv2.putText(frame, label_text, (x1 + 6, y2 - 6), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
+    return frame
+
+
+def handle_weapon(cam, result: dict, packet):
+    """Apply a weapon result: publish the detections, alert/DB save when a weapon incident opens, status update."""
+    # alert side (MongoDB, Telegram) is only loaded in the main process, as in handle_crowd
+    from utils.alert_dispatcher import dispatch_alert
+    from detection.incidents import observe
+
+    cam.set_detection("weapon", packet.seq, result)
+    best = result["best"]
+    now = time.time()
+
+    # If weapon confirmed, handle alerting & DB save
+    if best is not None:
+        detected_name, detected_conf = best["name"], best["conf"]
+        # one incident per weapon class per camera, however many frames it stays in view; only
+        # sightings confident enough to be stored open one (or count towards it), otherwise a weak
+        # first frame would open an incident whose alert row save_alert_to_db() refuses
+        incident, opened = None, False
+        if detected_conf >= state.WEAPON_ALERT_CONF:
+            incident, opened = observe(cam, "weapon", detected_name, detected_conf,
+                                       snapshot=lambda: draw_weapon(packet.frame.copy(), result))
+        if opened:
+            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            alert_text = f"🚨 WEAPON DETECTED: {detected_name.upper()} ({detected_conf:.2f}) at {timestamp} ({cam.location})"
+
+            # Queue telegram (annotated image; the only place this stage draws) + DB save —
+            # store subtype as detected_name (lowercase)
+            dispatch_alert(
+                "weapon", alert_text, incident.snapshot(),
+                db=dict(
+                    alert_type="Weapon",
+                    sub_type=str(detected_name),
+                    confidence=float(detected_conf),
+                    people_count=cam.people_count(),
+                    person_name=None,
+                    location=cam.location,
+                    camera=cam.camera_id,
+                    violence_detected=(cam.last_violence_info != "Safe"),
+                    alert_id=incident.id,
+                    incident=incident.opening_doc(),
+                ),
+            )
+
+        # update shared status fields
+        with cam.status_lock:
+            cam.last_weapon_detection_time = now
+            cam.last_weapon_info = f"{detected_name} ({detected_conf:.2f})"
+            cam.last_weapon_confidence = detected_conf
+
+    # clear "weapon" info once nothing was seen for COOLDOWN seconds
+    with cam.status_lock:
+        if cam.last_weapon_detection_time and now - cam.last_weapon_detection_time > COOLDOWN:
+            cam.last_weapon_info = "Safe"
+            cam.last_weapon_confidence = None
+
+    cam.publish_status()
+
+
+def weapon_step(cam, packet):
+    """Thread-mode stage (unbatched): run weapon detection on one raw camera frame."""
+    handle_weapon(cam, analyze_weapon(worker_model("weapon"), packet.frame), packet)
+
+
+def weapon_submit(cam, packet, done):
+    """Thread-mode stage (batched): queue the frame on the weapon scheduler, finish in the callback."""
+    def finish(result, error):
+        try:
+            if error is None:
+                handle_weapon(cam, parse_weapon(result, state.yolo_weapon_model.names), packet)
+        finally:
+            done()
+
+    state.schedulers["weapon"].submit(packet.frame, finish, ts=packet.ts)
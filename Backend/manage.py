@@ -0,0 +1,117 @@
+# Backend/manage.py
+"""
+Maintenance commands for the alert database and the face gallery.
+
+    python manage.py indexes              # create the analytics indexes
+    python manage.py migrate [--dry-run]  # backfill ts / camera on old alerts
+    python manage.py rollups              # rebuild the hourly/daily rollups from raw alerts
+    python manage.py convert-encodings    # import a legacy encodings.pkl into the encodings store
+
+`migrate` is idempotent: it only touches documents without a `ts` field,
+rebuilding it from their `date` + `time` strings, and fills a missing
+`camera` from `location`.
+"""
+import argparse
+import sys
+from datetime import datetime
+from pathlib import Path
+
+from pymongo import UpdateOne
+
+from utils.db_utils import collection, ensure_indexes, rollups
+from utils.db_writer import bulk_write
+from utils.encodings_store import convert_pickle
+
+FACES_DIR = Path(__file__).resolve().parent / "models" / "face_recognition"
+
+
+def parse_ts(doc: dict):
+    """Datetime from the legacy date/time strings, falling back to the ObjectId's creation time."""
+    date, time_ = doc.get("date"), doc.get("time") or "00:00:00"
+    if date:
+        for fmt in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M"):
+            try:
+                return datetime.strptime(f"{date} {time_}", fmt)
+            except ValueError:
+                pass
+    oid = doc.get("_id")
+    if hasattr(oid, "generation_time"):
+        # generation_time is UTC; ts is local wall-clock time like the strings
+        return oid.generation_time.astimezone().replace(tzinfo=None)
+    return None
+
+
+def migrate(coll=None, batch: int = 1000, dry_run: bool = False) -> dict:
+    coll = coll if coll is not None else collection
+    stats = {"scanned": 0, "updated": 0, "unparsable": 0}
+    ops = []
+
+    def flush():
+        if ops and not dry_run:
+            bulk_write(coll, ops, ordered=False)
+        stats["updated"] += len(ops)
+        ops.clear()
+
+    missing = {"$or": [{"ts": {"$exists": False}}, {"camera": {"$exists": False}}]}
+    cursor = coll.find(missing, {"date": 1, "time": 1, "ts": 1, "camera": 1, "location": 1})
+    for doc in cursor:
+        stats["scanned"] += 1
+        update = {}
+        if "ts" not in doc:
+            ts = parse_ts(doc)
+            if ts is None:
+                stats["unparsable"] += 1
+            else:
+                update["ts"] = ts
+        if "camera" not in doc:
+            update["camera"] = doc.get("location") or "Camera 1"
+        if update:
+            ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": update}))
+        if len(ops) >= batch:
+            flush()
+    flush()
+    return stats
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Alert database maintenance")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("indexes", help="create the analytics indexes")
+    m = sub.add_parser("migrate", help="backfill ts / camera on documents written before they existed")
+    m.add_argument("--batch", type=int, default=1000, help="updates per bulk_write")
+    m.add_argument("--dry-run", action="store_true", help="count what would change, write nothing")
+    r = sub.add_parser("rollups", help="rebuild the analytics rollups from the raw alerts (run migrate first)")
+    r.add_argument("--batch", type=int, default=1000, help="alerts folded per bulk_write")
+    c = sub.add_parser("convert-encodings", help="import a legacy encodings.pkl into the memory-mapped encodings store")
+    c.add_argument("--pickle", default=str(FACES_DIR / "encodings.pkl"), help="pickle written by the old encode_faces.py")
+    c.add_argument("--out", default=str(FACES_DIR / "gallery"), help="encodings store directory (replaced)")
+    args = parser.parse_args(argv)
+
+    if args.command == "indexes":
+        return 0 if ensure_indexes() else 1
+
+    if args.command == "migrate":
+        stats = migrate(batch=args.batch, dry_run=args.dry_run)
+        verb = "would update" if args.dry_run else "updated"
+        print(f"[migrate] scanned {stats['scanned']}, {verb} {stats['updated']}, "
+              f"unparsable {stats['unparsable']}")
+        if not args.dry_run:
+            ensure_indexes()
+        return 0
+
+    if args.command == "rollups":
+        stats = rollups.rebuild(collection, batch=args.batch)
+        print(f"[rollups] Rebuilt from {stats['alerts']} alert(s): {stats['hourly']} hourly, "
+              f"{stats['daily']} daily document(s) in {stats['seconds']}s")
+        return 0
+
+    if args.command == "convert-encodings":
+        meta = convert_pickle(args.pickle, args.out).read_meta()
+        print(f"[encodings] {meta['count']} encodings of {len(meta['identities'])} identities "
+              f"written to {args.out}")
+        return 0
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,10 +1,19 @@
 import cv2
 import asyncio
+import sys
 import threading
+from pathlib import Path
 from flask import Flask, jsonify, Response
 from ultralytics import YOLO
 import telegram
 
+# alert frames go to the backend's evidence store instead of one overwritten alert_image.jpg
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+import shared_state as state
+from utils.evidence_store import EvidenceStore
+
+evidence = EvidenceStore(state.EVIDENCE_DIR or "data/evidence", state.EVIDENCE_JPEG_QUALITY, state.EVIDENCE_THUMB_WIDTH)
+
 # =============================================
 # TELEGRAM SETUP
 # =============================================
@@ -98,9 +107,9 @@ def detection_thread():
             consecutive_detections += 1
             
             if consecutive_detections >= min_consecutive_detections and not alert_sent:
-                cv2.imwrite("alert_image.jpg", frame)
+                snapshot = evidence.put(frame, "predict_only")
                 msg = f"🚨 *WEAPON DETECTED!* 🚨\nType: {class_name}\nAccuracy: {best_conf * 100:.2f}%"
-                asyncio.run(send_telegram_alert(msg, "alert_image.jpg"))
+                asyncio.run(send_telegram_alert(msg, str(evidence.root / snapshot.path)))
                 alert_sent = True
                 alert_timer = 0
 
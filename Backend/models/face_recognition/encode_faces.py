@@ -1,46 +1,338 @@
 # ==============================
 # encode_faces.py
 # ==============================
+"""
+Build the face gallery from faces/<person>/*.jpg, incrementally and in parallel.
 
+    python encode_faces.py                 # encode what changed, update gallery/
+    python encode_faces.py --workers 8 --report enrol.json
+
+Every image is identified by the SHA-256 of its bytes. Encodings are cached by
+hash in encode_cache.sqlite3 (together with the detector settings that produced
+them), and a (size, mtime) index of the files avoids even re-hashing unchanged
+ones. A run therefore only encodes new or modified images, in a process pool
+across all cores; renamed, moved or deleted images cost nothing.
+
+Every face is also scored for sharpness, size and pose. Instead of enrolling all
+of a person's images (capture_faces.py takes 100 near-identical frames), only a
+few diverse, good-quality representatives are kept (utils/enrolment.py,
+--max-per-person). The run reports the size reduction and the matching accuracy
+of the full and the reduced gallery on held-out images of each person.
+
+The gallery (the encodings store read by detection/criminal.py) is then brought
+in line with the selection: new rows of a run that removed nothing are appended
+to it, anything else (deleted images or people, changed representatives)
+rewrites it.
+"""
+import argparse
+import hashlib
+import json
 import os
-import cv2
-import face_recognition
-import pickle
+import sqlite3
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+HERE = Path(__file__).resolve().parent
+# the encodings store lives in Backend/utils
+sys.path.insert(0, str(HERE.parent.parent))
+from utils.encodings_store import EncodingsStore  # noqa: E402
+from utils.enrolment import evaluate, measure_face, quality_score, select_representatives  # noqa: E402
+
+DATASET_DIR = HERE / "faces"
+GALLERY_DIR = HERE / "gallery"   # memory-mapped encodings store read by detection/criminal.py
+CACHE_FILE = HERE / "encode_cache.sqlite3"
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp", ".webp"}
+COMMIT_EVERY = 500   # cached results written per transaction (an interrupted run keeps its progress)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, person TEXT, size INTEGER, mtime_ns INTEGER, sha TEXT);
+CREATE TABLE IF NOT EXISTS encodings (sha TEXT, encoder TEXT, faces INTEGER, encoding BLOB, error TEXT,
+                                      sharpness REAL, face_px INTEGER, yaw REAL, roll REAL,
+                                      PRIMARY KEY (sha, encoder));
+CREATE TABLE IF NOT EXISTS gallery_rows (row INTEGER PRIMARY KEY, person TEXT, sha TEXT);
+CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value TEXT);
+"""
+QUALITY_COLUMNS = (("sharpness", "REAL"), ("face_px", "INTEGER"), ("yaw", "REAL"), ("roll", "REAL"))
+TOLERANCE = 0.45   # same face distance tolerance as detection/criminal.py
+
 
-DATASET_DIR = "faces"
-ENCODINGS_FILE = "encodings.pkl"
+def parse_args(argv=None):
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--faces", default=str(DATASET_DIR), help="one sub-folder of images per person")
+    p.add_argument("--gallery", default=str(GALLERY_DIR), help="encodings store to update")
+    p.add_argument("--cache", default=str(CACHE_FILE), help="encoding cache (SQLite)")
+    p.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="encoder processes")
+    p.add_argument("--model", choices=("hog", "cnn"), default="hog", help="face_recognition face detector")
+    p.add_argument("--max-per-person", type=int, default=10, help="representatives kept per person (0 = all)")
+    p.add_argument("--dedup-radius", type=float, default=0.2,
+                   help="encodings closer than this to a kept one count as duplicates")
+    p.add_argument("--min-quality", type=float, default=0.3,
+                   help="drop samples scoring below this (0..1) unless nothing better exists")
+    p.add_argument("--probe-every", type=int, default=5,
+                   help="hold out every n-th image per person to measure accuracy (0 = skip)")
+    p.add_argument("--report", help="write the run summary (incl. every image without a face) as JSON")
+    return p.parse_args(argv)
 
-known_encodings = []
-known_names = []
 
-print("[INFO] Starting face encoding process...")
+# ===================== WORKER =====================
+def encode_image(job):
+    """(sha, path, model) -> (sha, faces, encoding bytes or None, error, quality dict); runs in a pool process."""
+    sha, path, model = job
+    import face_recognition
+    try:
+        image = face_recognition.load_image_file(path)
+        locations = face_recognition.face_locations(image, model=model)
+        if not locations:
+            return sha, 0, None, None, {}
+        encodings = face_recognition.face_encodings(image, locations[:1])
+        landmarks = face_recognition.face_landmarks(image, locations[:1], model="small")
+        quality = measure_face(image, locations[0], landmarks[0] if landmarks else None)
+        return sha, len(locations), np.asarray(encodings[0], dtype=np.float32).tobytes(), None, quality
+    except Exception as e:
+        return sha, 0, None, str(e), {}
 
-# Loop through each person's folder
-for person_name in os.listdir(DATASET_DIR):
-    person_dir = os.path.join(DATASET_DIR, person_name)
-    if not os.path.isdir(person_dir):
-        continue
 
-    print(f"[INFO] Processing {person_name}...")
+def open_cache(path):
+    db = sqlite3.connect(path)
+    db.executescript(SCHEMA)
+    # caches written before quality scoring: add the columns, the rows get measured again
+    present = {row[1] for row in db.execute("PRAGMA table_info(encodings)")}
+    for name, kind in QUALITY_COLUMNS:
+        if name not in present:
+            db.execute(f"ALTER TABLE encodings ADD COLUMN {name} {kind}")
+    db.commit()
+    return db
 
-    for image_name in os.listdir(person_dir):
-        image_path = os.path.join(person_dir, image_name)
 
-        # Load image
-        image = face_recognition.load_image_file(image_path)
-        encodings = face_recognition.face_encodings(image)
+# ===================== SCAN =====================
+def file_sha(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
 
-        if len(encodings) > 0:
-            known_encodings.append(encodings[0])
-            known_names.append(person_name)
+
+def scan(db, faces_dir: Path) -> dict:
+    """Sync the files table with faces/; returns {"files": {path: (person, sha)}, "removed": n, "hashed": n}."""
+    known = {row[0]: row[1:] for row in db.execute("SELECT path, person, size, mtime_ns, sha FROM files")}
+    files, hashed = {}, 0
+    for person_dir in sorted(p for p in faces_dir.iterdir() if p.is_dir()):
+        for image in sorted(person_dir.iterdir()):
+            if image.suffix.lower() not in IMAGE_EXTENSIONS or not image.is_file():
+                continue
+            rel, stat = image.relative_to(faces_dir).as_posix(), image.stat()
+            cached = known.get(rel)
+            if cached and cached[0] == person_dir.name and cached[1:3] == (stat.st_size, stat.st_mtime_ns):
+                sha = cached[3]
+            else:
+                sha = file_sha(image)
+                hashed += 1
+                db.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?)",
+                           (rel, person_dir.name, stat.st_size, stat.st_mtime_ns, sha))
+            files[rel] = (person_dir.name, sha)
+    removed = [path for path in known if path not in files]
+    db.executemany("DELETE FROM files WHERE path = ?", [(path,) for path in removed])
+    db.commit()
+    return {"files": files, "removed": len(removed), "hashed": hashed}
+
+
+def encode_missing(db, faces_dir: Path, files: dict, encoder: str, model: str, workers: int) -> dict:
+    """
+    Encode every image whose hash is not cached for this encoder; returns counts and timing.
+    Images that failed to load last time are tried again (an image without a face is not).
+    """
+    cached = {row[0] for row in db.execute(
+        "SELECT sha FROM encodings WHERE encoder = ? AND error IS NULL "
+        "AND (encoding IS NULL OR sharpness IS NOT NULL)", (encoder,))}
+    jobs = {}
+    for rel, (_, sha) in files.items():
+        if sha not in cached and sha not in jobs:
+            jobs[sha] = (sha, str(faces_dir / rel), model)
+    stats = {"cached": sum(sha in cached for _, sha in files.values()), "encoded": 0, "seconds": 0.0}
+    if not jobs:
+        return stats
+
+    print(f"[INFO] Encoding {len(jobs)} new image(s) with {workers} worker(s)...")
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=max(1, workers)) as pool:
+        chunksize = max(1, min(32, len(jobs) // (4 * max(1, workers))))
+        for sha, faces, encoding, error, quality in pool.map(encode_image, jobs.values(), chunksize=chunksize):
+            db.execute("INSERT OR REPLACE INTO encodings (sha, encoder, faces, encoding, error, sharpness, face_px, "
+                       "yaw, roll) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                       (sha, encoder, faces, encoding, error, quality.get("sharpness"), quality.get("face_px"),
+                        quality.get("yaw"), quality.get("roll")))
+            stats["encoded"] += 1
+            if stats["encoded"] % COMMIT_EVERY == 0:
+                db.commit()
+                elapsed = time.perf_counter() - started
+                print(f"[INFO]   {stats['encoded']}/{len(jobs)} ({stats['encoded'] / elapsed:.1f} img/s)")
+    db.commit()
+    stats["seconds"] = round(time.perf_counter() - started, 2)
+    return stats
+
+
+# ===================== GALLERY =====================
+def collect_samples(db, files: dict, encoder: str):
+    """{person: [(sha, encoding bytes, quality)]} (files sorted, one sample per distinct image) + problems."""
+    results = {row[0]: row[1:] for row in db.execute(
+        "SELECT sha, faces, encoding, error, sharpness, face_px, yaw, roll FROM encodings WHERE encoder = ?",
+        (encoder,))}
+    samples, seen, no_face, failed, multi = {}, set(), [], [], []
+    for rel, (person, sha) in sorted(files.items(), key=lambda item: (item[1][0], item[0])):
+        faces, encoding, error, sharpness, face_px, yaw, roll = results.get(sha, (0, None, "not encoded") + (None,) * 4)
+        if error:
+            failed.append(f"{rel}: {error}")
+        elif encoding is None:
+            no_face.append(rel)
         else:
-            print(f"[WARNING] No face found in {image_name}")
+            if faces > 1:
+                multi.append(rel)
+            if (person, sha) not in seen:
+                seen.add((person, sha))
+                quality = quality_score(sharpness or 0.0, face_px or 0, yaw or 0.0, roll or 0.0)
+                samples.setdefault(person, []).append((sha, encoding, quality))
+    return samples, {"no_face": no_face, "failed": failed, "multiple_faces": multi}
+
+
+def select(items, args) -> list:
+    """The samples of one person to enrol."""
+    if not items or not args.max_per_person:
+        return list(items)
+    encodings = np.frombuffer(b"".join(encoding for _, encoding, _ in items), dtype=np.float32)
+    keep = select_representatives(encodings, [quality for _, _, quality in items], args.max_per_person,
+                                  args.dedup_radius, args.min_quality)
+    return [items[i] for i in keep]
+
+
+def evaluate_selection(samples: dict, args) -> dict:
+    """
+    Hold out every --probe-every-th image of each person, then match them against
+    all the other images and against the representatives selected from those.
+    Neighbouring burst frames make both numbers optimistic; compare them to each other.
+    Returns {} when nothing can be held out (no person has a second image).
+    """
+    galleries = {"before": ([], []), "after": ([], [])}
+    probes, probe_names = [], []
+    for person, items in samples.items():
+        held = set(range(args.probe_every - 1, len(items), args.probe_every)) if len(items) > 1 else set()
+        enrol = [item for i, item in enumerate(items) if i not in held]
+        if not enrol:   # --probe-every 1 holds out everything: nothing left to match against
+            continue
+        probes += [items[i][1] for i in sorted(held)]
+        probe_names += [person] * len(held)
+        for key, chosen in (("before", enrol), ("after", select(enrol, args))):
+            galleries[key][0].extend(encoding for _, encoding, _ in chosen)
+            galleries[key][1].extend([person] * len(chosen))
+    if not probes:
+        return {}
+
+    def as_matrix(blobs):
+        if not blobs:
+            return np.zeros((0, 128), dtype=np.float32)
+        return np.frombuffer(b"".join(blobs), dtype=np.float32).reshape(len(blobs), -1)
+
+    return {key: evaluate(as_matrix(blobs), names, as_matrix(probes), probe_names, TOLERANCE)
+            for key, (blobs, names) in galleries.items()}
+
+
+def _matrix(rows, encodings: dict) -> np.ndarray:
+    if not rows:
+        return np.zeros((0, 128), dtype=np.float32)
+    return np.frombuffer(b"".join(encodings[sha] for _, sha in rows), dtype=np.float32).reshape(len(rows), -1)
+
+
+def update_gallery(db, store: EncodingsStore, rows, encodings: dict) -> str:
+    """Append to or rewrite the store so it holds exactly `rows`; returns what was done."""
+    previous = [tuple(r) for r in db.execute("SELECT person, sha FROM gallery_rows ORDER BY row")]
+    synced = dict(db.execute("SELECT key, value FROM state")).get("generation")
+    meta = store.read_meta() if store.exists() else None
+    # the rows table describes the store only if nobody rewrote it since (e.g. manage.py convert-encodings)
+    in_sync = meta is not None and synced == str(meta["generation"]) and meta["count"] == len(previous)
+
+    if in_sync and set(previous) <= set(rows):
+        have = set(previous)
+        added = [r for r in rows if r not in have]
+        if not added:
+            return "unchanged"
+        meta = store.append(_matrix(added, encodings), [person for person, _ in added])
+        final, action = previous + added, f"appended {len(added)} row(s)"
+    else:
+        meta = store.write(_matrix(rows, encodings), [person for person, _ in rows])
+        final, action = rows, f"rewrote {len(rows)} row(s)"
+
+    db.execute("DELETE FROM gallery_rows")
+    db.executemany("INSERT INTO gallery_rows VALUES (?, ?, ?)", [(i, p, s) for i, (p, s) in enumerate(final)])
+    db.execute("INSERT OR REPLACE INTO state VALUES ('generation', ?)", (str(meta["generation"]),))
+    db.commit()
+    return action
+
+
+# ===================== MAIN =====================
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    faces_dir = Path(args.faces)
+    if not faces_dir.is_dir():
+        print(f"[ERROR] No dataset folder {faces_dir}")
+        return 1
+    encoder = f"dlib-128/{args.model}"   # a different detector gives different crops: cached separately
+
+    started = time.perf_counter()
+    db = open_cache(args.cache)
+    print("[INFO] Starting face encoding process...")
+
+    scanned = scan(db, faces_dir)
+    files = scanned["files"]
+    people = sorted({person for person, _ in files.values()})
+    print(f"[INFO] {len(files)} image(s) of {len(people)} person(s); {scanned['hashed']} new or changed, "
+          f"{scanned['removed']} removed since the last run")
+
+    stats = encode_missing(db, faces_dir, files, encoder, args.model, args.workers)
+    samples, problems = collect_samples(db, files, encoder)
+    selected = {person: select(items, args) for person, items in samples.items()}
+    rows = [(person, sha) for person in sorted(selected) for sha, _, _ in selected[person]]
+    encodings = {sha: encoding for items in selected.values() for sha, encoding, _ in items}
+    action = update_gallery(db, EncodingsStore(args.gallery), rows, encodings)
+    db.close()
+    accuracy = evaluate_selection(samples, args) if args.probe_every > 0 else {}
+
+    rate = stats["encoded"] / stats["seconds"] if stats["seconds"] else 0.0
+    print(f"[INFO] Encoded {stats['encoded']} image(s) in {stats['seconds']}s ({rate:.1f} img/s), "
+          f"{stats['cached']} from cache")
+    for rel in problems["no_face"][:20]:
+        print(f"[WARNING] No face found in {rel}")
+    if len(problems["no_face"]) > 20:
+        print(f"[WARNING] ... and {len(problems['no_face']) - 20} more image(s) without a face")
+    for line in problems["failed"]:
+        print(f"[WARNING] Could not encode {line}")
+    if problems["multiple_faces"]:
+        print(f"[WARNING] {len(problems['multiple_faces'])} image(s) with several faces (first one used)")
+    usable = sum(len(items) for items in samples.values())
+    if usable:
+        print(f"[INFO] Selection: {usable} usable image(s) -> {len(rows)} encoding(s) "
+              f"({usable / max(1, len(rows)):.1f}x smaller, at most {args.max_per_person or 'all'} per person)")
+    for key, result in accuracy.items():
+        if result["accuracy"] is not None:
+            far = "n/a" if result["false_accept_rate"] is None else f"{result['false_accept_rate']:.4f}"
+            print(f"[INFO] Held-out accuracy {key:<6}: {result['accuracy']:.4f} on {result['probes']} image(s), "
+                  f"false accepts {far}, {result['rows']} rows, {result['ms_per_face']:.4f} ms/face")
+    total = time.perf_counter() - started
+    print(f"[SUCCESS] Gallery {args.gallery}: {len(rows)} encoding(s) of "
+          f"{len({p for p, _ in rows})} person(s), {action} in {total:.1f}s")
 
-print(f"[INFO] Total faces encoded: {len(known_encodings)}")
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump({"images": len(files), "people": len(people), "removed_files": scanned["removed"],
+                       "usable_images": usable, "gallery_rows": len(rows), "gallery_update": action,
+                       "accuracy": accuracy, "seconds": round(total, 2), "images_per_second": round(rate, 1),
+                       **stats, **problems}, f, indent=2)
+        print(f"[INFO] Report written to {args.report}")
+    return 0
 
-# Save all encodings to file
-data = {"encodings": known_encodings, "names": known_names}
-with open(ENCODINGS_FILE, "wb") as f:
-    pickle.dump(data, f)
 
-print(f"[SUCCESS] Encodings saved to {ENCODINGS_FILE}")
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,15 +1,18 @@
+import os
+import sys
 import cv2
 import face_recognition
-import pickle
 import numpy as np
 
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+from utils.encodings_store import EncodingsStore  # noqa: E402
+
 # Load encodings
 print("[INFO] Loading face encodings...")
-with open("encodings.pkl", "rb") as f:
-    data = pickle.load(f)
+gallery = EncodingsStore("gallery").open()
 
-known_encodings = data["encodings"]
-known_names = data["names"]
+known_encodings = gallery.embeddings
+known_names = gallery.names
 
 # Initialize webcam
 print("[INFO] Starting webcam...")
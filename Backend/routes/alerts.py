@@ -1,16 +1,80 @@
-from flask import Blueprint, jsonify
-from utils.db_utils import recent_alerts
+from datetime import datetime
+
+from flask import Blueprint, jsonify, request
 from bson import ObjectId   # <-- IMPORTANT
 
+import shared_state as state
+from utils.db_utils import find_alerts, ALERT_FIELDS
+
 alerts_bp = Blueprint("alerts", __name__)
 
 def serialize_alert(alert):
     alert["_id"] = str(alert["_id"])   # Convert ObjectId → string
+    for k, v in alert.items():
+        if isinstance(v, ObjectId):
+            alert[k] = str(v)
+        elif isinstance(v, datetime):
+            alert[k] = v.isoformat(timespec="seconds")
+        elif isinstance(v, dict):   # incident.started / incident.ended
+            alert[k] = {f: x.isoformat(timespec="seconds") if isinstance(x, datetime) else x for f, x in v.items()}
+    if alert.get("confidence") is not None:
+        alert["confidence"] = round(float(alert["confidence"]), 2)
     return alert
 
+def _csv(name):
+    # ?type=Weapon,Crowd and ?type=Weapon&type=Crowd both work
+    values = [v.strip() for raw in request.args.getlist(name) for v in raw.split(",")]
+    return [v for v in values if v]
+
+def _number_arg(name, cast, default=None):
+    value = request.args.get(name)
+    if not value:
+        return default
+    try:
+        return cast(value)
+    except ValueError:
+        raise ValueError(f"{name} must be a number")
+
+def _time_arg(name):
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"{name} must be an ISO date or datetime, e.g. 2024-05-01T13:00")
+
 @alerts_bp.route("/alerts/recent")
 def recent_alerts_list():
-    alerts = recent_alerts(40)
-    alerts = [serialize_alert(a) for a in alerts]  # Convert all
-    return jsonify(alerts)
+    """
+    Newest alerts first, one page at a time.
+
+    ?limit (max ALERTS_PAGE_MAX) ?cursor ?type ?camera ?person ?min_conf
+    ?since ?until ?fields. The body is the list of alerts; when there are more,
+    the X-Next-Cursor header carries the ?cursor for the next page.
+    """
+    try:
+        limit = max(1, min(_number_arg("limit", int, 40), state.ALERTS_PAGE_MAX))
+        fields = _csv("fields")
+        unknown = [f for f in fields if f not in ALERT_FIELDS]
+        if unknown:
+            raise ValueError(f"unknown field(s) {', '.join(unknown)}; choose from {', '.join(ALERT_FIELDS)}")
+
+        alerts, next_cursor = find_alerts(
+            limit,
+            cursor=request.args.get("cursor"),
+            types=[t.capitalize() for t in _csv("type")],
+            camera=request.args.get("camera"),
+            person=request.args.get("person"),
+            min_confidence=_number_arg("min_conf", float),
+            since=_time_arg("since"),
+            until=_time_arg("until"),
+            fields=fields,
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
+    response = jsonify([serialize_alert(a) for a in alerts])  # Convert all
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return response
@@ -1,22 +1,16 @@
 # ===================== routes/analytics.py (FINAL CLEAN VERSION) =====================
-from flask import Blueprint, jsonify, request, send_file, current_app
-from datetime import datetime
-from bson import ObjectId
+from flask import Blueprint, jsonify, send_file, current_app
 import os
-import traceback
+
+import shared_state as state
 
 # DB utilities
+# (summary / trends are one cached query each, see summary_snapshot / trends_snapshot)
 from utils.db_utils import (
-    total_alerts_today,
-    unique_criminals_today,
-    aggregate_type_counts,
-    aggregate_top_subtypes,
-    crowd_trend,
-    hourly_counts_today,
-    predict_peak_hour,
-    most_active_location,
-    recent_alerts,
-    collection
+    summary_snapshot,
+    trends_snapshot,
+    heatmap_today,
+    reappearances_today,
 )
 
 # Import PDF generator
@@ -29,33 +23,22 @@ except Exception as e:
 analytics_bp = Blueprint("analytics", __name__)
 
 
-# ---------------------- Helper ----------------------
-def safe_doc(doc):
-    out = {}
-    for k, v in doc.items():
-        if isinstance(v, ObjectId):
-            out[k] = str(v)
-        else:
-            out[k] = v
-    return out
-
-
 # ---------------------- SUMMARY API ----------------------
 @analytics_bp.route("/analytics/summary", methods=["GET"])
 def analytics_summary():
     try:
-        total_alerts = total_alerts_today()
-        criminals = unique_criminals_today()
+        summary = summary_snapshot()
+        total_alerts = summary["total"]
 
         safety_index = max(0, 100 - (total_alerts * 3))
 
         return jsonify({
             "total_alerts_today": total_alerts,
-            "detected_criminals": criminals,
-            "active_cameras": 1,
+            "detected_criminals": len(summary["criminals"]),
+            "active_cameras": len(state.camera_registry) if state.camera_registry else 0,
             "safety_index": safety_index,
-            "peak_hour": predict_peak_hour(),
-            "top_location": most_active_location(),
+            "peak_hour": summary["peak_hour"],
+            "top_location": summary["top_location"],
         })
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -65,71 +48,24 @@ def analytics_summary():
 @analytics_bp.route("/analytics/trends", methods=["GET"])
 def analytics_trends():
     try:
+        trends = trends_snapshot(days=7, subtype_limit=8)
         return jsonify({
-            "by_type": aggregate_type_counts(7),
-            "crowd_trend": crowd_trend(7),
-            "hourly_today": hourly_counts_today(),
-            "top_subtypes": aggregate_top_subtypes(8),
+            "by_type": trends["by_type"],
+            "crowd_trend": trends["crowd_trend"],
+            "hourly_today": summary_snapshot()["hourly"],
+            "top_subtypes": trends["top_subtypes"],
+            "weapon_confidence": trends["weapon_confidence"],
         })
     except Exception as e:
         current_app.logger.error("TREND ERROR: %s", e)
         return jsonify({"error": "trend failure"}), 500
 
 
-# ---------------------- RECENT ALERTS API ----------------------
-@analytics_bp.route("/alerts/recent", methods=["GET"])
-def analytics_recent_alerts():
-    try:
-        limit = int(request.args.get("limit", 40))
-        raw = recent_alerts(limit)
-
-        out = []
-        for r in raw:
-            types = r.get("type") or []
-            conf = r.get("confidence")
-
-            # ------------- Filter: Weapon confidence < 50% ----------------
-            is_weapon = any("weapon" in t.lower() for t in types if isinstance(t, str))
-            if is_weapon:
-                if conf is None:
-                    continue
-                if float(conf) < 0.50:
-                    continue
-
-            safe = safe_doc(r)
-
-            # Pretty confidence
-            if safe.get("confidence") is not None:
-                try:
-                    safe["confidence"] = round(float(safe["confidence"]), 2)
-                except:
-                    pass
-
-            out.append(safe)
-
-        return jsonify(out)
-
-    except Exception as e:
-        current_app.logger.error("Recent Alerts ERROR: %s\n%s", e, traceback.format_exc())
-        return jsonify({"error": "alert fetch failed"}), 500
-
-
 # ---------------------- HEATMAP API ----------------------
 @analytics_bp.route("/analytics/heatmap", methods=["GET"])
 def analytics_heatmap():
     try:
-        today = datetime.now().strftime("%Y-%m-%d")
-
-        pipeline = [
-            {"$match": {"date": today}},
-            {"$group": {"_id": {"$substr": ["$time", 0, 2]}, "density": {"$avg": "$people_count"}}},
-            {"$sort": {"_id": 1}}
-        ]
-
-        docs = list(collection.aggregate(pipeline))
-        result = [{"hour": d["_id"], "density": round(d["density"] or 0, 2)} for d in docs]
-
-        return jsonify(result)
+        return jsonify(heatmap_today())
 
     except Exception as e:
         current_app.logger.error("HEATMAP ERROR: %s", e)
@@ -140,18 +76,7 @@ def analytics_heatmap():
 @analytics_bp.route("/analytics/reappearances", methods=["GET"])
 def analytics_reappearances():
     try:
-        today = datetime.now().strftime("%Y-%m-%d")
-
-        pipeline = [
-            {"$match": {"date": today, "person_name": {"$ne": None}}},
-            {"$group": {"_id": "$person_name", "count": {"$sum": 1}}},
-            {"$match": {"count": {"$gt": 1}}},
-            {"$sort": {"count": -1}},
-        ]
-
-        docs = list(collection.aggregate(pipeline))
-
-        return jsonify([{"person_name": d["_id"], "count": d["count"]} for d in docs])
+        return jsonify(reappearances_today())
 
     except Exception as e:
         current_app.logger.error("REAPPEAR ERROR: %s", e)
@@ -162,16 +87,11 @@ def analytics_reappearances():
 @analytics_bp.route("/analytics/voice_summary", methods=["GET"])
 def analytics_voice_summary():
     try:
-        total_alerts = total_alerts_today()
-        criminals_count = unique_criminals_today()
-        peak = predict_peak_hour()
-        top_loc = most_active_location()
-
-        today = datetime.now().strftime("%Y-%m-%d")
-        names = collection.distinct("person_name", {
-            "date": today,
-            "person_name": {"$ne": None}
-        })
+        summary = summary_snapshot()
+        total_alerts = summary["total"]
+        peak = summary["peak_hour"]
+        top_loc = summary["top_location"]
+        names = summary["criminals"]
 
         if names:
             criminal_text = f"Detected criminals today: {', '.join(names)}. "
@@ -195,21 +115,17 @@ def analytics_voice_summary():
 @analytics_bp.route("/analytics/voice_summary_hindi", methods=["GET"])
 def analytics_voice_summary_hindi():
     try:
-        today = datetime.now().strftime("%Y-%m-%d")
-
-        total_alerts = total_alerts_today()
-        names = collection.distinct("person_name", {
-            "date": today,
-            "person_name": {"$ne": None}
-        })
+        summary = summary_snapshot()
+        total_alerts = summary["total"]
+        names = summary["criminals"]
 
         if names:
             criminal_line = f"{len(names)} suspect mile: " + ", ".join(names)
         else:
             criminal_line = "Aaj koi suspect nahi mila"
 
-        peak = predict_peak_hour()
-        top_loc = most_active_location()
+        peak = summary["peak_hour"]
+        top_loc = summary["top_location"]
 
         text = (
             f"Aaj {total_alerts} alerts aaye. "
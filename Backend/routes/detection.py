@@ -0,0 +1,102 @@
+from flask import Blueprint, Response, jsonify, render_template
+import time
+
+import shared_state as state
+from utils.camera_utils import load_camera_config
+from detection.pipeline import CameraRegistry
+from detection.runtime import load_models, start_inference, stop_inference
+from detection.render import render_frame
+from utils.event_hub import publish
+
+detection_bp = Blueprint('detection', __name__)
+
+# ===================== START DETECTION API =====================
+@detection_bp.route('/api/start_detection', methods=['POST'])
+def start_detection_system():
+    with state.status_lock:
+        if state.detection_active:
+            return jsonify({"status": "Already running", "active": True}), 200
+
+        registry = None
+        try:
+            print("\n🚀 Starting AI Surveillance System...")
+
+            # Load YOLO models from correct folders
+            load_models()
+            print("➡️ Models loaded successfully")
+
+            # Start cameras
+            configs = load_camera_config(state.CAMERAS_CONFIG, state.DEFAULT_CAMERAS)
+            registry = CameraRegistry()
+            cameras = registry.start_all(configs)
+            if not cameras:
+                raise IOError("No camera could be opened")
+            state.camera_registry = registry
+            state.camera_manager = registry.primary().stream
+
+            state.detection_active = True
+            registry.watch_status(state.EVENTS_STATUS_INTERVAL)
+
+            # Thread pool (optionally batched) or one process per stage, depending on WORKER_MODE
+            start_inference(cameras)
+            publish("system", {"system_active": True, "cameras": registry.ids()})
+
+            print(f"✔️ AI Surveillance System Running ({len(cameras)} camera(s))")
+            return jsonify({"status": "Detection started", "active": True, "cameras": registry.ids()})
+
+        except Exception as e:
+            print("❌ ERROR starting system:", e)
+            # undo a partial start (the status watcher exits with detection_active), so a retry
+            # does not open the same devices twice
+            state.detection_active = False
+            stop_inference()
+            if registry is not None:
+                registry.stop_all()
+            state.camera_registry = None
+            state.camera_manager = None
+            return jsonify({"status": f"Error starting: {str(e)}"}), 500
+
+# ===================== STREAM GENERATOR =====================
+def generate_frames(stream_type, camera_id=None):
+    cam = None
+    while cam is None:
+        cam = state.camera_registry.get(camera_id) if state.camera_registry else None
+        if cam is None:
+            time.sleep(0.5)
+
+    # one shared encoder per camera feed; overlays are rendered there, only while someone watches
+    broadcaster = state.broadcasters.get(
+        (cam.camera_id, stream_type),
+        cam.buses["camera"],
+        render=lambda frame: render_frame(cam, stream_type, frame),
+        on_subscribers=lambda delta: cam.add_viewer(stream_type, delta),
+    )
+    yield from broadcaster.subscribe()
+
+def _feed_response(stream_type, camera_id=None):
+    if camera_id is not None and (state.camera_registry is None or state.camera_registry.get(camera_id) is None):
+        return jsonify({"error": f"Unknown camera {camera_id}"}), 404
+    return Response(generate_frames(stream_type, camera_id),
+                    mimetype='multipart/x-mixed-replace; boundary=frame')
+
+# ===================== VIDEO FEEDS =====================
+# /<type>_feed serves the primary camera, /<type>_feed/<camera_id> any camera
+@detection_bp.route('/crowd_feed')
+@detection_bp.route('/crowd_feed/<camera_id>')
+def crowd_feed(camera_id=None):
+    return _feed_response('crowd', camera_id)
+
+@detection_bp.route('/weapon_feed')
+@detection_bp.route('/weapon_feed/<camera_id>')
+def weapon_feed(camera_id=None):
+    return _feed_response('weapon', camera_id)
+
+@detection_bp.route('/violence_feed')
+@detection_bp.route('/violence_feed/<camera_id>')
+def violence_feed(camera_id=None):
+    return _feed_response('violence', camera_id)
+
+# ===================== HOME =====================
+@detection_bp.route('/')
+def home():
+    return render_template("dashboard.html")
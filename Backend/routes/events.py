@@ -0,0 +1,39 @@
+from flask import Blueprint, Response, request, stream_with_context
+
+import shared_state as state
+from utils.event_hub import get_hub, format_event
+
+events_bp = Blueprint('events', __name__)
+
+
+def _snapshot():
+    """What a fresh client needs before live events: system state and every camera's status."""
+    registry = state.camera_registry
+    messages = [format_event("system", {"system_active": state.detection_active,
+                                        "cameras": registry.ids() if registry else []})]
+    if registry:
+        messages += [format_event("status", {"camera": cam.camera_id, **cam.status()}) for cam in registry.all()]
+    return messages
+
+
+@events_bp.route('/events')
+def events():
+    """
+    Server-Sent Events: "status" (crowd count / weapon / violence changes per camera),
+    "alert" (every stored alert), "incident" (an incident closed) and "system" events.
+    Browsers reconnect on their own and send Last-Event-ID, which replays what they missed.
+    """
+    last_id = request.headers.get("Last-Event-ID") or request.args.get("last_event_id")
+    try:
+        last_id = int(last_id) if last_id else None
+    except ValueError:
+        last_id = None
+
+    hub = get_hub()
+    stream = hub.stream(last_id, heartbeat=state.EVENTS_HEARTBEAT,
+                        initial=_snapshot() if last_id is None else None)
+    return Response(
+        stream_with_context(stream),
+        content_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,24 @@
+from flask import Blueprint, jsonify, send_file
+
+from utils.evidence_store import get_evidence_store
+
+evidence_bp = Blueprint('evidence', __name__)
+
+# files are named by their content hash and never rewritten
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+
+@evidence_bp.route('/evidence/<path:rel_path>')
+def evidence_file(rel_path):
+    """
+    A stored alert snapshot or thumbnail (the alert's evidence.path / evidence.thumb).
+    The ETag is the content hash; If-None-Match answers 304 and Range requests 206.
+    """
+    store = get_evidence_store()
+    path = store.resolve(rel_path) if store is not None else None
+    if path is None:
+        return jsonify({"error": "snapshot not found"}), 404
+
+    response = send_file(path, mimetype="image/jpeg", conditional=True, etag=path.stem, max_age=31536000)
+    response.headers["Cache-Control"] = IMMUTABLE
+    return response
@@ -0,0 +1,11 @@
+from flask import Blueprint, Response
+
+from utils.metrics_utils import REGISTRY, CONTENT_TYPE
+
+metrics_bp = Blueprint('metrics', __name__)
+
+
+@metrics_bp.route('/metrics')
+def metrics():
+    """Prometheus scrape endpoint (text exposition format)."""
+    return Response(REGISTRY.render(), content_type=CONTENT_TYPE)
@@ -1,19 +1,50 @@
-from flask import Blueprint, jsonify
+from flask import Blueprint, jsonify, request
 import shared_state as state
-import time
 
 status_bp = Blueprint('status', __name__)
 
 @status_bp.route('/get_status')
 def get_status():
-    now = time.time()
-    with state.status_lock:
-        weapon_status = state.last_weapon_info if (state.last_weapon_detection_time and now - state.last_weapon_detection_time <= state.ALERT_COOLDOWN) else "Safe"
-        violence_status = state.last_violence_info if (state.last_violence_detection_time and now - state.last_violence_detection_time <= state.ALERT_COOLDOWN) else "Safe"
-    
-    return jsonify({
-        "crowd_count": state.crowd_count,
-        "weapon_status": weapon_status,
-        "violence_status": violence_status,
-        "system_active": state.detection_active
-    })
+    registry = state.camera_registry
+    camera_id = request.args.get("camera")
+    cam = registry.get(camera_id) if registry else None
+
+    if cam is not None:
+        status = cam.status()
+    else:
+        status = {"crowd_count": "0", "weapon_status": "Safe", "violence_status": "Safe"}
+
+    status["system_active"] = state.detection_active
+    if registry:
+        status["camera"] = cam.camera_id if cam else None
+        status["cameras"] = {c.camera_id: c.status() for c in registry.all()}
+    return jsonify(status)
+
+@status_bp.route('/api/cameras')
+def list_cameras():
+    registry = state.camera_registry
+    if not registry:
+        return jsonify([])
+
+    return jsonify([
+        {
+            "id": cam.camera_id,
+            "location": cam.location,
+            "active": cam.active,
+            "frames": cam.buses["camera"].seq,
+            "stages": cam.stats,
+            "viewers": dict(cam.viewers),
+            "motion": {
+                "enabled": cam.motion.enabled,
+                "active": cam.motion.active,
+                "ratio": round(cam.motion.motion_ratio, 4),
+                "skipped": dict(cam.motion.skipped),
+            },
+            "feeds": {
+                "crowd": f"/crowd_feed/{cam.camera_id}",
+                "weapon": f"/weapon_feed/{cam.camera_id}",
+                "violence": f"/violence_feed/{cam.camera_id}",
+            },
+        }
+        for cam in registry.all()
+    ])
@@ -1,27 +1,127 @@
+import os
 import threading
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent
 
 # --- THREAD LOCKS ---
-frame_lock = threading.Lock()
 status_lock = threading.Lock()
 
 # --- DETECTION STATUS ---
-processed_frames = {'crowd': None, 'weapon': None, 'violence': None}
 detection_active = False
 
 # --- MODELS ---
 yolo_crowd_model = None
 yolo_weapon_model = None
 violence_model = None
-camera_manager = None
+model_factories = {}     # name -> callable returning a fresh model instance
 
-# --- TRACKING DATA ---
-crowd_count = "0"
-crowd_history = []
-last_weapon_detection_time = None
-last_weapon_info = "Safe"
-last_violence_detection_time = None
-last_violence_info = "Safe"
+# --- CAMERAS ---
+camera_registry = None   # detection.pipeline.CameraRegistry (one CameraContext per feed)
+inference_pool = None    # detection.pipeline.InferencePool shared by all cameras
+camera_manager = None    # primary camera stream, kept for single-camera callers
 
 # --- CONSTANTS ---
-ALERT_COOLDOWN = 12
+ALERT_COOLDOWN = 12     # seconds a weapon/violence status stays on the live view after the last sighting
 DETECTION_CONF_THRESHOLD = 0.20
+# Weapon sightings below this are drawn and shown on the status but never alerted or stored
+WEAPON_ALERT_CONF = float(os.environ.get("WEAPON_ALERT_CONF", 0.50))
+
+CROWD_MODEL_PATH = BASE_DIR / "models/CrowdDetection/best.pt"
+WEAPON_MODEL_PATH = BASE_DIR / "models/Weapon_Detection/weapon.pt"
+
+# Camera list: JSON file with [{"id": "gate", "src": 0, "location": "Main Gate"}, ...]
+CAMERAS_CONFIG = os.environ.get("CAMERAS_CONFIG", str(BASE_DIR / "cameras.json"))
+DEFAULT_CAMERAS = [{"id": "cam1", "src": 0, "location": "Camera 1"}]
+
+# Inference threads shared by every camera. Unbatched, each one loads its own copy of every YOLO
+# model, so the default stays small; the cores are split between them (torch threads per worker).
+INFERENCE_WORKERS = int(os.environ.get("INFERENCE_WORKERS", min(4, os.cpu_count() or 2)))
+
+# "threads": stages run in INFERENCE_WORKERS threads inside the Flask process.
+# "processes": each stage runs in separate OS process(es) reading frames from shared memory.
+WORKER_MODE = os.environ.get("WORKER_MODE", "threads")
+PROCESS_WORKERS = {"crowd": 1, "weapon": 1, "criminal": 1}   # processes per stage in "processes" mode
+SHM_RING_SLOTS = 8
+
+# Cross-camera batching for the YOLO models: a batch closes at BATCH_MAX_SIZE frames
+# or BATCH_MAX_WAIT seconds after its first frame. BATCH_MAX_SIZE = 1 disables batching.
+BATCH_MAX_SIZE = int(os.environ.get("BATCH_MAX_SIZE", 8))
+BATCH_MAX_WAIT = float(os.environ.get("BATCH_MAX_WAIT", 0.03))
+schedulers = {}          # model name -> detection.scheduler.BatchScheduler
+
+# --- VIDEO FEEDS ---
+STREAM_MAX_FPS = float(os.environ.get("STREAM_MAX_FPS", 15))
+STREAM_JPEG_QUALITY = int(os.environ.get("STREAM_JPEG_QUALITY", 80))
+broadcasters = None      # utils.stream_utils.BroadcastRegistry, one encoder per (camera, feed)
+
+# --- DATABASE ---
+MONGO_URI = os.environ.get("MONGO_URI", "mongodb://localhost:27017/")
+# Alerts are written behind: insert_many once DB_FLUSH_MAX_DOCS are buffered or DB_FLUSH_INTERVAL
+# seconds passed; batches MongoDB can't take are spilled to DB_SPILL_PATH and replayed later.
+DB_FLUSH_MAX_DOCS = int(os.environ.get("DB_FLUSH_MAX_DOCS", 500))
+DB_FLUSH_INTERVAL = float(os.environ.get("DB_FLUSH_INTERVAL", 1.0))
+DB_WRITE_CONCERN = {"w": os.environ.get("DB_WRITE_CONCERN", "1"), "j": os.environ.get("DB_JOURNAL", "0") == "1"}
+DB_SPILL_PATH = os.environ.get("DB_SPILL_PATH", str(BASE_DIR / "data" / "db_spill.jsonl"))
+db_writer = None         # utils.db_writer.BulkWriter for the Detections collection
+# Analytics answers are cached this many seconds (and dropped whenever new alerts are stored)
+ANALYTICS_CACHE_TTL = float(os.environ.get("ANALYTICS_CACHE_TTL", 5.0))
+ALERTS_PAGE_MAX = int(os.environ.get("ALERTS_PAGE_MAX", 200))   # hard cap on /alerts/recent page size
+
+# --- ALERT DELIVERY ---
+# Telegram/MongoDB run on a dispatcher thread; detection stages only enqueue.
+ALERT_QUEUE_SIZE = int(os.environ.get("ALERT_QUEUE_SIZE", 256))
+ALERT_OVERFLOW_POLICY = os.environ.get("ALERT_OVERFLOW_POLICY", "drop_oldest")   # drop_oldest | drop_newest | block
+ALERT_WORKERS = 1
+alert_dispatcher = None  # utils.alert_dispatcher.AlertDispatcher, started on first alert
+
+# Telegram notifier: token bucket (messages/second and burst) kept under the Bot API limits
+# (TELEGRAM_RATE=0 turns it off, e.g. for a local stand-in);
+# TELEGRAM_API_URL can point at a local stand-in (python utils/telegram_fake.py).
+TELEGRAM_API_URL = os.environ.get("TELEGRAM_API_URL", "https://api.telegram.org")
+TELEGRAM_RATE = float(os.environ.get("TELEGRAM_RATE", 1.0))
+TELEGRAM_BURST = int(os.environ.get("TELEGRAM_BURST", 5))
+TELEGRAM_DEDUPE_WINDOW = float(os.environ.get("TELEGRAM_DEDUPE_WINDOW", 10.0))
+
+# --- INCIDENTS ---
+# Consecutive detections of the same thing (camera, type, identity) are one incident: one alert row
+# and one Telegram message when it opens, one update when it closes after this many quiet seconds.
+INCIDENT_IDLE_TIMEOUT = float(os.environ.get("INCIDENT_IDLE_TIMEOUT", 10.0))
+INCIDENT_MAX_DURATION = float(os.environ.get("INCIDENT_MAX_DURATION", 600.0))   # longer ones are split (and re-alert)
+incident_engine = None   # detection.incidents.IncidentEngine, started on first detection
+
+# --- FACE WATCHLIST ---
+# Per-person distance: "best" (closest enrolled sample) or "centroid" (mean of the person's samples)
+WATCHLIST_AGGREGATE = os.environ.get("WATCHLIST_AGGREGATE", "best")
+WATCHLIST_TOP_K = 3      # closest identities reported per face
+# Galleries of at least WATCHLIST_ANN_MIN encodings are searched through an IVF index (0 = always exact);
+# NPROBE partitions are scanned per face: higher = better recall, slower.
+WATCHLIST_ANN_MIN = int(os.environ.get("WATCHLIST_ANN_MIN", 20000))
+WATCHLIST_ANN_NPROBE = int(os.environ.get("WATCHLIST_ANN_NPROBE", 16))
+
+# --- EVIDENCE SNAPSHOTS ---
+# Alert frames are stored once as <EVIDENCE_DIR>/<date>/<camera>/<sha256>.jpg (+ .thumb.jpg); "" turns this off.
+EVIDENCE_DIR = os.environ.get("EVIDENCE_DIR", str(BASE_DIR / "data" / "evidence"))
+EVIDENCE_JPEG_QUALITY = int(os.environ.get("EVIDENCE_JPEG_QUALITY", 90))
+EVIDENCE_THUMB_WIDTH = int(os.environ.get("EVIDENCE_THUMB_WIDTH", 320))
+evidence_store = None    # utils.evidence_store.EvidenceStore, created on first alert
+
+# --- LIVE EVENTS (/events) ---
+# Status changes and saved alerts are pushed over Server-Sent Events; the last EVENTS_RING_SIZE
+# are kept for clients reconnecting with Last-Event-ID.
+EVENTS_RING_SIZE = int(os.environ.get("EVENTS_RING_SIZE", 256))
+EVENTS_CLIENT_QUEUE = 100        # events buffered per client before it is dropped as too slow
+EVENTS_HEARTBEAT = float(os.environ.get("EVENTS_HEARTBEAT", 15.0))
+EVENTS_STATUS_INTERVAL = 0.5     # seconds between checks for statuses that expire on their own
+event_hub = None                 # utils.event_hub.EventHub
+
+# --- MOTION GATING ---
+# Defaults for detection.motion.MotionGate; a camera entry can override them with "motion": {...}
+MOTION_DEFAULTS = {
+    "enabled": os.environ.get("MOTION_GATING", "1") != "0",
+    "sensitivity": 0.01,        # fraction of changed pixels that counts as activity
+    "pixel_threshold": 25,      # grey-level difference for a pixel to count as changed
+    "width": 160,               # analysis width in pixels
+    "hold": 2.0,                # seconds to keep running the models after the last motion
+    "refresh_interval": 5.0,    # run every model at least this often even on a static scene
+}
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# the backend modules import each other from the Backend folder (python app.py runs there)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
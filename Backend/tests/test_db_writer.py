@@ -0,0 +1,35 @@
+from datetime import datetime
+
+import mongomock
+
+from utils.db_writer import BulkWriter
+from utils.rollups import Rollups
+
+
+def test_update_lands_after_its_insert():
+    coll = mongomock.MongoClient().db.Detections
+    writer = BulkWriter(coll, max_batch=10)
+    doc = writer.write({"type": ["Weapon"], "confidence": 0.8})
+    writer.update(doc["_id"], {"incident.peak": 0.9})
+    assert writer.flush()
+
+    assert coll.find_one({"_id": doc["_id"]})["incident"] == {"peak": 0.9}
+    assert writer.stats["failed"] == 0 and writer.spilled == 0
+
+
+def test_rollups_fold_inserted_alerts():
+    db = mongomock.MongoClient().db
+    rollups = Rollups(db.DetectionsHourly, db.DetectionsDaily)
+    ts = datetime(2024, 5, 1, 13, 20)
+    docs = [{"ts": ts, "camera": "cam1", "type": ["Weapon"], "sub_type": "pistol", "confidence": 0.8},
+            {"ts": ts, "camera": "cam1", "type": ["Crowd"], "people_count": 40}]
+    writer = BulkWriter(db.Detections, on_insert=rollups.on_insert)
+    for doc in docs:
+        writer.write(doc)
+    assert writer.flush()
+
+    assert rollups.stats["failed"] == 0
+    day = db.DetectionsDaily.find_one({"_id": "cam1|2024-05-01"})
+    assert day["types"] == {"Weapon": 1, "Crowd": 1}
+    assert day["hours"] == {"13": 2}
+    assert day["weapon"]["count"] == 1
@@ -0,0 +1,40 @@
+from utils.event_hub import EventHub
+
+
+def first_messages(hub, last_event_id, count=2):
+    """The first messages a client reconnecting with last_event_id receives (after the retry line)."""
+    stream = hub.stream(last_event_id, heartbeat=0.01)
+    try:
+        assert next(stream).startswith("retry:")
+        return [next(stream) for _ in range(count)]
+    finally:
+        stream.close()
+
+
+def test_replays_missed_events():
+    hub = EventHub(ring_size=8)
+    for i in range(5):
+        hub.publish("alert", {"n": i})
+    missed = first_messages(hub, 3)
+    assert [m.splitlines()[0] for m in missed] == ["id: 4", "id: 5"]
+
+
+def test_up_to_date_client_gets_nothing():
+    hub = EventHub()
+    hub.publish("alert", {})
+    assert first_messages(hub, hub.last_id, count=1) == [": ping\n\n"]
+
+
+def test_id_from_before_a_restart_resets():
+    hub = EventHub()   # restarted server: ids start again at 1
+    hub.publish("alert", {})
+    reset = first_messages(hub, 40, count=1)[0]
+    assert "event: reset" in reset
+    assert '"last_id": 1' in reset
+
+
+def test_id_older_than_the_ring_resets():
+    hub = EventHub(ring_size=2)
+    for i in range(6):
+        hub.publish("alert", {"n": i})
+    assert "event: reset" in first_messages(hub, 1, count=1)[0]
@@ -0,0 +1,61 @@
+import threading
+
+import numpy as np
+
+import shared_state as state
+import detection.incidents as incidents
+import detection.weapon as weapon
+import utils.alert_dispatcher as alert_dispatcher
+import utils.db_utils as db_utils
+from detection.incidents import IncidentEngine
+from utils.frame_bus import FramePacket
+
+
+class FakeCam:
+    camera_id = "cam1"
+    location = "Camera 1"
+    last_violence_info = "Safe"
+    last_weapon_detection_time = None
+
+    def __init__(self):
+        self.status_lock = threading.Lock()
+
+    def set_detection(self, stage, seq, result):
+        pass
+
+    def people_count(self):
+        return 0
+
+    def publish_status(self):
+        pass
+
+
+def sighting(conf):
+    best = {"name": "pistol", "conf": conf, "box": [10, 10, 120, 120]}
+    return {"detections": [best], "best": best}
+
+
+def test_low_then_high_confidence_stores_one_alert(monkeypatch):
+    rows, updates = [], []
+
+    class Writer:
+        def write(self, doc):
+            rows.append(doc)
+
+    # alerts go straight to save_alert_to_db (no dispatcher thread, no Telegram)
+    monkeypatch.setattr(state, "incident_engine", IncidentEngine(idle_timeout=60))
+    monkeypatch.setattr(db_utils, "get_writer", lambda: Writer())
+    monkeypatch.setattr(alert_dispatcher, "dispatch_alert",
+                        lambda kind, text, frame, db: db_utils.save_alert_to_db(**db, notify=False))
+    monkeypatch.setattr(incidents, "dispatch_update", lambda kind, alert_id, fields, **_: updates.append(alert_id))
+
+    cam, frame = FakeCam(), np.zeros((240, 320, 3), dtype=np.uint8)
+    for seq, conf in enumerate((0.3, 0.35, 0.8, 0.9), start=1):
+        weapon.handle_weapon(cam, sighting(conf), FramePacket(seq, 0.0, frame))
+
+    assert len(rows) == 1
+    assert rows[0]["confidence"] == 0.8
+    assert cam.last_weapon_confidence == 0.9
+
+    state.incident_engine.close_all()
+    assert updates == [rows[0]["_id"]]
@@ -0,0 +1,219 @@
+# Backend/utils/alert_dispatcher.py
+import atexit
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Any, Callable, Dict, NamedTuple, Optional
+
+import shared_state as state
+from utils.telegram_utils import send_telegram_alert
+from utils.db_utils import save_alert_to_db, update_alert, alert_key
+from utils.evidence_store import get_evidence_store
+from utils.metrics_utils import ALERTS_QUEUED, ALERTS_DROPPED, ALERT_QUEUE_DELAY, ALERT_JOB_TIME
+
+DROP_OLDEST = "drop_oldest"   # evict the oldest queued job of the lowest priority
+DROP_NEWEST = "drop_newest"   # refuse the incoming job
+BLOCK = "block"               # wait up to put_timeout for room, then refuse the incoming job
+POLICIES = (DROP_OLDEST, DROP_NEWEST, BLOCK)
+
+# Higher survives overflow longer
+ALERT_PRIORITY = {"crowd": 0, "weapon": 2, "criminal": 2}
+
+
+class _Job(NamedTuple):
+    kind: str
+    priority: int
+    queued: float
+    fn: Callable[..., Any]
+    args: tuple
+    kwargs: dict
+
+
+class AlertDispatcher:
+    """
+    Bounded queue of alert deliveries (Telegram, MongoDB) drained by dedicated
+    worker thread(s), so detection stages only enqueue and carry on.
+
+    When the queue is full the overflow policy decides what is lost: by default
+    the oldest lowest-priority job, so a burst of crowd alerts can never push
+    out a pending weapon alert. With one worker, jobs run in submission order.
+    """
+
+    def __init__(self, maxsize: int = 256, policy: str = DROP_OLDEST, workers: int = 1,
+                 put_timeout: float = 0.25, name: str = "alerts"):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown overflow policy {policy!r} (use one of {POLICIES})")
+        self.maxsize = max(1, int(maxsize))
+        self.policy = policy
+        self.workers = max(1, int(workers))
+        self.put_timeout = put_timeout
+        self.name = name
+
+        self._cond = threading.Condition()
+        self._jobs: "deque[_Job]" = deque()
+        self._threads = []
+        self._busy = 0
+        self.running = False
+        self.stats = {"queued": 0, "done": 0, "failed": 0, "dropped": 0}
+
+    # ---------------- lifecycle ----------------
+    def start(self):
+        with self._cond:
+            if self.running:
+                return self
+            self.running = True
+        for i in range(self.workers):
+            t = threading.Thread(target=self._worker, name=f"{self.name}-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+        return self
+
+    def stop(self, drain: bool = True, timeout: float = 5.0):
+        """Stop the workers; with drain=True give queued alerts up to `timeout` seconds to go out."""
+        deadline = time.time() + timeout
+        with self._cond:
+            if drain:
+                self._cond.wait_for(lambda: not self._jobs and not self._busy, timeout)
+            self.running = False
+            self._cond.notify_all()
+        for t in self._threads:
+            t.join(timeout=max(0.0, deadline - time.time()))
+        self._threads = []
+
+    # ---------------- producer side ----------------
+    def submit(self, kind: str, fn: Callable[..., Any], *args, priority: Optional[int] = None, **kwargs) -> bool:
+        """Queue fn(*args, **kwargs); never blocks longer than put_timeout. False if the job was dropped."""
+        if priority is None:
+            priority = ALERT_PRIORITY.get(kind, 0)
+        job = _Job(kind, priority, time.time(), fn, args, kwargs)
+
+        with self._cond:
+            if len(self._jobs) >= self.maxsize:
+                if self.policy == BLOCK:
+                    self._cond.wait_for(lambda: len(self._jobs) < self.maxsize, self.put_timeout)
+                if len(self._jobs) >= self.maxsize and not self._evict_for(job):
+                    self._dropped(job)
+                    return False
+            self._jobs.append(job)
+            self.stats["queued"] += 1
+            ALERTS_QUEUED.set(len(self._jobs))
+            self._cond.notify_all()
+        return True
+
+    def _evict_for(self, job: _Job) -> bool:
+        """Under the lock: make room for `job` by evicting a queued one (drop_oldest only)."""
+        if self.policy != DROP_OLDEST:
+            return False
+        victim = min(self._jobs, key=lambda j: (j.priority, j.queued))
+        if victim.priority > job.priority:
+            return False   # everything queued matters more than the newcomer
+        self._jobs.remove(victim)
+        self._dropped(victim)
+        return True
+
+    def _dropped(self, job: _Job):
+        self.stats["dropped"] += 1
+        ALERTS_DROPPED.labels(job.kind).inc()
+        print(f"[alerts] Queue full ({self.maxsize}), dropped a {job.kind} alert")
+
+    @property
+    def pending(self) -> int:
+        with self._cond:
+            return len(self._jobs)
+
+    # ---------------- consumer side ----------------
+    def _worker(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._jobs or not self.running)
+                if not self._jobs:
+                    return
+                job = self._jobs.popleft()
+                self._busy += 1
+                ALERTS_QUEUED.set(len(self._jobs))
+                self._cond.notify_all()   # room for a blocked producer
+
+            ALERT_QUEUE_DELAY.observe(time.time() - job.queued)
+            try:
+                with ALERT_JOB_TIME.labels(job.kind).time():
+                    job.fn(*job.args, **job.kwargs)
+                ok = True
+            except Exception as e:
+                ok = False
+                print(f"[alerts] {job.kind} alert delivery failed: {e}")
+                traceback.print_exc()
+
+            with self._cond:
+                self._busy -= 1
+                self.stats["done" if ok else "failed"] += 1
+                self._cond.notify_all()
+
+
+# ===================== DEFAULT DISPATCHER =====================
+_lock = threading.Lock()
+
+
+def get_dispatcher() -> AlertDispatcher:
+    """The process-wide dispatcher (state.alert_dispatcher), created and started on first use."""
+    with _lock:
+        if state.alert_dispatcher is None:
+            state.alert_dispatcher = AlertDispatcher(
+                maxsize=state.ALERT_QUEUE_SIZE,
+                policy=state.ALERT_OVERFLOW_POLICY,
+                workers=state.ALERT_WORKERS,
+            ).start()
+            atexit.register(state.alert_dispatcher.stop)
+        return state.alert_dispatcher
+
+
+def dispatch_alert(kind: str, message: Optional[str] = None, frame=None,
+                   db: Optional[Dict[str, Any]] = None, priority: Optional[int] = None) -> bool:
+    """
+    Queue one alert: the MongoDB record save_alert_to_db(**db) plus one Telegram
+    notification with the snapshot `frame`. Returns at once.
+    """
+    return get_dispatcher().submit(kind, _deliver, message, frame, db, priority=priority)
+
+
+def dispatch_update(kind: str, alert_id, fields: Dict[str, Any], snapshot: Optional[Callable[[], Any]] = None,
+                    camera: Optional[str] = None) -> bool:
+    """Queue a change to a saved alert; the frame from `snapshot()` is stored as its incident.best first."""
+    return get_dispatcher().submit(kind, _update, alert_id, fields, snapshot, camera)
+
+
+def _store_evidence(frame, camera):
+    store = get_evidence_store()
+    if store is None or frame is None:
+        return None
+    try:
+        return store.put(frame, camera)
+    except Exception as e:
+        print(f"[alerts] Snapshot not stored: {e}")
+        return None
+
+
+def _deliver(message, frame, db):
+    # The snapshot is encoded once, into the evidence store; Telegram gets those same JPEG bytes.
+    evidence = _store_evidence(frame, db and (db.get("camera") or db.get("location")))
+    if evidence is not None:
+        frame = evidence.jpeg
+
+    # One Telegram message per alert: the detailed DB-style one when the record was saved,
+    # the stage's short text when it was filtered out (e.g. low-confidence weapon) or the insert failed.
+    saved = False
+    if db:
+        try:
+            saved = save_alert_to_db(**db, frame=frame, evidence=evidence.doc() if evidence else None)
+        except Exception as e:
+            print(f"[alerts] DB save failed: {e}")
+    if not saved and message:
+        send_telegram_alert(message, frame, key=alert_key(**db) if db else None)
+
+
+def _update(alert_id, fields, snapshot, camera):
+    if snapshot is not None:
+        evidence = _store_evidence(snapshot(), camera)
+        if evidence is not None:
+            fields = {**fields, "incident.best": evidence.doc()}
+    update_alert(alert_id, fields)
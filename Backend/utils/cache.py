@@ -0,0 +1,72 @@
+# Backend/utils/cache.py
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from utils.metrics_utils import ANALYTICS_CACHE
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error: Optional[BaseException] = None
+
+
+class TTLCache:
+    """
+    Small in-process result cache for expensive read queries.
+
+    get(key, loader) returns the stored value while it is younger than `ttl`;
+    otherwise exactly one caller runs loader() and everyone asking for the same
+    key meanwhile waits for that result (single flight), so N dashboards polling
+    at once cost one query. invalidate() drops everything, e.g. after a write;
+    a load that was already running when it happened is handed to its waiters
+    but not stored.
+    """
+
+    def __init__(self, ttl: float = 5.0, name: str = "cache"):
+        self.ttl = float(ttl)
+        self.name = name
+        self._lock = threading.Lock()
+        self._entries: Dict[Hashable, tuple] = {}      # key -> (value, loaded_at, generation)
+        self._inflight: Dict[Hashable, _Flight] = {}
+        self._generation = 0
+
+    def get(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[2] == self._generation and time.monotonic() - entry[1] < self.ttl:
+                ANALYTICS_CACHE.labels(self.name, "hit").inc()
+                return entry[0]
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+                generation = self._generation
+
+        if not leader:
+            ANALYTICS_CACHE.labels(self.name, "shared").inc()
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        ANALYTICS_CACHE.labels(self.name, "miss").inc()
+        try:
+            flight.value = loader()
+            return flight.value
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+                if flight.error is None and generation == self._generation:
+                    self._entries[key] = (flight.value, time.monotonic(), generation)
+            flight.done.set()
+
+    def invalidate(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
@@ -0,0 +1,144 @@
+# Backend/utils/camera_utils.py
+import json
+import threading
+import time
+from pathlib import Path
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+
+from utils.frame_bus import FrameBus
+from utils.frame_sources import open_source, PACED, UNTHROTTLED
+from utils.metrics_utils import CAPTURE_INTERVAL, FRAMES_CAPTURED, FRAMES_DUPLICATE
+
+
+def same_frame(a, b) -> bool:
+    """Identical pixels (a stalled or repeating source); a strided sample rules out almost every pair cheaply."""
+    if a is b:
+        return True
+    if a.shape != b.shape or not np.array_equal(a[::16, ::16], b[::16, ::16]):
+        return False
+    return np.array_equal(a, b)
+
+
+# ===================== CAMERA STREAM CLASS =====================
+class CameraStream:
+    """
+    Capture thread that publishes every grabbed frame on a FrameBus.
+
+    `src` is anything open_source() understands (webcam index, video file,
+    image directory, stream URL) or a FrameSource. Live sources are paced by
+    the device. Recorded footage is played at its native rate in "paced"
+    mode or as fast as it decodes in "unthrottled" mode; at the end it either
+    starts over (loop=True) or the bus is closed.
+    """
+
+    def __init__(self, src=0, name=None, mode: str = PACED, loop: bool = False, fps: Optional[float] = None):
+        if mode not in (PACED, UNTHROTTLED):
+            raise ValueError(f"Unknown playback mode {mode!r} (use '{PACED}' or '{UNTHROTTLED}')")
+        self.source = open_source(src, fps=fps)
+        self.src = src
+        self.mode = mode
+        self.loop = loop
+        self.bus = FrameBus(name or str(src))
+        self.finished = False
+
+        self.grabbed, frame = self.source.read()
+        if self.grabbed:
+            self.bus.publish(frame)
+        self.started = False
+        self.thread = threading.Thread(target=self.update, daemon=True)
+
+    def start(self):
+        if not self.started:
+            self.started = True
+            self.thread.start()
+        return self
+
+    def update(self):
+        # Live sources: read() blocks until the device delivers the next frame,
+        # so the loop is paced by the camera rather than by a sleep.
+        # Recorded sources in paced mode sleep up to the next frame's slot on a
+        # fixed schedule, so decode time doesn't slow playback down.
+        paced = not self.source.live and self.mode == PACED
+        interval = 1.0 / self.source.fps if paced and self.source.fps else 0.0
+        next_due = time.time() + interval
+        interval_metric = CAPTURE_INTERVAL.labels(self.bus.name)
+        captured_metric = FRAMES_CAPTURED.labels(self.bus.name)
+        duplicate_metric = FRAMES_DUPLICATE.labels(self.bus.name)
+        last_frame_at = last_frame = None
+
+        while self.started:
+            if interval:
+                wait = next_due - time.time()
+                if wait > 0:
+                    time.sleep(wait)
+                next_due = max(next_due + interval, time.time() - interval)
+
+            grabbed, frame = self.source.read()
+            self.grabbed = grabbed
+            if grabbed:
+                packet = self.bus.publish(frame)
+                if last_frame_at is not None:
+                    interval_metric.observe(packet.ts - last_frame_at)
+                last_frame_at = packet.ts
+                captured_metric.inc()
+                if last_frame is not None and same_frame(frame, last_frame):
+                    duplicate_metric.inc()
+                last_frame = frame
+            elif self.source.eof:
+                if self.loop and self.source.rewind():
+                    continue
+                print(f"[camera] {self.bus.name}: end of {self.source}")
+                self.finished = True
+                break
+            else:
+                time.sleep(0.05)   # device hiccup: back off instead of spinning
+        self.bus.close()
+
+    def read(self):
+        packet = self.bus.latest()
+        if packet is None:
+            return False, None
+        return self.grabbed, packet.frame
+
+    def stop(self):
+        self.started = False
+        if self.thread.is_alive():
+            self.thread.join()
+        self.source.release()
+
+
+# ===================== CAMERA CONFIG =====================
+def load_camera_config(path, defaults: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Read the camera list from a JSON file.
+
+    The file may hold either a list of camera entries or {"cameras": [...]}.
+    Each entry needs a "src" (webcam index, video file, image directory or
+    stream URL); "id" and "location" are optional and default to cam<N> / the
+    id. Recorded sources also take "mode" (paced/unthrottled), "loop" and "fps".
+    """
+    cameras = defaults
+    path = Path(path) if path else None
+    if path is not None and path.exists():
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        cameras = data.get("cameras", []) if isinstance(data, dict) else data
+        print(f"[camera] Loaded {len(cameras)} camera(s) from {path}")
+
+    out = []
+    seen = set()
+    for i, entry in enumerate(cameras):
+        cfg = dict(entry)
+        if "src" not in cfg:
+            print(f"[camera] Skipping entry {i}: no 'src'")
+            continue
+        cfg["id"] = str(cfg.get("id") or f"cam{i + 1}")
+        if cfg["id"] in seen:
+            print(f"[camera] Skipping duplicate camera id {cfg['id']}")
+            continue
+        seen.add(cfg["id"])
+        cfg.setdefault("location", cfg["id"])
+        out.append(cfg)
+    return out
@@ -1,16 +1,63 @@
 # Backend/utils/db_utils.py
+import atexit
+import base64
+import threading
+from bson import ObjectId
 from pymongo import MongoClient
 from datetime import datetime, timedelta
 from typing import List, Dict, Any, Optional
 
+import shared_state as state
+from utils.db_writer import BulkWriter
+from utils.rollups import Rollups, merge
+from utils.cache import TTLCache
+from utils.event_hub import publish
+
 # IMPORT TELEGRAM
 from utils.telegram_utils import send_telegram_alert
 
 
 # ------------- MONGO CONNECTION -------------
-client = MongoClient("mongodb://localhost:27017/")
+client = MongoClient(state.MONGO_URI, serverSelectionTimeoutMS=5000)
 db = client["SecurityAlerts"]
 collection = db["Detections"]
+rollups = Rollups(db["DetectionsHourly"], db["DetectionsDaily"])   # maintained on every insert
+analytics_cache = TTLCache(state.ANALYTICS_CACHE_TTL, name="analytics")
+
+_writer_lock = threading.Lock()
+
+
+def get_writer() -> BulkWriter:
+    """Write-behind buffer for `collection` (state.db_writer), started on first use."""
+    with _writer_lock:
+        if state.db_writer is None:
+            w = state.DB_WRITE_CONCERN.get("w", "1")
+            state.db_writer = BulkWriter(
+                collection,
+                max_batch=state.DB_FLUSH_MAX_DOCS,
+                flush_interval=state.DB_FLUSH_INTERVAL,
+                write_concern={**state.DB_WRITE_CONCERN, "w": int(w) if str(w).isdigit() else w},
+                spill_path=state.DB_SPILL_PATH,
+                on_insert=_on_insert,
+            ).start()
+        return state.db_writer
+
+
+def _on_insert(docs):
+    # runs on the writer thread after each stored batch
+    rollups.on_insert(docs)
+    analytics_cache.invalidate()
+    for doc in docs:
+        publish("alert", {"_id": doc["_id"], **{f: doc.get(f) for f in ALERT_FIELDS}})
+
+
+def _close_writer():
+    # registered at import, before the alert dispatcher's hook, so it runs after the dispatcher drained
+    if state.db_writer is not None:
+        state.db_writer.close()
+
+
+atexit.register(_close_writer)
 
 
 # =====================================================
@@ -34,6 +81,47 @@ def recommendation_text(alert_type, sub_type=None):
     return "Please monitor the area."
 
 
+# =====================================================
+# 🔥 Telegram message for an alert
+# =====================================================
+def alert_message(
+    alert_type: str,
+    sub_type: Optional[str] = None,
+    person_name: Optional[str] = None,
+    confidence: Optional[float] = None,
+    people_count: Optional[int] = None,
+    location: str = "Camera 1",
+    violence_detected: bool = False,
+    when: Optional[datetime] = None,
+) -> str:
+    now = when or datetime.now()
+    readable_conf = f"{round(confidence * 100)}%" if confidence else "N/A"
+    violence_text = "Yes" if violence_detected else "No"
+
+    return f"""
+🚨 *SECURITY ALERT DETECTED*  
+
+• *Type:* {alert_type}  
+• *Subtype:* {sub_type or "-"}  
+• *Criminal:* {person_name or "-"}  
+• *Confidence:* {readable_conf}  
+• *People Count:* {people_count or 0}  
+• *Violence:* {violence_text}  
+• *Location:* {location}  
+• *Time:* {now.strftime("%d-%b-%Y %H:%M:%S")}  
+
+⚠️ *Risk Level:* {"HIGH" if confidence and confidence >= 0.75 else "MODERATE"}  
+
+🔍 *Recommended Action:*  
+{recommendation_text(alert_type, sub_type)}
+"""
+
+
+def alert_key(alert_type: str, sub_type=None, person_name=None, location: str = "Camera 1", **_) -> str:
+    """Identity of an alert for Telegram de-duplication (same thing, same place)."""
+    return f"{alert_type}|{sub_type or ''}|{person_name or ''}|{location}"
+
+
 # =====================================================
 # 🔥 Save alert + Telegram notifier
 # =====================================================
@@ -45,14 +133,24 @@ def save_alert_to_db(
     people_count: Optional[int] = None,
     location: str = "Camera 1",
     violence_detected: bool = False,
-    frame=None
-) -> None:
+    frame=None,
+    notify: bool = True,
+    camera: Optional[str] = None,
+    alert_id: Optional[ObjectId] = None,
+    incident: Optional[Dict[str, Any]] = None,
+    evidence: Optional[Dict[str, Any]] = None,
+) -> bool:
+    """
+    Insert the alert; with notify=True also queue its Telegram message (with `frame`). False if filtered out.
+    An incident's opening alert passes its id and the "incident" subdocument that update_alert() closes later;
+    `evidence` is the stored snapshot (utils.evidence_store.Evidence.doc()).
+    """
 
     # ========== WEAPON CONFIDENCE RULE ==========
     if alert_type and alert_type.lower() == "weapon":
-        if confidence is None or float(confidence) < 0.50:
-            print(f"[DB] Weapon ignored (< 50% conf): {confidence}")
-            return
+        if confidence is None or float(confidence) < state.WEAPON_ALERT_CONF:
+            print(f"[DB] Weapon ignored (< {state.WEAPON_ALERT_CONF:.0%} conf): {confidence}")
+            return False
 
     # ========== SAVE INTO MONGO ==========
     now = datetime.now()
@@ -63,135 +161,305 @@ def save_alert_to_db(
         "confidence": float(confidence) if confidence else None,
         "people_count": int(people_count) if people_count else 0,
         "violence_detected": bool(violence_detected),
-        "date": now.strftime("%Y-%m-%d"),
+        "ts": now,
+        "date": now.strftime("%Y-%m-%d"),     # kept for the dashboard / older readers
         "time": now.strftime("%H:%M:%S"),
+        "camera": camera or location,
         "location": location,
     }
-
-    collection.insert_one(doc)
+    if alert_id is not None:
+        doc["_id"] = alert_id
+    if incident is not None:
+        doc["incident"] = incident
+    if evidence is not None:
+        doc["evidence"] = evidence
+
+    get_writer().write(doc)
     print("[DB] Alert Saved:", doc)
 
-    # ========== BUILD TELEGRAM MESSAGE ==========
-    readable_conf = f"{round(confidence * 100)}%" if confidence else "N/A"
-    violence_text = "Yes" if violence_detected else "No"
-
-    msg = f"""
-🚨 *SECURITY ALERT DETECTED*  
+    # ========== SEND TELEGRAM ALERT ==========
+    if notify:
+        try:
+            msg = alert_message(alert_type, sub_type, person_name, confidence, people_count,
+                                location, violence_detected, when=now)
+            send_telegram_alert(msg, frame, key=alert_key(alert_type, sub_type, person_name, location))
+        except Exception as e:
+            print("[TELEGRAM ERROR]", e)
+    return True
 
-• *Type:* {alert_type}  
-• *Subtype:* {sub_type or "-"}  
-• *Criminal:* {person_name or "-"}  
-• *Confidence:* {readable_conf}  
-• *People Count:* {people_count or 0}  
-• *Violence:* {violence_text}  
-• *Location:* {location}  
-• *Time:* {now.strftime("%d-%b-%Y %H:%M:%S")}  
 
-⚠️ *Risk Level:* {"HIGH" if confidence and confidence >= 0.75 else "MODERATE"}  
+def update_alert(alert_id: ObjectId, fields: Dict[str, Any]):
+    """Queue a $set on a saved alert (applied after its insert, even across a spill/replay)."""
+    get_writer().update(alert_id, fields)
 
-🔍 *Recommended Action:*  
-{recommendation_text(alert_type, sub_type)}
-"""
 
-    # ========== SEND TELEGRAM ALERT ==========
+# =====================================================
+# INDEXES
+# =====================================================
+# `ts` is a native datetime in local wall-clock time (same clock as the
+# date/time strings), so $hour / $dateToString need no timezone argument.
+INDEXES = [
+    [("ts", -1), ("_id", -1)],          # also the keyset order of find_alerts()
+    [("type", 1), ("ts", -1)],
+    [("camera", 1), ("ts", -1)],
+    [("person_name", 1), ("ts", -1)],
+    [("location", 1), ("ts", -1)],
+]
+
+
+def ensure_indexes(coll=None) -> bool:
+    """Create the analytics indexes (no-op for the ones that exist). False if MongoDB is unreachable."""
+    coll = coll if coll is not None else collection
     try:
-        send_telegram_alert(msg, frame)
+        for keys in INDEXES:
+            coll.create_index(keys, background=True)
+        if coll is collection:
+            rollups.ensure_indexes()
+        print(f"[DB] Indexes ready on {coll.name}")
+        return True
     except Exception as e:
-        print("[TELEGRAM ERROR]", e)
+        print(f"[DB] Could not create indexes: {e}")
+        return False
 
 
 # =====================================================
-# ANALYTICS HELPERS (unchanged)
+# ANALYTICS HELPERS
 # =====================================================
+# Counts come from the hourly/daily rollups (one small document per camera per
+# bucket), so their cost does not grow with the number of stored alerts. Each
+# dashboard endpoint is one $facet query over the daily rollups, cached in
+# analytics_cache until the TTL runs out or new alerts are stored.
+SUMMARY_LOCATION_DAYS = 30
+
+
+def day_range(day: Optional[datetime] = None):
+    """[start, end) of the calendar day containing `day` (today by default)."""
+    start = (day or datetime.now()).replace(hour=0, minute=0, second=0, microsecond=0)
+    return start, start + timedelta(days=1)
+
+
+def _since(days: int) -> datetime:
+    # whole days, today included, like the old "date >= since" string match
+    return day_range(datetime.now() - timedelta(days=days))[0]
+
+
+def _ranked(counts: Dict[str, int], limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    ranked = sorted(counts.items(), key=lambda kv: (-kv[1], kv[0]))
+    return [{"_id": k, "count": v} for k, v in ranked[:limit]]
+
+
+def _peak_hour(hours: Dict[str, int]) -> str:
+    if not hours:
+        return "No activity"
+    hour = int(min(hours, key=lambda h: (-hours[h], h)))
+    return f"{hour:02d}:00 - {hour:02d}:59"
+
+
+def _load_summary() -> Dict[str, Any]:
+    today, _ = day_range()
+    [res] = rollups.daily.aggregate([
+        {"$match": {"bucket": {"$gte": _since(SUMMARY_LOCATION_DAYS)}}},
+        {"$facet": {
+            "today": [{"$match": {"bucket": today}}],
+            "top_location": [
+                {"$group": {"_id": {"$ifNull": ["$location", "$camera"]}, "count": {"$sum": "$total"}}},
+                {"$sort": {"count": -1, "_id": 1}},
+                {"$limit": 1},
+            ],
+        }},
+    ])
+    day = merge(res["today"])
+    top = res["top_location"]
+    return {
+        "total": day["total"],
+        "criminals": sorted(day["persons"]),
+        "reappearances": [{"person_name": r["_id"], "count": r["count"]}
+                          for r in _ranked(day["persons"]) if r["count"] > 1],
+        "hourly": [{"hour": h, "count": n} for h, n in sorted(day["hours"].items())],
+        "peak_hour": _peak_hour(day["hours"]),
+        "top_location": top[0]["_id"] if top else "N/A",
+    }
+
+
+def summary_snapshot() -> Dict[str, Any]:
+    """Today's totals, criminals, hourly counts, peak hour and the busiest location (30 days)."""
+    return analytics_cache.get("summary", _load_summary)
+
+
+def _load_trends(days: int, subtype_days: int, subtype_limit: int) -> Dict[str, Any]:
+    since = _since(days)
+    [res] = rollups.daily.aggregate([
+        {"$match": {"bucket": {"$gte": _since(max(days, subtype_days))}}},
+        {"$facet": {
+            "window": [{"$match": {"bucket": {"$gte": since}}}],
+            "subtypes": [{"$match": {"subtypes": {"$exists": True}}}, {"$project": {"subtypes": 1, "bucket": 1}}],
+        }},
+    ])
+    window = merge(res["window"])
+    by_day: Dict[datetime, List[dict]] = {}
+    for doc in res["window"]:
+        by_day.setdefault(doc["bucket"], []).append(doc)
+    crowd = []
+    for day, docs in sorted(by_day.items()):
+        m = merge(docs)
+        crowd.append({"date": day.strftime("%Y-%m-%d"),
+                      "avg_people": round(m["people_sum"] / m["total"], 2) if m["total"] else 0})
+    w = window["weapon"]
+    return {
+        "by_type": _ranked(window["types"]),
+        "crowd_trend": crowd,
+        "top_subtypes": _ranked(merge(d for d in res["subtypes"] if d["bucket"] >= _since(subtype_days))["subtypes"],
+                                subtype_limit),
+        "weapon_confidence": {
+            "count": w["count"],
+            "avg": round(w["conf_sum"] / w["count"], 3) if w["count"] else None,
+            "min": w["conf_min"],
+            "max": w["conf_max"],
+        },
+    }
+
+
+def trends_snapshot(days: int = 7, subtype_days: int = 30, subtype_limit: int = 8) -> Dict[str, Any]:
+    """Type counts, crowd trend and weapon confidence over `days`, top subtypes over `subtype_days`."""
+    return analytics_cache.get(("trends", days, subtype_days, subtype_limit),
+                               lambda: _load_trends(days, subtype_days, subtype_limit))
+
+
 def total_alerts_today() -> int:
-    today = datetime.now().strftime("%Y-%m-%d")
-    return collection.count_documents({"date": today})
+    return summary_snapshot()["total"]
+
+
+def criminal_names_today() -> List[str]:
+    return summary_snapshot()["criminals"]
 
 
 def unique_criminals_today() -> int:
-    today = datetime.now().strftime("%Y-%m-%d")
-    return len(
-        collection.distinct(
-            "person_name",
-            {"date": today, "person_name": {"$ne": None}}
-        )
-    )
+    return len(summary_snapshot()["criminals"])
 
 
-def alerts_last_n_days(days: int = 7) -> List[Dict[str, Any]]:
-    since = (datetime.now() - timedelta(days=days)).strftime("%Y-%m-%d")
-    return list(collection.find({"date": {"$gte": since}}))
+def reappearances_today() -> List[Dict[str, Any]]:
+    """People seen more than once today, most frequent first."""
+    return summary_snapshot()["reappearances"]
+
+
+def hourly_counts_today() -> List[Dict[str, Any]]:
+    return summary_snapshot()["hourly"]
+
+
+def predict_peak_hour() -> str:
+    return summary_snapshot()["peak_hour"]
+
+
+def most_active_location() -> str:
+    return summary_snapshot()["top_location"]
 
 
 def aggregate_type_counts(days: int = 7) -> List[Dict[str, Any]]:
-    since = (datetime.now() - timedelta(days=days)).strftime("%Y-%m-%d")
-    pipeline = [
-        {"$match": {"date": {"$gte": since}}},
-        {"$unwind": {"path": "$type"}},
-        {"$group": {"_id": "$type", "count": {"$sum": 1}}},
-        {"$sort": {"count": -1}},
-    ]
-    return list(collection.aggregate(pipeline))
-
-
-def aggregate_top_subtypes(limit: int = 8) -> List[Dict[str, Any]]:
-    pipeline = [
-        {"$match": {"sub_type": {"$ne": None}}},
-        {"$group": {"_id": "$sub_type", "count": {"$sum": 1}}},
-        {"$sort": {"count": -1}},
-        {"$limit": limit},
-    ]
-    return list(collection.aggregate(pipeline))
+    return trends_snapshot(days)["by_type"]
+
+
+def aggregate_top_subtypes(limit: int = 8, days: int = 30) -> List[Dict[str, Any]]:
+    return trends_snapshot(subtype_days=days, subtype_limit=limit)["top_subtypes"]
 
 
 def crowd_trend(days: int = 7) -> List[Dict[str, Any]]:
-    since = (datetime.now() - timedelta(days=days)).strftime("%Y-%m-%d")
-    pipeline = [
-        {"$match": {"date": {"$gte": since}}},
-        {
-            "$group": {
-                "_id": "$date",
-                "avg_people": {"$avg": {"$ifNull": ["$people_count", 0]}},
-            }
-        },
-        {"$sort": {"_id": 1}},
-    ]
-    return [
-        {"date": doc["_id"], "avg_people": round(doc.get("avg_people", 0), 2)}
-        for doc in collection.aggregate(pipeline)
-    ]
+    return trends_snapshot(days)["crowd_trend"]
 
 
-def hourly_counts_today() -> List[Dict[str, Any]]:
-    today = datetime.now().strftime("%Y-%m-%d")
-    pipeline = [
-        {"$match": {"date": today}},
-        {"$group": {"_id": {"$substr": ["$time", 0, 2]}, "count": {"$sum": 1}}},
-        {"$sort": {"_id": 1}},
-    ]
-    return [{"hour": doc["_id"], "count": doc["count"]} for doc in collection.aggregate(pipeline)]
+def weapon_confidence(days: int = 7) -> Dict[str, Any]:
+    return trends_snapshot(days)["weapon_confidence"]
 
 
-def recent_alerts(limit: int = 50) -> List[Dict[str, Any]]:
-    return list(collection.find().sort([("_id", -1)]).limit(limit))
+def _load_heatmap() -> List[Dict[str, Any]]:
+    out = []
+    by_hour: Dict[int, List[dict]] = {}
+    for doc in rollups.hours(*day_range()):
+        by_hour.setdefault(doc["bucket"].hour, []).append(doc)
+    for hour, docs in sorted(by_hour.items()):
+        m = merge(docs)
+        out.append({"hour": f"{hour:02d}", "density": round(m["people_sum"] / m["total"], 2) if m["total"] else 0})
+    return out
 
 
-def predict_peak_hour() -> str:
-    hourly = hourly_counts_today()
-    if not hourly:
-        return "No activity"
+def heatmap_today() -> List[Dict[str, Any]]:
+    """Average people count per hour of today."""
+    return analytics_cache.get("heatmap", _load_heatmap)
 
-    top = max(hourly, key=lambda x: x["count"])
-    hour = int(top["hour"])
-    return f"{hour:02d}:00 - {hour:02d}:59"
 
+def alerts_last_n_days(days: int = 7) -> List[Dict[str, Any]]:
+    return list(collection.find({"ts": {"$gte": _since(days)}}).sort([("ts", -1)]))
+
+
+# =====================================================
+# ALERT BROWSING (keyset pagination)
+# =====================================================
+ALERT_FIELDS = ("type", "sub_type", "person_name", "confidence", "people_count", "violence_detected",
+                "ts", "date", "time", "camera", "location", "incident", "evidence")
+
+# legacy rows: weapon alerts under WEAPON_ALERT_CONF were stored before save_alert_to_db filtered them
+_CONFIDENT_WEAPONS = {"$or": [{"type": {"$ne": "Weapon"}}, {"confidence": {"$gte": state.WEAPON_ALERT_CONF}}]}
 
-def most_active_location() -> str:
-    pipeline = [
-        {"$group": {"_id": "$location", "count": {"$sum": 1}}},
-        {"$sort": {"count": -1}},
-        {"$limit": 1},
-    ]
-    docs = list(collection.aggregate(pipeline))
-    return docs[0]["_id"] if docs else "N/A"
 
+def encode_cursor(doc: dict) -> str:
+    raw = f"{doc['ts'].isoformat(timespec='milliseconds')}|{doc['_id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    """(ts, _id) of the last row of the previous page; ValueError if it isn't one of ours."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        ts, oid = raw.split("|")
+        return datetime.fromisoformat(ts), ObjectId(oid)
+    except Exception:
+        raise ValueError("invalid cursor")
+
+
+def find_alerts(
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    types: Optional[List[str]] = None,
+    camera: Optional[str] = None,
+    person: Optional[str] = None,
+    min_confidence: Optional[float] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    fields: Optional[List[str]] = None,
+):
+    """
+    One page of alerts, newest first, and the cursor of the next page (None on
+    the last one). Pages are keyset ranges on (ts, _id), so page N costs the
+    same as page 1. Alerts without ts (not migrated) are not listed.
+    """
+    query: Dict[str, Any] = {"ts": {"$type": "date"}}
+    if since is not None:
+        query["ts"]["$gte"] = since
+    if until is not None:
+        query["ts"]["$lt"] = until
+    if types:
+        query["type"] = {"$in": list(types)}
+    if camera:
+        query["camera"] = camera
+    if person:
+        query["person_name"] = person
+    if min_confidence is not None:
+        query["confidence"] = {"$gte": float(min_confidence)}
+
+    clauses = [query, _CONFIDENT_WEAPONS]
+    if cursor:
+        ts, oid = decode_cursor(cursor)
+        clauses.append({"$or": [{"ts": {"$lt": ts}}, {"ts": ts, "_id": {"$lt": oid}}]})
+
+    projection = {f: 1 for f in (fields or ALERT_FIELDS) if f in ALERT_FIELDS}
+    projection["ts"] = 1
+    docs = list(
+        collection.find({"$and": clauses}, projection)
+        .sort([("ts", -1), ("_id", -1)])
+        .limit(limit + 1)
+    )
+    next_cursor = encode_cursor(docs[limit - 1]) if len(docs) > limit else None
+    return docs[:limit], next_cursor
+
+
+def recent_alerts(limit: int = 50) -> List[Dict[str, Any]]:
+    return find_alerts(limit)[0]
@@ -0,0 +1,345 @@
+# Backend/utils/db_writer.py
+import os
+import threading
+import time
+import traceback
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from bson import ObjectId, json_util
+
+from utils.metrics_utils import (
+    DB_INSERT_TIME, DB_FLUSH_SIZE, DB_WRITE_LAG, DB_BUFFERED, DB_SPILLED, DB_WRITE_ERRORS,
+)
+
+DUPLICATE_KEY = 11000
+UPDATE_OP = "_op"     # marks a buffered/spilled update (inserted documents never carry this key)
+
+
+def _write_errors(exc) -> Optional[List[dict]]:
+    """writeErrors of a bulk write failure (pymongo or mongomock), None for any other error."""
+    details = getattr(exc, "details", None)
+    if isinstance(details, dict) and "writeErrors" in details:
+        return details["writeErrors"]
+    return None
+
+
+_bulk_fallback_logged = set()
+
+
+def bulk_write(collection, ops: list, ordered: bool = True):
+    """
+    collection.bulk_write(ops), or one update_one per UpdateOne where the
+    collection can't take the driver's operations (mongomock 4.3 rejects the
+    `sort` field pymongo >= 4.11 puts on every UpdateOne with a TypeError).
+    """
+    try:
+        return collection.bulk_write(ops, ordered=ordered)
+    except TypeError as e:
+        kind = type(collection).__module__
+        if kind not in _bulk_fallback_logged:
+            _bulk_fallback_logged.add(kind)
+            print(f"[db] bulk_write unsupported by {kind} ({e}), falling back to update_one per operation")
+    for op in ops:
+        collection.update_one(op._filter, op._doc, upsert=op._upsert)
+    return None
+
+
+def _unavailable(exc) -> bool:
+    """Connection, server selection or timeout failure (worth spilling and retrying later)."""
+    try:
+        from pymongo.errors import AutoReconnect, ConnectionFailure, ExecutionTimeout, WTimeoutError
+    except ImportError:
+        return True
+    return isinstance(exc, (AutoReconnect, ConnectionFailure, ExecutionTimeout, WTimeoutError))
+
+
+class BulkWriter:
+    """
+    Write-behind buffer for one collection.
+
+    write() only appends to an in-memory buffer; a flusher thread sends the
+    buffer with insert_many(ordered=False) once it holds max_batch documents or
+    flush_interval seconds after the oldest one arrived. Every document gets its
+    _id on write(), so a batch that is retried or replayed can never be stored
+    twice (the duplicates come back as ignored duplicate-key errors).
+
+    If the server is unreachable a failed batch is appended to `spill_path`
+    (MongoDB extended JSON, one document per line) and replayed, oldest first,
+    as soon as a write succeeds again. Works with any pymongo-compatible
+    collection, including mongomock's.
+
+    `on_insert(docs)` is called on the flusher thread with the documents each
+    insert actually stored (not the duplicates of an earlier attempt).
+
+    update(_id, fields) queues a $set on a document written earlier. Inserts and
+    updates share the buffer and the spill file, so an update is never applied
+    before the insert it refers to.
+    """
+
+    def __init__(self, collection, max_batch: int = 500, flush_interval: float = 1.0,
+                 write_concern: Optional[Dict[str, Any]] = None, spill_path=None,
+                 retry_interval: float = 5.0, name: str = "db",
+                 on_insert: Optional[Callable[[List[dict]], None]] = None):
+        if write_concern:
+            from pymongo import WriteConcern
+            collection = collection.with_options(write_concern=WriteConcern(**write_concern))
+        self.collection = collection
+        self.max_batch = max(1, int(max_batch))
+        self.flush_interval = float(flush_interval)
+        self.spill_path = Path(spill_path) if spill_path else None
+        self.retry_interval = retry_interval
+        self.name = name
+        self.on_insert = on_insert
+
+        self._cond = threading.Condition()
+        self._buffer: List[dict] = []
+        self._written_at: List[float] = []
+        self._oldest = None
+        self._flushing = False
+        self._flush_requested = False
+        self._thread = None
+        self.running = False
+        self.healthy = True
+        self.spilled = self._count_spilled()
+        self.stats = {"written": 0, "updated": 0, "flushed": 0, "flushes": 0, "spilled": 0, "replayed": 0,
+                      "failed": 0}
+        DB_SPILLED.set(self.spilled)
+
+    # ---------------- lifecycle ----------------
+    def start(self):
+        with self._cond:
+            if self.running:
+                return self
+            self.running = True
+        self._thread = threading.Thread(target=self._loop, name=f"{self.name}-writer", daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self, timeout: float = 10.0):
+        """Flush what is buffered and stop the flusher thread."""
+        self.flush(timeout)
+        with self._cond:
+            self.running = False
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    # ---------------- producer side ----------------
+    def write(self, doc: dict) -> dict:
+        """Queue one document (an _id is assigned here) and return it."""
+        doc.setdefault("_id", ObjectId())
+        self._append(doc, "written")
+        return doc
+
+    def update(self, _id, fields: Dict[str, Any]):
+        """Queue a $set of `fields` on the document with this _id."""
+        self._append({UPDATE_OP: "set", "_id": _id, "fields": fields}, "updated")
+
+    def _append(self, item: dict, counter: str):
+        with self._cond:
+            if not self._buffer:
+                self._oldest = time.time()
+            self._buffer.append(item)
+            self._written_at.append(time.time())
+            self.stats[counter] += 1
+            DB_BUFFERED.set(len(self._buffer))
+            if len(self._buffer) >= self.max_batch:
+                self._cond.notify_all()
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """Block until everything written so far has been sent (or spilled). False on timeout."""
+        deadline = time.time() + timeout
+        with self._cond:
+            if not self.running:
+                # no flusher thread (not started / closed): do it on the caller's thread
+                self._flush_once()
+                while self._buffer:
+                    self._flush_once()
+                return True
+            self._flush_requested = True
+            self._cond.notify_all()
+            while self._buffer or self._flushing or self._flush_requested:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    @property
+    def buffered(self) -> int:
+        with self._cond:
+            return len(self._buffer)
+
+    # ---------------- flusher side ----------------
+    def _due(self) -> bool:
+        if self._flush_requested or len(self._buffer) >= self.max_batch:
+            return True
+        return bool(self._buffer) and time.time() - self._oldest >= self.flush_interval
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                while self.running and not self._due():
+                    if self._buffer:
+                        timeout = max(0.0, self._oldest + self.flush_interval - time.time())
+                    else:
+                        timeout = self.retry_interval if self.spilled else None
+                    if not self._cond.wait(timeout) and not self._buffer and self.spilled:
+                        break   # idle with a spill file: time to try replaying it
+                if not self.running and not self._buffer:
+                    return
+                self._flush_once()
+
+    def _flush_once(self):
+        """Called with the lock held; releases it while talking to the server."""
+        batch, written_at = self._buffer[:self.max_batch], self._written_at[:self.max_batch]
+        del self._buffer[:self.max_batch]
+        del self._written_at[:self.max_batch]
+        self._oldest = self._written_at[0] if self._written_at else None
+        self._flush_requested = bool(self._buffer) and self._flush_requested
+        self._flushing = True
+        DB_BUFFERED.set(len(self._buffer))
+        self._cond.release()
+        try:
+            failed = False
+            if batch and not self.spilled:
+                if self._write(batch):
+                    now = time.time()
+                    for t in written_at:
+                        DB_WRITE_LAG.observe(now - t)
+                else:
+                    self._spill(batch)
+                    failed = True
+            elif batch:
+                # older writes are still on disk: queue behind them to keep inserts before their updates
+                self._spill(batch)
+            if self.spilled and not failed:
+                self._replay()
+        except Exception as e:
+            print(f"[{self.name}] Flush failed unexpectedly: {e}")
+            traceback.print_exc()
+        finally:
+            self._cond.acquire()
+            self._flushing = False
+            self._cond.notify_all()
+
+    def _write(self, items: List[dict]) -> bool:
+        """Inserts of the batch first, then its updates; False (nothing to retry separately) if the server is gone."""
+        inserts = [item for item in items if UPDATE_OP not in item]
+        updates = [item for item in items if UPDATE_OP in item]
+        if inserts and not self._insert(inserts):
+            return False
+        return not updates or self._update(updates)
+
+    def _insert(self, docs: List[dict]) -> bool:
+        """insert_many; True when the server took the batch (duplicates from replays count as stored)."""
+        started = time.perf_counter()
+        stored = docs
+        try:
+            self.collection.insert_many(docs, ordered=False)
+        except Exception as e:
+            errors = _write_errors(e)
+            if errors is None:
+                # connection / server selection / timeout: keep the documents
+                if self.healthy:
+                    print(f"[{self.name}] MongoDB unavailable, spilling writes to {self.spill_path}: {e}")
+                self.healthy = False
+                DB_WRITE_ERRORS.labels("unavailable").inc()
+                return False
+            failed = {err.get("index") for err in errors}
+            stored = [doc for i, doc in enumerate(docs) if i not in failed]
+            rejected = [err for err in errors if err.get("code") != DUPLICATE_KEY]
+            if rejected:
+                # not retryable (validation etc.): report and drop those documents
+                self.stats["failed"] += len(rejected)
+                DB_WRITE_ERRORS.labels("rejected").inc(len(rejected))
+                print(f"[{self.name}] {len(rejected)} document(s) rejected: {rejected[0].get('errmsg')}")
+        DB_INSERT_TIME.observe(time.perf_counter() - started)
+        DB_FLUSH_SIZE.observe(len(docs))
+        if not self.healthy:
+            print(f"[{self.name}] MongoDB reachable again")
+        self.healthy = True
+        self.stats["flushes"] += 1
+        self.stats["flushed"] += len(docs)
+        if self.on_insert is not None and stored:
+            self.on_insert(stored)
+        return True
+
+    def _update(self, ops: List[dict]) -> bool:
+        from pymongo import UpdateOne
+        try:
+            bulk_write(self.collection, [UpdateOne({"_id": op["_id"]}, {"$set": op["fields"]}) for op in ops])
+        except Exception as e:
+            errors = _write_errors(e)
+            if errors is None and not _unavailable(e):
+                # a bug or an unsupported operation, not an outage: spilling would retry it forever
+                self.stats["failed"] += len(ops)
+                DB_WRITE_ERRORS.labels("rejected").inc(len(ops))
+                print(f"[{self.name}] {len(ops)} update(s) failed: {e!r}")
+                traceback.print_exc()
+                return True
+            if errors is None:
+                if self.healthy:
+                    print(f"[{self.name}] MongoDB unavailable, spilling writes to {self.spill_path}: {e}")
+                self.healthy = False
+                DB_WRITE_ERRORS.labels("unavailable").inc()
+                return False
+            self.stats["failed"] += len(errors)
+            DB_WRITE_ERRORS.labels("rejected").inc(len(errors))
+            print(f"[{self.name}] {len(errors)} update(s) rejected: {errors[0].get('errmsg')}")
+        if not self.healthy:
+            print(f"[{self.name}] MongoDB reachable again")
+        self.healthy = True
+        return True
+
+    # ---------------- spill file ----------------
+    def _count_spilled(self) -> int:
+        if self.spill_path is None or not self.spill_path.exists():
+            return 0
+        with open(self.spill_path, "r", encoding="utf-8") as f:
+            return sum(1 for line in f if line.strip())
+
+    def _spill(self, docs: List[dict]):
+        if self.spill_path is None:
+            self.stats["failed"] += len(docs)
+            DB_WRITE_ERRORS.labels("lost").inc(len(docs))
+            print(f"[{self.name}] No spill file configured, {len(docs)} document(s) lost")
+            return
+        self.spill_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.spill_path, "a", encoding="utf-8") as f:
+            for doc in docs:
+                f.write(json_util.dumps(doc, json_options=json_util.CANONICAL_JSON_OPTIONS) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self.spilled += len(docs)
+        self.stats["spilled"] += len(docs)
+        DB_SPILLED.set(self.spilled)
+
+    def _replay(self):
+        """Send the spill file back in max_batch chunks; whatever fails stays on disk."""
+        with open(self.spill_path, "r", encoding="utf-8") as f:
+            docs = [json_util.loads(line) for line in f if line.strip()]
+
+        sent = 0
+        while sent < len(docs):
+            chunk = docs[sent:sent + self.max_batch]
+            if not self._write(chunk):
+                break
+            sent += len(chunk)
+
+        remaining = docs[sent:]
+        tmp = self.spill_path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            for doc in remaining:
+                f.write(json_util.dumps(doc, json_options=json_util.CANONICAL_JSON_OPTIONS) + "\n")
+        os.replace(tmp, self.spill_path)
+        if not remaining:
+            self.spill_path.unlink()
+
+        self.spilled = len(remaining)
+        self.stats["replayed"] += sent
+        DB_SPILLED.set(self.spilled)
+        if sent:
+            print(f"[{self.name}] Replayed {sent} spilled document(s), {len(remaining)} left")
@@ -0,0 +1,191 @@
+# Backend/utils/encodings_store.py
+"""
+The face gallery on disk as plain arrays, opened with mmap instead of unpickled.
+
+A store is a directory:
+
+    meta.json           header: format version, model, dim, count, identities, data files
+    embeddings.<g>.npy  (rows, dim) float32, one encoding per row
+    labels.<g>.npy      (rows,) int32, each row's index into meta["identities"]
+
+open() maps the embedding matrix read-only (np.load(mmap_mode="r")): start-up
+parses nothing, and every detection process that opens the same gallery shares
+the same page-cache pages instead of holding its own copy.
+
+append() adds rows at the end of both .npy files without rewriting them: the
+rows are written first, then the row count in the .npy headers (padded to a
+fixed HEADER_SIZE, so it is rewritten in place) and last in meta.json, which
+is replaced atomically and is the commit point. Readers only look at the
+first meta["count"] rows, so a crash mid-append leaves the previous gallery
+and the next append writes over the partial rows. write() replaces the whole
+gallery under a new generation <g>; processes that already mapped the old
+files keep reading them. One writer at a time.
+"""
+import json
+import os
+import pickle
+import struct
+from datetime import datetime
+from pathlib import Path
+from typing import List, NamedTuple, Sequence
+
+import numpy as np
+
+FORMAT_VERSION = 1
+DEFAULT_MODEL = "dlib_face_recognition_resnet_model_v1"   # what face_recognition.face_encodings uses
+DEFAULT_DIM = 128
+HEADER_SIZE = 128   # bytes of every .npy header, so the row count can grow in place
+_NPY_MAGIC = b"\x93NUMPY\x01\x00"
+
+
+def _npy_header(dtype, shape) -> bytes:
+    """A version 1.0 .npy header padded to exactly HEADER_SIZE bytes."""
+    text = repr({"descr": np.dtype(dtype).str, "fortran_order": False, "shape": tuple(shape)})
+    size = HEADER_SIZE - len(_NPY_MAGIC) - 2
+    if len(text) >= size:
+        raise ValueError(f"shape {shape} does not fit a {HEADER_SIZE}-byte .npy header")
+    return _NPY_MAGIC + struct.pack("<H", size) + (text.ljust(size - 1) + "\n").encode("latin1")
+
+
+def _as_matrix(encodings, rows: int, dim: int) -> np.ndarray:
+    if rows == 0:
+        return np.zeros((0, dim), dtype=np.float32)
+    matrix = np.ascontiguousarray(encodings, dtype=np.float32).reshape(rows, -1)
+    if matrix.shape[1] != dim:
+        raise ValueError(f"encodings are {matrix.shape[1]}-d, the store holds {dim}-d")
+    return matrix
+
+
+class Gallery(NamedTuple):
+    embeddings: np.ndarray   # (count, dim) float32, read-only memory map
+    labels: np.ndarray       # (count,) int32 index into identities
+    identities: List[str]
+    meta: dict
+
+    @property
+    def names(self) -> List[str]:
+        return [self.identities[i] for i in self.labels.tolist()]
+
+
+class EncodingsStore:
+    def __init__(self, path):
+        self.path = Path(path)
+        self.meta_path = self.path / "meta.json"
+
+    def exists(self) -> bool:
+        return self.meta_path.is_file()
+
+    def read_meta(self) -> dict:
+        with open(self.meta_path, encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("version") != FORMAT_VERSION:
+            raise ValueError(f"{self.path}: unsupported encodings store version {meta.get('version')!r}")
+        return meta
+
+    def _file(self, meta: dict, kind: str) -> Path:
+        return self.path / f"{kind}.{meta['generation']}.npy"
+
+    # ---------------- reading ----------------
+    def open(self) -> Gallery:
+        """The committed gallery; the embeddings are memory-mapped, not read."""
+        meta = self.read_meta()
+        count, dim = int(meta["count"]), int(meta["dim"])
+        if count == 0:   # an empty file cannot be mapped
+            return Gallery(np.zeros((0, dim), dtype=np.float32), np.zeros(0, dtype=np.int32),
+                           list(meta["identities"]), meta)
+        embeddings = np.load(self._file(meta, "embeddings"), mmap_mode="r")
+        labels = np.load(self._file(meta, "labels"), mmap_mode="r")
+        if embeddings.shape[0] < count or labels.shape[0] < count or embeddings.shape[1:] != (dim,):
+            raise ValueError(f"{self.path}: data files do not match meta.json ({embeddings.shape} for {count} x {dim})")
+        return Gallery(embeddings[:count], np.array(labels[:count]), list(meta["identities"]), meta)
+
+    # ---------------- writing ----------------
+    def write(self, encodings, names: Sequence[str], model: str = DEFAULT_MODEL, dim: int = DEFAULT_DIM) -> dict:
+        """Replace the whole gallery (a new generation of files); returns the new meta."""
+        names = [str(n) for n in names]
+        matrix = _as_matrix(encodings, len(names), dim)
+        identities = list(dict.fromkeys(names))
+        lookup = {name: i for i, name in enumerate(identities)}
+        labels = np.array([lookup[n] for n in names], dtype=np.int32)
+
+        old = self.read_meta() if self.exists() else None
+        now = datetime.now().isoformat(timespec="seconds")
+        meta = {"version": FORMAT_VERSION, "model": model, "dim": matrix.shape[1], "count": len(names),
+                "identities": identities, "generation": (old["generation"] + 1) if old else 1,
+                "created": now, "updated": now}
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._write_array(self._file(meta, "embeddings"), matrix)
+        self._write_array(self._file(meta, "labels"), labels)
+        self._write_meta(meta)
+
+        if old:   # open maps keep the unlinked files alive
+            for kind in ("embeddings", "labels"):
+                try:
+                    self._file(old, kind).unlink()
+                except OSError:
+                    pass
+        return meta
+
+    def append(self, encodings, names: Sequence[str]) -> dict:
+        """Add rows at the end without rewriting the existing ones; returns the new meta."""
+        if not self.exists():
+            return self.write(encodings, names)
+        meta = self.read_meta()
+        names = [str(n) for n in names]
+        if not names:
+            return meta
+        count, dim = int(meta["count"]), int(meta["dim"])
+        matrix = _as_matrix(encodings, len(names), dim)
+
+        identities = list(meta["identities"])
+        lookup = {name: i for i, name in enumerate(identities)}
+        for name in names:
+            if name not in lookup:
+                lookup[name] = len(identities)
+                identities.append(name)
+        labels = np.array([lookup[n] for n in names], dtype=np.int32)
+
+        total = count + len(names)
+        for kind, rows in (("embeddings", matrix), ("labels", labels)):
+            row_bytes = rows.itemsize * int(np.prod(rows.shape[1:], dtype=np.int64))
+            with open(self._file(meta, kind), "r+b") as f:
+                f.truncate(HEADER_SIZE + count * row_bytes)   # drops the rows of an interrupted append
+                f.seek(0, os.SEEK_END)
+                f.write(rows.tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+                f.seek(0)
+                f.write(_npy_header(rows.dtype, (total,) + rows.shape[1:]))
+                f.flush()
+                os.fsync(f.fileno())
+
+        meta.update(count=total, identities=identities, updated=datetime.now().isoformat(timespec="seconds"))
+        self._write_meta(meta)
+        return meta
+
+    @staticmethod
+    def _write_array(path: Path, array: np.ndarray):
+        tmp = path.with_name(path.name + ".tmp")
+        with open(tmp, "wb") as f:
+            f.write(_npy_header(array.dtype, array.shape))
+            f.write(np.ascontiguousarray(array).tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+
+    def _write_meta(self, meta: dict):
+        tmp = self.meta_path.with_name(self.meta_path.name + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.meta_path)
+
+
+def convert_pickle(pickle_path, store_path, model: str = DEFAULT_MODEL) -> EncodingsStore:
+    """One-shot import of a legacy encodings.pkl ({"encodings": [...], "names": [...]}); only for trusted files."""
+    with open(pickle_path, "rb") as f:
+        data = pickle.load(f)
+    store = EncodingsStore(store_path)
+    store.write(data.get("encodings", []), data.get("names", []), model=model)
+    return store
@@ -0,0 +1,126 @@
+# Backend/utils/enrolment.py
+"""
+Sample quality and representative selection for the face gallery.
+
+capture_faces.py saves bursts of near-identical webcam frames; enrolling all of
+them multiplies matching cost without adding recall. For each identity,
+select_representatives():
+
+  1. drops samples whose quality (sharpness, face size, pose) is below a floor,
+  2. clusters the rest: in order of decreasing quality, a sample starts a new
+     cluster unless it lies within `radius` of an existing representative
+     (near-duplicates collapse onto their best-quality member),
+  3. if more than `max_keep` clusters remain, keeps a diverse subset by
+     farthest-point sampling, starting from the best sample.
+
+evaluate() measures what that costs: a gallery's accuracy and false accepts
+on held-out probe samples, and its matching time.
+"""
+import math
+import time
+from typing import Dict, Optional, Sequence
+
+import cv2
+import numpy as np
+
+from detection.watchlist import Watchlist
+
+SHARPNESS_REF = 100.0   # Laplacian variance of a QUALITY_CROP face crop that counts as fully sharp
+FACE_SIZE_REF = 80      # face side in pixels from which the encoding stops improving
+YAW_LIMIT = 0.5         # nose offset / eye distance at which a face counts as profile
+ROLL_LIMIT = 30.0       # degrees of head tilt that count as unusable
+QUALITY_CROP = 112
+
+
+def measure_face(image_rgb: np.ndarray, location, landmarks: Optional[dict] = None) -> Dict[str, float]:
+    """Raw quality measurements of one face: sharpness, face_px, yaw, roll (landmarks from face_landmarks)."""
+    top, right, bottom, left = location
+    h, w = image_rgb.shape[:2]
+    crop = image_rgb[max(0, top):min(h, bottom), max(0, left):min(w, right)]
+    sharpness = 0.0
+    if crop.size:
+        gray = cv2.cvtColor(cv2.resize(crop, (QUALITY_CROP, QUALITY_CROP)), cv2.COLOR_RGB2GRAY)
+        sharpness = float(cv2.Laplacian(gray, cv2.CV_64F).var())
+
+    yaw = roll = 0.0
+    if landmarks and landmarks.get("left_eye") and landmarks.get("right_eye") and landmarks.get("nose_tip"):
+        left_eye = np.mean(landmarks["left_eye"], axis=0)
+        right_eye = np.mean(landmarks["right_eye"], axis=0)
+        nose = np.mean(landmarks["nose_tip"], axis=0)
+        dx, dy = right_eye - left_eye
+        eye_dist = math.hypot(dx, dy)
+        if eye_dist > 0:
+            roll = math.degrees(math.atan2(dy, dx))
+            # nose offset from the eye midpoint, along the eye line, in eye distances
+            yaw = float(np.dot(nose - (left_eye + right_eye) / 2, (dx, dy)) / eye_dist ** 2)
+    return {"sharpness": sharpness, "face_px": int(min(bottom - top, right - left)), "yaw": yaw, "roll": roll}
+
+
+def quality_score(sharpness: float, face_px: float, yaw: float = 0.0, roll: float = 0.0) -> float:
+    """0..1; the geometric mean of the sharpness, size and pose terms (any of them at 0 gives 0)."""
+    sharp = min(1.0, max(0.0, sharpness) / SHARPNESS_REF)
+    size = min(1.0, max(0.0, face_px) / FACE_SIZE_REF)
+    pose = max(0.0, 1.0 - abs(yaw) / YAW_LIMIT) * max(0.0, 1.0 - abs(roll) / ROLL_LIMIT)
+    return (sharp * size * pose) ** (1.0 / 3.0)
+
+
+def select_representatives(encodings, quality: Sequence[float], max_keep: int = 10,
+                           radius: float = 0.2, min_quality: float = 0.3) -> np.ndarray:
+    """Indices (ascending) of the samples of ONE identity to enrol; never empty for a non-empty input."""
+    x = np.asarray(encodings, dtype=np.float32).reshape(len(quality), -1)
+    if not len(x):
+        return np.empty(0, dtype=np.intp)
+    quality = np.asarray(quality, dtype=np.float64)
+    order = np.argsort(-quality, kind="stable")
+    eligible = [i for i in order.tolist() if quality[i] >= min_quality] or [int(order[0])]
+
+    leaders = []
+    for i in eligible:
+        if leaders and np.linalg.norm(x[leaders] - x[i], axis=1).min() <= radius:
+            continue   # a better sample of the same look is already kept
+        leaders.append(i)
+
+    if max_keep and len(leaders) > max_keep:
+        pool = x[leaders]
+        chosen = [0]
+        dist = np.linalg.norm(pool - pool[0], axis=1)
+        while len(chosen) < max_keep:
+            far = int(dist.argmax())
+            chosen.append(far)
+            dist = np.minimum(dist, np.linalg.norm(pool - pool[far], axis=1))
+        leaders = [leaders[c] for c in chosen]
+    return np.sort(np.asarray(leaders, dtype=np.intp))
+
+
+def evaluate(gallery_enc, gallery_names: Sequence[str], probe_enc, probe_names: Sequence[str],
+             tolerance: float, chunk: int = 1024) -> dict:
+    """
+    Closed-set accuracy (probe matched to its own identity within tolerance) and
+    false-accept rate (some other identity within tolerance) of a gallery, plus
+    its matching time per face.
+    """
+    watchlist = Watchlist(gallery_enc, gallery_names)
+    if not len(watchlist) or not len(probe_names):
+        return {"rows": len(watchlist), "identities": len(watchlist.identities), "probes": len(probe_names),
+                "accuracy": None, "false_accept_rate": None, "ms_per_face": None}
+    probes = np.asarray(probe_enc, dtype=np.float32).reshape(len(probe_names), -1)
+    column = {name: i for i, name in enumerate(watchlist.identities)}
+    correct = false_accepts = impostor_trials = 0
+    elapsed = 0.0
+    for start in range(0, len(probes), chunk):
+        started = time.perf_counter()
+        dist = watchlist.identity_distances(probes[start:start + chunk])
+        elapsed += time.perf_counter() - started
+        for row, name in zip(dist, probe_names[start:start + chunk]):
+            own = column.get(name)
+            best = int(row.argmin())
+            correct += int(best == own and row[best] <= tolerance)
+            if len(row) > 1 or own is None:
+                others = np.delete(row, own) if own is not None else row
+                impostor_trials += 1
+                false_accepts += int(others.min() <= tolerance)
+    n = len(probes)
+    return {"rows": len(watchlist), "identities": len(watchlist.identities), "probes": n,
+            "accuracy": round(correct / n, 4),
+            "false_accept_rate": round(false_accepts / impostor_trials, 4) if impostor_trials else None,
+            "ms_per_face": round(1000 * elapsed / n, 4)}
@@ -0,0 +1,138 @@
+# Backend/utils/event_hub.py
+"""
+In-process publish/subscribe for the /events Server-Sent Events stream.
+
+publish() serialises an event once, gives it the next id, keeps it in a small
+ring buffer and hands it to every connected client's queue. A client that
+reconnects with Last-Event-ID gets the events it missed replayed from the ring;
+if they have already fallen out of it (or the id is from before a server
+restart, ids start again at 1), it gets a "reset" event telling it to reload
+its state over the REST endpoints instead.
+"""
+import json
+import queue
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Any, Iterator, List, Optional
+
+from bson import ObjectId
+
+import shared_state as state
+from utils.metrics_utils import EVENTS_PUBLISHED, EVENTS_CLIENTS, EVENTS_DISCONNECTED
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat(timespec="seconds")
+    if isinstance(value, ObjectId):
+        return str(value)
+    return str(value)
+
+
+def format_event(event: str, data: Any, event_id: Optional[int] = None) -> str:
+    """One SSE message (data is a single JSON line)."""
+    head = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{head}event: {event}\ndata: {json.dumps(data, default=_json_default)}\n\n"
+
+
+class _Client:
+    def __init__(self, size: int):
+        self.queue: "queue.Queue[str]" = queue.Queue(size)
+        self.overflowed = False
+
+
+class EventHub:
+    def __init__(self, ring_size: int = 256, client_queue: int = 100):
+        self._lock = threading.Lock()
+        self._ring: "deque[tuple]" = deque(maxlen=ring_size)    # (id, message)
+        self._clients: List[_Client] = []
+        self._next_id = 1
+        self.client_queue = client_queue
+
+    @property
+    def clients(self) -> int:
+        return len(self._clients)
+
+    @property
+    def last_id(self) -> int:
+        return self._next_id - 1
+
+    def publish(self, event: str, data: Any) -> int:
+        with self._lock:
+            event_id = self._next_id
+            self._next_id += 1
+            message = format_event(event, data, event_id)
+            self._ring.append((event_id, message))
+            for client in self._clients:
+                if client.overflowed:
+                    continue
+                try:
+                    client.queue.put_nowait(message)
+                except queue.Full:
+                    # too slow to keep up: close it; it reconnects and replays from the ring
+                    client.overflowed = True
+        EVENTS_PUBLISHED.labels(event).inc()
+        return event_id
+
+    def _replay(self, last_event_id: int) -> List[str]:
+        """Called with the lock held."""
+        if last_event_id == self.last_id:
+            return []
+        # ahead of us: ids restarted with the server, so what it missed is unknown
+        if last_event_id > self.last_id or not self._ring or self._ring[0][0] > last_event_id + 1:
+            return [format_event("reset", {"last_id": self.last_id}, self.last_id)]
+        return [message for event_id, message in self._ring if event_id > last_event_id]
+
+    def stream(self, last_event_id: Optional[int] = None, heartbeat: float = 15.0,
+               initial: Optional[List[str]] = None) -> Iterator[str]:
+        """
+        Generator of SSE text for one client: the missed events (or `initial`
+        messages on a fresh connection), then live events, with a comment line
+        every `heartbeat` seconds of silence so proxies keep the connection open.
+        """
+        client = _Client(self.client_queue)
+        with self._lock:
+            backlog = self._replay(last_event_id) if last_event_id is not None else list(initial or [])
+            self._clients.append(client)
+        EVENTS_CLIENTS.inc()
+        try:
+            yield "retry: 3000\n\n"
+            for message in backlog:
+                yield message
+            while True:
+                if client.overflowed:
+                    # hand over what was queued, then close; the reconnect replays the rest
+                    try:
+                        yield client.queue.get_nowait()
+                        continue
+                    except queue.Empty:
+                        break
+                try:
+                    yield client.queue.get(timeout=heartbeat)
+                except queue.Empty:
+                    yield ": ping\n\n"
+            EVENTS_DISCONNECTED.inc()
+        finally:
+            with self._lock:
+                self._clients.remove(client)
+            EVENTS_CLIENTS.dec()
+
+
+_hub_lock = threading.Lock()
+
+
+def get_hub() -> EventHub:
+    """The process-wide hub (state.event_hub), created on first use."""
+    with _hub_lock:
+        if state.event_hub is None:
+            state.event_hub = EventHub(state.EVENTS_RING_SIZE, state.EVENTS_CLIENT_QUEUE)
+        return state.event_hub
+
+
+def publish(event: str, data: Any):
+    """Fire-and-forget publish for the detection and DB threads."""
+    try:
+        get_hub().publish(event, data)
+    except Exception as e:
+        print(f"[events] Publish failed: {e}")
@@ -0,0 +1,118 @@
+# Backend/utils/evidence_store.py
+"""
+Alert snapshots on disk, encoded once and named by their content.
+
+put() JPEG-encodes a frame, hashes the bytes and writes them (plus a
+downscaled thumbnail) under <root>/<YYYY-MM-DD>/<camera>/<sha256>.jpg. Writing
+the same image twice costs nothing, a file never changes once written (so it
+can be cached forever by the browser), and the returned bytes are what
+Telegram sends, so no frame is encoded again per delivery.
+
+Called from the alert dispatcher thread, never from a detection stage.
+"""
+import hashlib
+import os
+import re
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, NamedTuple, Optional
+
+import cv2
+
+import shared_state as state
+from utils.metrics_utils import EVIDENCE_STORED, EVIDENCE_WRITE_TIME
+
+
+class Evidence(NamedTuple):
+    path: str       # relative to the store root, e.g. "2024-05-01/gate/<sha256>.jpg"
+    thumb: str
+    sha256: str
+    size: int
+    width: int
+    height: int
+    jpeg: bytes
+
+    def doc(self) -> Dict[str, Any]:
+        """What the alert document keeps (everything but the bytes)."""
+        return {"path": self.path, "thumb": self.thumb, "sha256": self.sha256,
+                "size": self.size, "width": self.width, "height": self.height}
+
+
+def _safe_part(name) -> str:
+    # camera ids come from cameras.json; keep them a single, harmless path component
+    return re.sub(r"[^A-Za-z0-9_.-]", "_", str(name or "unknown")).lstrip(".") or "unknown"
+
+
+class EvidenceStore:
+    def __init__(self, root, quality: int = 90, thumb_width: int = 320, thumb_quality: int = 70):
+        self.root = Path(root).resolve()
+        self.quality = int(quality)
+        self.thumb_width = int(thumb_width)
+        self.thumb_quality = int(thumb_quality)
+        self.stats = {"stored": 0, "duplicate": 0}
+
+    def put(self, frame, camera: Optional[str] = None, when: Optional[datetime] = None) -> Evidence:
+        """Encode and store one BGR frame; ValueError if it cannot be encoded."""
+        started = time.perf_counter()
+        ok, buffer = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+        if not ok:
+            raise ValueError("frame could not be JPEG-encoded")
+        data = buffer.tobytes()
+        sha = hashlib.sha256(data).hexdigest()
+
+        folder = Path((when or datetime.now()).strftime("%Y-%m-%d")) / _safe_part(camera)
+        rel, rel_thumb = folder / f"{sha}.jpg", folder / f"{sha}.thumb.jpg"
+        target = self.root / rel
+        if target.exists():
+            result = "duplicate"
+        else:
+            result = "stored"
+            target.parent.mkdir(parents=True, exist_ok=True)
+            self._write(self.root / rel_thumb, self._thumbnail(frame))
+            self._write(target, data)   # last, so an existing image always has its thumbnail
+
+        self.stats[result] += 1
+        EVIDENCE_STORED.labels(result).inc()
+        EVIDENCE_WRITE_TIME.observe(time.perf_counter() - started)
+        height, width = frame.shape[:2]
+        return Evidence(rel.as_posix(), rel_thumb.as_posix(), sha, len(data), width, height, data)
+
+    def _thumbnail(self, frame) -> bytes:
+        height, width = frame.shape[:2]
+        if width > self.thumb_width:
+            size = (self.thumb_width, max(1, round(height * self.thumb_width / width)))
+            frame = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+        ok, buffer = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, self.thumb_quality])
+        if not ok:
+            raise ValueError("thumbnail could not be JPEG-encoded")
+        return buffer.tobytes()
+
+    @staticmethod
+    def _write(path: Path, data: bytes):
+        # write-then-rename: a reader never sees half a file
+        tmp = path.with_name(f".{path.name}.{threading.get_ident()}.tmp")
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def resolve(self, rel_path: str) -> Optional[Path]:
+        """Absolute path of a stored file, None if it is missing or outside the store."""
+        path = (self.root / rel_path).resolve()
+        if self.root not in path.parents or not path.is_file():
+            return None
+        return path
+
+
+# ===================== DEFAULT STORE =====================
+_lock = threading.Lock()
+
+
+def get_evidence_store() -> Optional[EvidenceStore]:
+    """The process-wide store (state.evidence_store); None when EVIDENCE_DIR is empty (storage off)."""
+    with _lock:
+        if state.evidence_store is None and state.EVIDENCE_DIR:
+            state.evidence_store = EvidenceStore(state.EVIDENCE_DIR, state.EVIDENCE_JPEG_QUALITY,
+                                                 state.EVIDENCE_THUMB_WIDTH)
+        return state.evidence_store
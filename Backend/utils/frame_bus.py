@@ -0,0 +1,96 @@
+# Backend/utils/frame_bus.py
+import threading
+import time
+from typing import Any, Callable, List, NamedTuple, Optional, Tuple
+
+class FramePacket(NamedTuple):
+    seq: int        # monotonically increasing per bus, starts at 1
+    ts: float       # capture time (time.time()) of the camera frame
+    frame: Any
+
+
+class FrameBus:
+    """
+    Latest-frame mailbox with sequence numbers.
+
+    Producers publish frames; consumers remember the last seq they handled and
+    block in wait_for() until something newer arrives. Only the newest frame is
+    kept, so a slow consumer skips frames and is told how many it missed
+    instead of re-processing the same frame.
+    """
+
+    def __init__(self, name: str = ""):
+        self.name = name
+        self._cond = threading.Condition()
+        self._packet: Optional[FramePacket] = None
+        self._closed = False
+        self._listeners: List[Callable[[FramePacket], None]] = []
+
+    def publish(self, frame, ts: Optional[float] = None, seq: Optional[int] = None) -> Optional[FramePacket]:
+        """
+        Publish a frame. Pass seq/ts to relay a packet from an upstream bus so
+        downstream stages keep the camera's numbering; stale relays are ignored.
+        """
+        with self._cond:
+            last_seq = self._packet.seq if self._packet is not None else 0
+            if seq is None:
+                seq = last_seq + 1
+            elif seq <= last_seq:
+                return None
+            packet = FramePacket(seq, ts if ts is not None else time.time(), frame)
+            self._packet = packet
+            self._cond.notify_all()
+            listeners = list(self._listeners)
+
+        for callback in listeners:
+            try:
+                callback(packet)
+            except Exception as e:
+                print(f"[bus] {self.name} listener failed: {e}")
+        return packet
+
+    def latest(self) -> Optional[FramePacket]:
+        with self._cond:
+            return self._packet
+
+    @property
+    def seq(self) -> int:
+        with self._cond:
+            return self._packet.seq if self._packet is not None else 0
+
+    def wait_for(self, after_seq: int = 0, timeout: Optional[float] = None) -> Tuple[Optional[FramePacket], int]:
+        """
+        Block until a frame newer than after_seq is published (or timeout / close).
+
+        Returns (packet, dropped) where dropped is how many sequence numbers were
+        skipped since after_seq; (None, 0) when nothing newer arrived.
+        """
+        with self._cond:
+            self._cond.wait_for(
+                lambda: self._closed or (self._packet is not None and self._packet.seq > after_seq),
+                timeout,
+            )
+            packet = self._packet
+        if packet is None or packet.seq <= after_seq:
+            return None, 0
+        dropped = packet.seq - after_seq - 1 if after_seq > 0 else 0
+        return packet, dropped
+
+    def subscribe(self, callback: Callable[[FramePacket], None]):
+        """Call callback(packet) after every publish (runs on the publisher's thread)."""
+        with self._cond:
+            self._listeners.append(callback)
+
+    def unsubscribe(self, callback: Callable[[FramePacket], None]):
+        with self._cond:
+            if callback in self._listeners:
+                self._listeners.remove(callback)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
@@ -0,0 +1,170 @@
+# Backend/utils/frame_sources.py
+import os
+import sys
+from pathlib import Path
+from typing import Optional, Union
+
+import cv2
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp", ".webp", ".tif", ".tiff"}
+URL_SCHEMES = ("rtsp://", "rtsps://", "rtmp://", "http://", "https://", "udp://", "tcp://")
+
+PACED = "paced"              # deliver recorded footage at its native frame rate
+UNTHROTTLED = "unthrottled"  # deliver recorded footage as fast as it can be decoded
+
+
+# ===================== SOURCES =====================
+class FrameSource:
+    """
+    Something CameraStream can pull frames from.
+
+    read() returns (ok, frame); for recorded sources ok=False with eof=True
+    means the footage is over. `live` sources (webcams, network streams) are
+    paced by the device itself and never hit eof.
+    """
+    live = True
+
+    def __init__(self, description: str):
+        self.description = description
+        self.eof = False
+
+    @property
+    def fps(self) -> float:
+        return 0.0
+
+    def read(self):
+        raise NotImplementedError
+
+    def rewind(self) -> bool:
+        """Start recorded footage over; False if the source can't do that."""
+        return False
+
+    def release(self):
+        pass
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.description})"
+
+
+class _CaptureSource(FrameSource):
+    """Shared code for everything backed by cv2.VideoCapture."""
+
+    def __init__(self, target, api: int = cv2.CAP_ANY, description: Optional[str] = None):
+        super().__init__(description or str(target))
+        self.target = target
+        self.api = api
+        self.capture = cv2.VideoCapture(target, api)
+        if not self.capture.isOpened():
+            raise IOError(f"Cannot open camera source {self.description}")
+
+    @property
+    def fps(self) -> float:
+        fps = self.capture.get(cv2.CAP_PROP_FPS)
+        return float(fps) if fps and fps > 0 else 0.0
+
+    def read(self):
+        return self.capture.read()
+
+    def release(self):
+        self.capture.release()
+
+
+class WebcamSource(_CaptureSource):
+    """Local capture device by index. DirectShow on Windows, OpenCV's default backend elsewhere."""
+
+    def __init__(self, index: int, api: Optional[int] = None):
+        if api is None:
+            api = cv2.CAP_DSHOW if sys.platform.startswith("win") else cv2.CAP_ANY
+        super().__init__(int(index), api, description=f"webcam {index}")
+
+
+class URLSource(_CaptureSource):
+    """Network stream (RTSP, HTTP MJPEG, ...) or anything else OpenCV can open by name."""
+
+    def __init__(self, url: str):
+        super().__init__(url, cv2.CAP_FFMPEG if url.startswith(URL_SCHEMES) else cv2.CAP_ANY)
+
+
+class VideoFileSource(_CaptureSource):
+    """Recorded video file."""
+    live = False
+
+    def __init__(self, path: Union[str, Path], fps: Optional[float] = None):
+        super().__init__(str(path))
+        self._fps = float(fps) if fps else 0.0
+
+    @property
+    def fps(self) -> float:
+        return self._fps or super().fps or 25.0
+
+    def read(self):
+        ok, frame = self.capture.read()
+        self.eof = not ok
+        return ok, frame
+
+    def rewind(self) -> bool:
+        self.eof = False
+        if self.capture.set(cv2.CAP_PROP_POS_FRAMES, 0):
+            return True
+        # some containers can't seek: reopen instead
+        self.capture.release()
+        self.capture = cv2.VideoCapture(self.target, self.api)
+        return self.capture.isOpened()
+
+
+class ImageDirSource(FrameSource):
+    """Directory of still images played back in file-name order."""
+    live = False
+
+    def __init__(self, path: Union[str, Path], fps: Optional[float] = None):
+        super().__init__(str(path))
+        self.files = sorted(p for p in Path(path).iterdir() if p.suffix.lower() in IMAGE_EXTENSIONS)
+        if not self.files:
+            raise IOError(f"Cannot open camera source {path}: no images")
+        self._fps = float(fps) if fps else 10.0
+        self._index = 0
+
+    @property
+    def fps(self) -> float:
+        return self._fps
+
+    def read(self):
+        while self._index < len(self.files):
+            path = self.files[self._index]
+            self._index += 1
+            frame = cv2.imread(str(path))
+            if frame is not None:
+                return True, frame
+            print(f"[camera] Skipping unreadable image {path}")
+        self.eof = True
+        return False, None
+
+    def rewind(self) -> bool:
+        self._index = 0
+        self.eof = False
+        return True
+
+
+# ===================== FACTORY =====================
+def open_source(src, fps: Optional[float] = None) -> FrameSource:
+    """
+    Build a FrameSource from a cameras.json "src" value.
+
+    An int (or digit string) is a webcam index, an existing directory is an
+    image sequence, an existing file is a video, and anything else (rtsp://,
+    http://, GStreamer pipelines, ...) is handed to OpenCV as a URL.
+    `fps` overrides the playback rate of recorded sources.
+    """
+    if isinstance(src, FrameSource):
+        return src
+    if isinstance(src, int) or (isinstance(src, str) and src.strip().isdigit()):
+        return WebcamSource(int(src))
+
+    src = str(src)
+    if not src.startswith(URL_SCHEMES):
+        path = Path(os.path.expanduser(src))
+        if path.is_dir():
+            return ImageDirSource(path, fps=fps)
+        if path.is_file():
+            return VideoFileSource(path, fps=fps)
+    return URLSource(src)
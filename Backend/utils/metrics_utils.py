@@ -0,0 +1,277 @@
+# Backend/utils/metrics_utils.py
+"""
+Minimal Prometheus-style metrics (counters, gauges, histograms) rendered in the
+text exposition format by the /metrics route.
+
+Built for the per-frame loops: a labelled child is a dict lookup away and an
+update is a few additions under its own uncontended lock, so instrumentation can
+stay on in production. Callers on hot paths may hold on to the child returned
+by labels() to skip even the lookup.
+"""
+import bisect
+import math
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+# seconds; covers sub-millisecond bookkeeping up to multi-second network calls
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra is not None:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+# ===================== METRIC TYPES =====================
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[tuple, object] = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._children[()] = self._new_child()
+        (registry if registry is not None else REGISTRY).register(self)
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values):
+        """Child for one label combination (created on first use)."""
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {values}")
+            with self._lock:
+                child = self._children.setdefault(tuple(str(v) for v in values), self._new_child())
+                self._children[values] = child
+        return child
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+    def _items(self):
+        # each child once, under its string label values
+        with self._lock:
+            items = list(self._children.items())
+        seen = set()
+        for key, child in items:
+            if id(child) in seen or not all(isinstance(v, str) for v in key):
+                continue
+            seen.add(id(child))
+            yield key, child
+
+
+class _Value:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1.0):
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value: float):
+        with self._lock:
+            self.value = float(value)
+
+
+class Counter(_Metric):
+    """Monotonic count; name should end in _total."""
+    kind = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount: float = 1.0):
+        self._children[()].inc(amount)
+
+    def _samples(self):
+        return [f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(c.value)}" for k, c in self._items()]
+
+
+class Gauge(Counter):
+    """Value that goes up and down."""
+    kind = "gauge"
+
+    def dec(self, amount: float = 1.0):
+        self._children[()].dec(amount)
+
+    def set(self, value: float):
+        self._children[()].set(value)
+
+
+class _HistogramChild:
+    def __init__(self, bounds: Tuple[float, ...]):
+        self._lock = threading.Lock()
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)    # per bucket, not cumulative; last one is +Inf
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        i = bisect.bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+
+    def time(self):
+        return _Timer(self)
+
+
+class _Timer:
+    def __init__(self, child):
+        self.child = child
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.child.observe(time.perf_counter() - self.started)
+        return False
+
+
+class Histogram(_Metric):
+    """Bucketed distribution of observations (durations in seconds by default)."""
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS, registry=None):
+        self.bounds = tuple(sorted(float(b) for b in buckets if b != math.inf))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self):
+        return _HistogramChild(self.bounds)
+
+    def observe(self, value: float):
+        self._children[()].observe(value)
+
+    def time(self):
+        return self._children[()].time()
+
+    def _samples(self):
+        lines = []
+        for key, child in self._items():
+            with child._lock:
+                counts, total = list(child.counts), child.sum
+            cumulative = 0
+            for bound, count in zip(self.bounds + (math.inf,), counts):
+                cumulative += count
+                le = ("le", _format_value(bound))
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} already registered")
+            self._metrics[metric.name] = metric
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(m.render() for m in metrics) + "\n"
+
+
+REGISTRY = Registry()
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+# ===================== PIPELINE METRICS =====================
+# Capture
+CAPTURE_INTERVAL = Histogram(
+    "cctv_capture_interval_seconds", "Time between consecutive frames from a camera.", ["camera"],
+    buckets=(0.01, 0.02, 0.033, 0.05, 0.067, 0.1, 0.2, 0.5, 1.0, 2.0),
+)
+FRAMES_CAPTURED = Counter("cctv_frames_captured_total", "Frames published by the capture threads.", ["camera"])
+FRAMES_DUPLICATE = Counter(
+    "cctv_frames_duplicate_total", "Captured frames identical to the previous one (stalled or repeating source).",
+    ["camera"],
+)
+
+# Detection stages
+FRAME_WAIT = Histogram(
+    "cctv_frame_wait_seconds", "Time from capture until a stage starts working on the frame.", ["stage"],
+)
+INFERENCE_TIME = Histogram("cctv_inference_seconds", "Model time per call (a whole batch for batched stages).", ["stage"])
+BATCH_SIZE = Histogram(
+    "cctv_batch_size", "Frames per model call.", ["stage"], buckets=(1, 2, 3, 4, 6, 8, 12, 16, 24, 32),
+)
+FRAMES_PROCESSED = Counter("cctv_frames_processed_total", "Frames taken by a stage.", ["camera", "stage"])
+FRAMES_DROPPED = Counter(
+    "cctv_frames_dropped_total", "Frames a stage never saw because newer ones replaced them.", ["camera", "stage"],
+)
+FRAMES_SKIPPED = Counter("cctv_frames_skipped_total", "Frames not inferred because the scene was static.", ["camera", "stage"])
+
+# Video feeds
+RENDER_TIME = Histogram("cctv_render_seconds", "Overlay drawing time per streamed frame.", ["stream"])
+ENCODE_TIME = Histogram("cctv_jpeg_encode_seconds", "JPEG encode time per streamed frame.", ["stream"])
+STREAM_CLIENTS = Gauge("cctv_stream_clients", "Connected MJPEG clients.", ["stream"])
+
+# Alert sinks
+DB_INSERT_TIME = Histogram("cctv_db_insert_seconds", "MongoDB insert latency (one insert_many per flush).")
+DB_FLUSH_SIZE = Histogram("cctv_db_flush_size", "Documents per bulk insert.", buckets=(1, 5, 10, 50, 100, 250, 500, 1000))
+DB_WRITE_LAG = Histogram("cctv_db_write_lag_seconds", "Time from save_alert_to_db() until MongoDB acknowledged it.")
+DB_BUFFERED = Gauge("cctv_db_buffered_documents", "Documents waiting in the write-behind buffer.")
+DB_SPILLED = Gauge("cctv_db_spilled_documents", "Documents parked in the spill file while MongoDB is unavailable.")
+DB_WRITE_ERRORS = Counter("cctv_db_write_errors_total", "Failed MongoDB writes by reason.", ["reason"])
+TELEGRAM_SEND_TIME = Histogram("cctv_telegram_send_seconds", "Telegram alert delivery latency.")
+TELEGRAM_ERRORS = Counter("cctv_telegram_errors_total", "Telegram alerts that failed to send.")
+TELEGRAM_COALESCED = Counter("cctv_telegram_coalesced_total", "Alerts folded into a digest instead of their own message.")
+TELEGRAM_DEDUPED = Counter("cctv_telegram_deduped_total", "Duplicate Telegram alerts suppressed.")
+ALERTS_QUEUED = Gauge("cctv_alert_queue_length", "Alert deliveries waiting for the dispatcher.")
+ALERTS_DROPPED = Counter("cctv_alerts_dropped_total", "Alert deliveries lost to queue overflow.", ["kind"])
+ALERT_QUEUE_DELAY = Histogram("cctv_alert_queue_delay_seconds", "Time an alert waits in the dispatcher queue.")
+ALERT_JOB_TIME = Histogram("cctv_alert_delivery_seconds", "Time to deliver one alert (Telegram + DB).", ["kind"])
+EVIDENCE_STORED = Counter("cctv_evidence_snapshots_total", "Alert snapshots stored (or already on disk).", ["result"])
+EVIDENCE_WRITE_TIME = Histogram("cctv_evidence_write_seconds", "Encode + hash + write time per alert snapshot.")
+
+# Live events
+EVENTS_PUBLISHED = Counter("cctv_events_published_total", "Events pushed to /events subscribers.", ["event"])
+EVENTS_CLIENTS = Gauge("cctv_events_clients", "Connected /events (SSE) clients.")
+EVENTS_DISCONNECTED = Counter("cctv_events_slow_clients_total", "SSE clients dropped for falling behind.")
+
+# Analytics
+ANALYTICS_CACHE = Counter(
+    "cctv_analytics_cache_total", "Cached analytics lookups by result (hit, miss = queried, shared = waited on a query).",
+    ["cache", "result"],
+)
@@ -0,0 +1,212 @@
+# Backend/utils/rollups.py
+"""
+Pre-aggregated alert counters so the dashboard never re-reads raw Detections.
+
+One document per (camera, hour) and per (camera, day):
+
+    {"_id": "cam1|2024-05-01T13", "camera": "cam1", "bucket": datetime, "location": "Gate",
+     "total": 7, "types": {"Crowd": 5, "Weapon": 2}, "subtypes": {"pistol": 2},
+     "persons": {"bob": 3}, "people_sum": 41, "people_max": 12,
+     "weapon": {"count": 2, "conf_sum": 1.7, "conf_min": 0.8, "conf_max": 0.9}}
+
+Daily documents also count alerts per hour of the day ("hours": {"13": 7}),
+so a one-day summary including its peak hour is a single read.
+
+apply() folds a batch of freshly inserted alerts into these with one $inc
+upsert per touched bucket; rebuild() regenerates them from the raw alerts.
+"""
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from pymongo import UpdateOne
+
+from utils.db_writer import bulk_write
+
+
+def _field(name) -> str:
+    # map keys become field names, which can't hold "." or start with "$": swap in full-width look-alikes
+    return str(name).replace(".", "\uff0e").replace("$", "\uff04") or "_"
+
+
+def _unfield(key: str) -> str:
+    return key.replace("\uff0e", ".").replace("\uff04", "$")
+
+
+def hour_of(ts: datetime) -> datetime:
+    return ts.replace(minute=0, second=0, microsecond=0)
+
+
+def day_of(ts: datetime) -> datetime:
+    return ts.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+class _Bucket:
+    """Pending update of one rollup document."""
+
+    def __init__(self, camera: str, bucket: datetime, hours: bool = False):
+        self.camera = camera
+        self.bucket = bucket
+        self.hours = hours
+        self.location = None
+        self.inc: Dict[str, float] = defaultdict(int)
+        self.max: Dict[str, float] = {}
+        self.min: Dict[str, float] = {}
+
+    def add(self, doc: dict):
+        self.location = doc.get("location") or self.location
+        people = int(doc.get("people_count") or 0)
+        self.inc["total"] += 1
+        self.inc["people_sum"] += people
+        if self.hours:
+            self.inc[f"hours.{doc['ts'].hour:02d}"] += 1
+        self.max["people_max"] = max(self.max.get("people_max", 0), people)
+
+        types = doc.get("type") or []
+        for t in types if isinstance(types, list) else [types]:
+            self.inc[f"types.{_field(t)}"] += 1
+        if doc.get("sub_type"):
+            self.inc[f"subtypes.{_field(doc['sub_type'])}"] += 1
+        if doc.get("person_name"):
+            self.inc[f"persons.{_field(doc['person_name'])}"] += 1
+
+        conf = doc.get("confidence")
+        if conf is not None and any(str(t).lower() == "weapon" for t in types):
+            self.inc["weapon.count"] += 1
+            self.inc["weapon.conf_sum"] += float(conf)
+            self.max["weapon.conf_max"] = max(self.max.get("weapon.conf_max", 0.0), float(conf))
+            self.min["weapon.conf_min"] = min(self.min.get("weapon.conf_min", 1.0), float(conf))
+
+    def update(self, key: str) -> UpdateOne:
+        update = {
+            "$inc": dict(self.inc),
+            "$setOnInsert": {"camera": self.camera, "bucket": self.bucket},
+        }
+        if self.max:
+            update["$max"] = self.max
+        if self.min:
+            update["$min"] = self.min
+        if self.location:
+            update["$set"] = {"location": self.location}
+        return UpdateOne({"_id": key}, update, upsert=True)
+
+
+class Rollups:
+    """Hourly and daily rollup collections for one alerts collection."""
+
+    def __init__(self, hourly, daily):
+        self.hourly = hourly
+        self.daily = daily
+        self.stats = {"applied": 0, "updates": 0, "failed": 0}
+
+    def ensure_indexes(self):
+        for coll in (self.hourly, self.daily):
+            coll.create_index([("bucket", -1), ("camera", 1)], background=True)
+
+    # ---------------- write side ----------------
+    @staticmethod
+    def _group(docs: Iterable[dict]):
+        hours: Dict[str, _Bucket] = {}
+        days: Dict[str, _Bucket] = {}
+        for doc in docs:
+            ts = doc.get("ts")
+            if not isinstance(ts, datetime):
+                continue
+            camera = str(doc.get("camera") or doc.get("location") or "unknown")
+            h, d = hour_of(ts), day_of(ts)
+            hours.setdefault(f"{camera}|{h:%Y-%m-%dT%H}", _Bucket(camera, h)).add(doc)
+            days.setdefault(f"{camera}|{d:%Y-%m-%d}", _Bucket(camera, d, hours=True)).add(doc)
+        return hours, days
+
+    def apply(self, docs: List[dict], hourly=None, daily=None) -> int:
+        """Fold inserted alert documents into the rollups; returns the number of bucket updates."""
+        hours, days = self._group(docs)
+        n = 0
+        for coll, buckets in ((hourly if hourly is not None else self.hourly, hours),
+                              (daily if daily is not None else self.daily, days)):
+            if buckets:
+                bulk_write(coll, [b.update(k) for k, b in buckets.items()], ordered=False)
+                n += len(buckets)
+        self.stats["applied"] += len(docs)
+        self.stats["updates"] += n
+        return n
+
+    def on_insert(self, docs: List[dict]):
+        """BulkWriter hook: never lets a rollup failure touch the raw write (rebuild() repairs drift)."""
+        try:
+            self.apply(docs)
+        except Exception as e:
+            self.stats["failed"] += len(docs)
+            print(f"[rollups] Update failed for {len(docs)} alert(s), run `manage.py rollups` to repair: {e}")
+
+    def rebuild(self, source, batch: int = 1000) -> Dict[str, Any]:
+        """
+        Recompute both rollups from `source` (the raw alerts) into scratch
+        collections and swap them in with a rename. Alerts written while this runs
+        may be missing from the result; run it with detection stopped.
+        """
+        started = time.time()
+        scratch = [self.hourly.database[f"{c.name}_rebuild"] for c in (self.hourly, self.daily)]
+        for coll in scratch:
+            coll.drop()
+
+        scanned = 0
+        chunk = []
+        cursor = source.find({"ts": {"$type": "date"}},
+                             {"ts": 1, "camera": 1, "location": 1, "type": 1, "sub_type": 1,
+                              "person_name": 1, "people_count": 1, "confidence": 1})
+        for doc in cursor:
+            chunk.append(doc)
+            if len(chunk) >= batch:
+                self.apply(chunk, *scratch)
+                scanned += len(chunk)
+                chunk = []
+        if chunk:
+            self.apply(chunk, *scratch)
+            scanned += len(chunk)
+
+        for coll, target in zip(scratch, (self.hourly, self.daily)):
+            if coll.count_documents({}):
+                coll.rename(target.name, dropTarget=True)
+            else:
+                target.delete_many({})
+        self.ensure_indexes()
+        return {"alerts": scanned, "hourly": self.hourly.count_documents({}),
+                "daily": self.daily.count_documents({}), "seconds": round(time.time() - started, 2)}
+
+    # ---------------- read side ----------------
+    @staticmethod
+    def _range(coll, start: datetime, end: Optional[datetime] = None) -> List[dict]:
+        query = {"bucket": {"$gte": start}}
+        if end is not None:
+            query["bucket"]["$lt"] = end
+        return list(coll.find(query).sort([("bucket", 1)]))
+
+    def hours(self, start: datetime, end: Optional[datetime] = None) -> List[dict]:
+        return self._range(self.hourly, start, end)
+
+    def days(self, start: datetime, end: Optional[datetime] = None) -> List[dict]:
+        return self._range(self.daily, start, end)
+
+
+def merge(docs: Iterable[dict]) -> Dict[str, Any]:
+    """Sum rollup documents (e.g. all cameras of a day) into one."""
+    out = {"total": 0, "types": defaultdict(int), "subtypes": defaultdict(int), "persons": defaultdict(int),
+           "hours": defaultdict(int), "people_sum": 0, "people_max": 0,
+           "weapon": {"count": 0, "conf_sum": 0.0, "conf_min": None, "conf_max": None}}
+    for doc in docs:
+        out["total"] += doc.get("total", 0)
+        out["people_sum"] += doc.get("people_sum", 0)
+        out["people_max"] = max(out["people_max"], doc.get("people_max", 0))
+        for field in ("types", "subtypes", "persons", "hours"):
+            for k, v in (doc.get(field) or {}).items():
+                out[field][_unfield(k)] += v
+        w = doc.get("weapon") or {}
+        if w.get("count"):
+            ow = out["weapon"]
+            ow["count"] += w["count"]
+            ow["conf_sum"] += w.get("conf_sum", 0.0)
+            ow["conf_min"] = w.get("conf_min") if ow["conf_min"] is None else min(ow["conf_min"], w.get("conf_min", 1.0))
+            ow["conf_max"] = w.get("conf_max") if ow["conf_max"] is None else max(ow["conf_max"], w.get("conf_max", 0.0))
+    return out
@@ -0,0 +1,114 @@
+# Backend/utils/shm_ring.py
+from multiprocessing import shared_memory
+from typing import Optional, Tuple
+
+import cv2
+import numpy as np
+
+HEADER_INTS = 2   # [latest_seq, slots]
+
+
+class SharedFrameRing:
+    """
+    Fixed-size ring of frames in a multiprocessing.shared_memory block.
+
+    One writer (the camera's capture side) and any number of reader processes.
+    Layout: int64 header [latest_seq, slots], int64 seq per slot, float64
+    capture ts per slot, then `slots` frames of identical shape/dtype.
+
+    A slot's seq is set to -1 while it is being overwritten and to the frame's
+    seq once the copy is complete, so readers can take a zero-copy view of a
+    frame and afterwards call is_current() to find out whether the writer
+    lapped them while they were using it.
+    """
+
+    def __init__(self, shm: shared_memory.SharedMemory, shape, slots: int, dtype=np.uint8, owner: bool = False):
+        self.shm = shm
+        self.shape = tuple(shape)
+        self.slots = slots
+        self.dtype = np.dtype(dtype)
+        self.owner = owner
+
+        buf = shm.buf
+        offset = 0
+        self._header = np.ndarray((HEADER_INTS,), dtype=np.int64, buffer=buf, offset=offset)
+        offset += HEADER_INTS * 8
+        self._seqs = np.ndarray((slots,), dtype=np.int64, buffer=buf, offset=offset)
+        offset += slots * 8
+        self._ts = np.ndarray((slots,), dtype=np.float64, buffer=buf, offset=offset)
+        offset += slots * 8
+        self._frames = np.ndarray((slots,) + self.shape, dtype=self.dtype, buffer=buf, offset=offset)
+
+    # ---------------- construction ----------------
+    @staticmethod
+    def nbytes(shape, slots: int, dtype=np.uint8) -> int:
+        frame_bytes = int(np.prod(shape)) * np.dtype(dtype).itemsize
+        return (HEADER_INTS + 2 * slots) * 8 + slots * frame_bytes
+
+    @classmethod
+    def create(cls, shape, slots: int = 8, dtype=np.uint8, name: Optional[str] = None) -> "SharedFrameRing":
+        shm = shared_memory.SharedMemory(create=True, size=cls.nbytes(shape, slots, dtype), name=name)
+        ring = cls(shm, shape, slots, dtype, owner=True)
+        ring._header[:] = (0, slots)
+        ring._seqs[:] = 0
+        return ring
+
+    @classmethod
+    def attach(cls, name: str, shape, slots: int, dtype=np.uint8) -> "SharedFrameRing":
+        return cls(shared_memory.SharedMemory(name=name), shape, slots, dtype)
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    def spec(self) -> dict:
+        """Picklable description used by reader processes to attach()."""
+        return {"name": self.name, "shape": self.shape, "slots": self.slots, "dtype": self.dtype.str}
+
+    # ---------------- writer ----------------
+    def write(self, frame, seq: int, ts: float):
+        slot = seq % self.slots
+        self._seqs[slot] = -1
+        if frame.shape != self.shape:
+            # resolution changed mid-stream: keep the ring geometry fixed
+            frame = cv2.resize(frame, (self.shape[1], self.shape[0]))
+        np.copyto(self._frames[slot], frame, casting="unsafe")
+        self._ts[slot] = ts
+        self._seqs[slot] = seq
+        self._header[0] = seq
+
+    # ---------------- readers ----------------
+    @property
+    def latest_seq(self) -> int:
+        return int(self._header[0])
+
+    def get(self, seq: int) -> Optional[Tuple[float, np.ndarray]]:
+        """(ts, zero-copy view) for seq if it is still in the ring, else None."""
+        if seq <= 0:
+            return None
+        slot = seq % self.slots
+        if self._seqs[slot] != seq:
+            return None
+        return float(self._ts[slot]), self._frames[slot]
+
+    def latest(self) -> Optional[Tuple[int, float, np.ndarray]]:
+        seq = self.latest_seq
+        item = self.get(seq)
+        if item is None:
+            return None
+        return seq, item[0], item[1]
+
+    def is_current(self, seq: int) -> bool:
+        """True while the slot holding seq has not been overwritten."""
+        return seq > 0 and self._seqs[seq % self.slots] == seq
+
+    # ---------------- cleanup ----------------
+    def close(self):
+        # drop the numpy views before closing, otherwise the mmap stays exported
+        self._header = self._seqs = self._ts = self._frames = None
+        self.shm.close()
+        if self.owner:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
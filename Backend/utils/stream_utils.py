@@ -0,0 +1,145 @@
+# Backend/utils/stream_utils.py
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+import cv2
+
+from utils.metrics_utils import RENDER_TIME, ENCODE_TIME, STREAM_CLIENTS
+
+BOUNDARY = "frame"
+
+
+class MJPEGBroadcaster:
+    """
+    Encodes one video feed once per new frame and fans the JPEG out to every client.
+
+    A single encoder thread (alive only while someone is subscribed) waits for
+    new frames on the source bus, renders and JPEG-encodes them at most max_fps
+    times per second and publishes the multipart chunk. Each client generator
+    just hands out the newest chunk, so a slow client skips stale frames instead
+    of queueing them, and N viewers cost one encode per frame.
+    """
+
+    def __init__(self, name: str, bus, render: Optional[Callable] = None,
+                 max_fps: float = 15, quality: int = 80,
+                 on_subscribers: Optional[Callable[[int], None]] = None):
+        self.name = name
+        self.bus = bus
+        self.render = render
+        self.min_interval = 1.0 / max_fps if max_fps and max_fps > 0 else 0.0
+        self.encode_params = [int(cv2.IMWRITE_JPEG_QUALITY), int(quality)]
+        self.on_subscribers = on_subscribers
+
+        self._cond = threading.Condition()
+        self._chunk: Optional[bytes] = None
+        self._chunk_seq = 0
+        self._subscribers = 0
+        self._thread: Optional[threading.Thread] = None
+        self.stats = {"encoded": 0, "sent": 0}
+
+    # ---------------- encoder side ----------------
+    def _encode_loop(self):
+        last_seq = 0
+        last_emit = 0.0
+        render_metric = RENDER_TIME.labels(self.name)
+        encode_metric = ENCODE_TIME.labels(self.name)
+        while True:
+            with self._cond:
+                if self._subscribers == 0:
+                    self._thread = None
+                    return
+
+            # pace to max_fps: sleep first, then take whatever is newest (older frames are dropped)
+            wait = last_emit + self.min_interval - time.time()
+            if wait > 0:
+                time.sleep(wait)
+
+            packet, _ = self.bus.wait_for(last_seq, timeout=0.5)
+            if packet is None:
+                if self.bus.closed:
+                    with self._cond:
+                        self._thread = None
+                        self._cond.notify_all()
+                    return
+                continue
+            last_seq = packet.seq
+            last_emit = time.time()
+
+            if self.render:
+                with render_metric.time():
+                    frame = self.render(packet.frame)
+            else:
+                frame = packet.frame
+            with encode_metric.time():
+                ok, buf = cv2.imencode('.jpeg', frame, self.encode_params)
+            if not ok:
+                continue
+
+            chunk = (
+                b'--' + BOUNDARY.encode() + b'\r\n'
+                b'Content-Type: image/jpeg\r\n\r\n' +
+                buf.tobytes() + b'\r\n'
+            )
+            with self._cond:
+                self._chunk = chunk
+                self._chunk_seq += 1
+                self.stats["encoded"] += 1
+                self._cond.notify_all()
+
+    # ---------------- client side ----------------
+    def _add_subscriber(self, delta: int):
+        with self._cond:
+            self._subscribers += delta
+            count = self._subscribers
+            STREAM_CLIENTS.labels(self.name).set(count)
+            if count > 0 and self._thread is None:
+                self._thread = threading.Thread(target=self._encode_loop, name=f"mjpeg-{self.name}", daemon=True)
+                self._thread.start()
+        if self.on_subscribers:
+            self.on_subscribers(delta)
+
+    @property
+    def subscribers(self) -> int:
+        with self._cond:
+            return self._subscribers
+
+    def subscribe(self):
+        """Generator of multipart chunks for one HTTP client."""
+        self._add_subscriber(1)
+        try:
+            last = 0
+            while True:
+                with self._cond:
+                    self._cond.wait_for(lambda: self._chunk_seq > last or self._thread is None, timeout=1.0)
+                    if self._chunk_seq <= last:
+                        if self._thread is None and self.bus.closed:
+                            return
+                        continue
+                    chunk, last = self._chunk, self._chunk_seq
+                    self.stats["sent"] += 1
+                yield chunk
+        finally:
+            self._add_subscriber(-1)
+
+
+class BroadcastRegistry:
+    """One MJPEGBroadcaster per (camera, feed), created on first request."""
+
+    def __init__(self, max_fps: float = 15, quality: int = 80):
+        self.max_fps = max_fps
+        self.quality = quality
+        self._lock = threading.Lock()
+        self._broadcasters: Dict[tuple, MJPEGBroadcaster] = {}
+
+    def get(self, key: tuple, bus, render=None, on_subscribers=None) -> MJPEGBroadcaster:
+        with self._lock:
+            b = self._broadcasters.get(key)
+            if b is None or b.bus is not bus:
+                b = MJPEGBroadcaster("/".join(map(str, key)), bus, render, self.max_fps, self.quality, on_subscribers)
+                self._broadcasters[key] = b
+            return b
+
+    def all(self) -> Dict[tuple, MJPEGBroadcaster]:
+        with self._lock:
+            return dict(self._broadcasters)
@@ -0,0 +1,129 @@
+# Backend/utils/telegram_fake.py
+"""
+Local stand-in for the Telegram Bot API, for tests and load runs.
+
+    python utils/telegram_fake.py --port 8081 --latency 0.2 --rate 1
+    TELEGRAM_API_URL=http://127.0.0.1:8081 python app.py
+
+Accepts sendMessage / sendPhoto for any token, answers like the real API
+(including 429 with retry_after when more than --rate calls per second arrive
+for a chat) and keeps what it received; GET /stats returns the counters and
+the last messages as JSON.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+
+class FakeTelegramServer:
+    def __init__(self, host: str = "127.0.0.1", port: int = 8081, latency: float = 0.0,
+                 rate: Optional[float] = None, fail_rate: float = 0.0, keep: int = 100):
+        self.latency = latency
+        self.rate = rate
+        self.fail_rate = fail_rate
+        self.keep = keep
+        self.lock = threading.Lock()
+        self.counts = {"sendMessage": 0, "sendPhoto": 0, "rate_limited": 0, "failed": 0, "bytes": 0}
+        self.messages = []
+        self._last_call = {}
+        self.httpd = ThreadingHTTPServer((host, port), self._handler())
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="telegram-fake", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {**self.counts, "last": list(self.messages[-10:])}
+
+    # ---------------- request handling ----------------
+    def _answer(self, method: str, body: bytes, content_type: str):
+        if self.latency:
+            time.sleep(self.latency)
+
+        fields = {}
+        if content_type.startswith("application/json"):
+            fields = json.loads(body or b"{}")
+        chat = str(fields.get("chat_id", "multipart"))
+
+        with self.lock:
+            self.counts["bytes"] += len(body)
+            now = time.monotonic()
+            if self.rate and now - self._last_call.get(chat, 0.0) < 1.0 / self.rate:
+                self.counts["rate_limited"] += 1
+                return 429, {"ok": False, "error_code": 429, "description": "Too Many Requests: retry after 1",
+                             "parameters": {"retry_after": 1}}
+            self._last_call[chat] = now
+            if random.random() < self.fail_rate:
+                self.counts["failed"] += 1
+                return 500, {"ok": False, "error_code": 500, "description": "Internal Server Error"}
+            if method not in ("sendMessage", "sendPhoto"):
+                return 404, {"ok": False, "error_code": 404, "description": "Not Found"}
+
+            self.counts[method] += 1
+            self.messages.append({"method": method, "text": fields.get("text"), "bytes": len(body)})
+            del self.messages[:-self.keep]
+            message_id = self.counts["sendMessage"] + self.counts["sendPhoto"]
+        return 200, {"ok": True, "result": {"message_id": message_id, "date": int(time.time()),
+                                            "chat": {"id": chat, "type": "private"}}}
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _reply(self, status, payload):
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                method = self.path.rstrip("/").rsplit("/", 1)[-1]
+                self._reply(*server._answer(method, body, self.headers.get("Content-Type", "")))
+
+            def do_GET(self):
+                if self.path.rstrip("/") == "/stats":
+                    self._reply(200, server.stats())
+                else:
+                    self._reply(404, {"ok": False, "description": "Not Found"})
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake Telegram Bot API server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every call")
+    parser.add_argument("--rate", type=float, help="calls per second per chat before answering 429")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="fraction of calls answered with 500")
+    args = parser.parse_args()
+
+    fake = FakeTelegramServer(args.host, args.port, args.latency, args.rate, args.fail_rate)
+    print(f"[telegram-fake] Listening on {fake.url} (set TELEGRAM_API_URL to this)")
+    try:
+        fake.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -1,42 +1,334 @@
 # ===================== telegram_utils.py (FINAL) =====================
-import telegram
 import asyncio
+import atexit
+import os
+import threading
+import time
+from collections import deque
+from typing import Dict, List, NamedTuple, Optional
+
 import cv2
 
+import shared_state as state
+from utils.metrics_utils import TELEGRAM_SEND_TIME, TELEGRAM_ERRORS, TELEGRAM_COALESCED, TELEGRAM_DEDUPED
+
 # Your Telegram credentials
-TELEGRAM_BOT_TOKEN = "7991128246:AAGEY31YvCbSfOcRuCAFfKEbv-N6lB6Fpd8"
-TELEGRAM_CHAT_ID = "1766205546"
+TELEGRAM_BOT_TOKEN = os.environ.get("TELEGRAM_BOT_TOKEN", "7991128246:AAGEY31YvCbSfOcRuCAFfKEbv-N6lB6Fpd8")
+TELEGRAM_CHAT_ID = os.environ.get("TELEGRAM_CHAT_ID", "1766205546")
 
-# FIXED: Correct bot initialization (YOU HAD CHAT ID HERE BY MISTAKE)
-bot = telegram.Bot(token=TELEGRAM_BOT_TOKEN)
+MAX_TEXT = 4096       # Bot API limit for a message
+MAX_CAPTION = 1024    # ... and for a photo caption
 
 
-async def _send_async(msg, frame=None):
-    """Async internal execution"""
-    await bot.send_message(
-        chat_id=TELEGRAM_CHAT_ID,
-        text=msg,
-        parse_mode="Markdown"
-    )
+# ==================================================================================
+#                                   TRANSPORTS
+# ==================================================================================
+class TelegramAPIError(Exception):
+    def __init__(self, status: int, description: str, retry_after: Optional[float] = None):
+        super().__init__(f"{status}: {description}")
+        self.status = status
+        self.description = description
+        self.retry_after = retry_after
 
-    # Send photo if frame exists
-    if frame is not None:
-        ok, buffer = cv2.imencode(".jpg", frame)
-        if ok:
-            await bot.send_photo(
-                chat_id=TELEGRAM_CHAT_ID,
-                photo=buffer.tobytes()
+
+class HttpTransport:
+    """
+    Bot API over one pooled httpx.AsyncClient (keep-alive connections reused
+    for every message). `base_url` can point at a local stand-in such as
+    utils/telegram_fake.py instead of api.telegram.org.
+    """
+
+    def __init__(self, token: str, base_url: str = "https://api.telegram.org",
+                 timeout: float = 15.0, pool_size: int = 4):
+        self.url = f"{base_url.rstrip('/')}/bot{token}"
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self._client = None
+
+    async def call(self, method: str, data: dict, files: Optional[dict] = None) -> dict:
+        if self._client is None:
+            import httpx   # ships with python-telegram-bot
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size),
             )
+        if files:
+            resp = await self._client.post(f"{self.url}/{method}", data=data, files=files)
+        else:
+            resp = await self._client.post(f"{self.url}/{method}", json=data)
+        try:
+            body = resp.json()
+        except ValueError:
+            body = {"ok": False, "description": resp.text[:200]}
+        if not body.get("ok"):
+            retry_after = (body.get("parameters") or {}).get("retry_after")
+            raise TelegramAPIError(resp.status_code, body.get("description", "unknown error"), retry_after)
+        return body.get("result", {})
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+class RecordingTransport:
+    """In-memory transport for tests and load runs: records every call, optional fake latency."""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.calls: List[tuple] = []
+
+    async def call(self, method: str, data: dict, files: Optional[dict] = None) -> dict:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        self.calls.append((method, dict(data), {k: len(v[1]) for k, v in (files or {}).items()}))
+        return {"message_id": len(self.calls)}
+
+    async def close(self):
+        pass
+
+
+# ==================================================================================
+#                                   NOTIFIER
+# ==================================================================================
+class TokenBucket:
+    """`rate` tokens per second, at most `burst` saved up; a rate of 0 (or less) means no limit."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = float(rate)
+        self.capacity = max(1, int(burst))
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        if self.rate <= 0:
+            return
+        while True:
+            self._refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class _Note(NamedTuple):
+    text: str
+    photo: Optional[bytes]
+    parse_mode: Optional[str]
+    queued: float
+
+
+class TelegramNotifier:
+    """
+    Long-lived Telegram sender: one background thread runs one event loop and
+    one pooled transport for the whole process.
+
+    Every API call takes a token from a TokenBucket so we stay under the Bot
+    API limits. Whatever piles up while waiting for a token goes out as a single
+    digest (all texts, the newest photo) instead of a message per alert, and a
+    message whose dedupe key was already sent within `dedupe_window` seconds is
+    dropped. send() only enqueues; it is safe from any thread.
+    """
+
+    def __init__(self, transport, chat_id: str, rate: float = 1.0, burst: int = 5,
+                 dedupe_window: float = 10.0, max_pending: int = 200):
+        self.transport = transport
+        self.chat_id = chat_id
+        self.bucket = TokenBucket(rate, burst)
+        self.dedupe_window = dedupe_window
+        self.max_pending = max_pending
+
+        self._lock = threading.Lock()
+        self._recent: Dict[str, float] = {}
+        self._pending: "deque[_Note]" = deque()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._thread: Optional[threading.Thread] = None
+        self._ready = threading.Event()
+        self._stopping = False
+        self.stats = {"queued": 0, "sent": 0, "digests": 0, "deduped": 0, "failed": 0, "api_calls": 0}
 
+    # ---------------- lifecycle ----------------
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run_loop, name="telegram", daemon=True)
+            self._thread.start()
+            self._ready.wait(5)
+        return self
 
-def send_telegram_alert(msg: str, frame=None):
-    """Main function used by DB Utils"""
+    def _run_loop(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._wakeup = asyncio.Event()
+        self._ready.set()
+        try:
+            self._loop.run_until_complete(self._sender())
+        finally:
+            self._loop.run_until_complete(self.transport.close())
+            self._loop.close()
+
+    def stop(self, timeout: float = 10.0):
+        """Flush what is queued (within `timeout`) and shut the loop down."""
+        if self._thread is None:
+            return
+        self._stopping = True
+        self._loop.call_soon_threadsafe(self._wakeup.set)
+        self._thread.join(timeout)
+        self._thread = None
+
+    # ---------------- producer side ----------------
+    def send(self, text: str, frame=None, key: Optional[str] = None, parse_mode: Optional[str] = "Markdown") -> bool:
+        """Queue a message (and snapshot: a frame or JPEG bytes). False if it was a duplicate or the backlog is full."""
+        now = time.time()
+        key = key or text
+        with self._lock:
+            if now - self._recent.get(key, 0.0) < self.dedupe_window:
+                self.stats["deduped"] += 1
+                TELEGRAM_DEDUPED.inc()
+                return False
+            self._recent[key] = now
+            if len(self._recent) > 1000:
+                self._recent = {k: t for k, t in self._recent.items() if now - t < self.dedupe_window}
+
+        photo = None
+        if isinstance(frame, (bytes, bytearray)):
+            photo = bytes(frame)   # already a JPEG (the stored evidence snapshot)
+        elif frame is not None:
+            ok, buffer = cv2.imencode(".jpg", frame)
+            photo = buffer.tobytes() if ok else None
+
+        with self._lock:
+            if len(self._pending) >= self.max_pending:
+                self._pending.popleft()
+                self.stats["failed"] += 1
+                TELEGRAM_ERRORS.inc()
+                print("[TELEGRAM] Backlog full, oldest message dropped")
+            self._pending.append(_Note(text, photo, parse_mode, now))
+            self.stats["queued"] += 1
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+        return True
+
+    # ---------------- event loop side ----------------
+    def _take_pending(self) -> List[_Note]:
+        with self._lock:
+            notes = list(self._pending)
+            self._pending.clear()
+        return notes
+
+    async def _sender(self):
+        while True:
+            if not self._pending:
+                if self._stopping:
+                    return
+                await self._wakeup.wait()
+                self._wakeup.clear()
+                continue
+
+            # wait for the rate limiter; everything queued meanwhile joins this delivery
+            await self.bucket.acquire()
+            notes = self._take_pending()
+            if not notes:
+                continue
+            if len(notes) == 1:
+                await self._deliver(notes[0].text, notes[0].photo, notes[0].parse_mode)
+            else:
+                await self._deliver_digest(notes)
+
+    async def _deliver_digest(self, notes: List[_Note]):
+        self.stats["digests"] += 1
+        TELEGRAM_COALESCED.inc(len(notes) - 1)
+        header = f"🚨 {len(notes)} alerts in {max(1, round(notes[-1].queued - notes[0].queued))}s"
+        text = header + "\n\n" + "\n\n".join(n.text.strip() for n in notes)
+        if len(text) > MAX_TEXT:
+            text = text[:MAX_TEXT - 20].rsplit("\n", 1)[0] + "\n… (truncated)"
+        modes = {n.parse_mode for n in notes}
+        photo = next((n.photo for n in reversed(notes) if n.photo), None)
+        await self._deliver(text, photo, modes.pop() if len(modes) == 1 else None, count=len(notes))
+
+    async def _deliver(self, text: str, photo: Optional[bytes], parse_mode: Optional[str], count: int = 1):
+        # one call when the text fits in a caption, otherwise message then photo
+        if photo is not None and len(text) <= MAX_CAPTION:
+            ok = await self._call("sendPhoto", {"caption": text}, parse_mode, photo)
+        else:
+            ok = await self._call("sendMessage", {"text": text}, parse_mode)
+            if ok and photo is not None:
+                await self.bucket.acquire()
+                await self._call("sendPhoto", {}, None, photo)
+        if ok:
+            self.stats["sent"] += count
+            print(f"[TELEGRAM] Notification sent successfully ({count} alert(s)).")
+
+    async def _call(self, method: str, data: dict, parse_mode: Optional[str], photo: Optional[bytes] = None,
+                    attempts: int = 3) -> bool:
+        data = {"chat_id": self.chat_id, **data}
+        if parse_mode:
+            data["parse_mode"] = parse_mode
+        files = {"photo": ("alert.jpg", photo, "image/jpeg")} if photo is not None else None
+
+        for attempt in range(attempts):
+            started = time.perf_counter()
+            try:
+                self.stats["api_calls"] += 1
+                await self.transport.call(method, data, files)
+                TELEGRAM_SEND_TIME.observe(time.perf_counter() - started)
+                return True
+            except TelegramAPIError as e:
+                if e.retry_after:                       # 429: told exactly how long to back off
+                    await asyncio.sleep(e.retry_after)
+                    continue
+                if e.status == 400 and "parse" in e.description.lower() and "parse_mode" in data:
+                    data.pop("parse_mode")              # stray Markdown character: resend as plain text
+                    continue
+                print(f"[TELEGRAM ERROR] {method}: {e}")
+                break
+            except Exception as e:
+                print(f"[TELEGRAM ERROR] {method}: {e}")
+                await asyncio.sleep(min(5.0, 0.5 * 2 ** attempt))
+        self.stats["failed"] += 1
+        TELEGRAM_ERRORS.inc()
+        return False
+
+
+# ==================================================================================
+#                                  MODULE API
+# ==================================================================================
+_lock = threading.Lock()
+notifier: Optional[TelegramNotifier] = None
+
+
+def get_notifier() -> TelegramNotifier:
+    """The process-wide notifier, created on first use from the TELEGRAM_* settings."""
+    global notifier
+    with _lock:
+        if notifier is None:
+            notifier = TelegramNotifier(
+                HttpTransport(TELEGRAM_BOT_TOKEN, base_url=state.TELEGRAM_API_URL),
+                TELEGRAM_CHAT_ID,
+                rate=state.TELEGRAM_RATE,
+                burst=state.TELEGRAM_BURST,
+                dedupe_window=state.TELEGRAM_DEDUPE_WINDOW,
+            ).start()
+        return notifier
+
+
+def _flush_on_exit():
+    # registered at import, i.e. before the alert dispatcher's hook, so it runs after the dispatcher drained
+    if notifier is not None:
+        notifier.stop()
+
+
+atexit.register(_flush_on_exit)
+
+
+def send_telegram_alert(msg: str, frame=None, key: Optional[str] = None):
+    """Main function used by the alert dispatcher and DB utils: queue the message, never block on the network."""
     try:
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        loop.run_until_complete(_send_async(msg, frame))
-        loop.close()
-        print("[TELEGRAM] Notification sent successfully.")
+        get_notifier().send(msg, frame, key=key)
     except Exception as e:
         print(f"[TELEGRAM ERROR] {e}")
-
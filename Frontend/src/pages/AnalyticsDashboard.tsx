@@ -54,6 +54,7 @@ type AlertRow = {
   location?: string;
   violence_detected?: boolean;
   people_count?: number;
+  evidence?: { path: string; thumb: string } | null;
 };
 
 type HeatRow = {
@@ -94,22 +95,9 @@ const AnalyticsDashboard: React.FC = () => {
 
   const fetchAlerts = useCallback(async () => {
     try {
+      // weapon rows under 50% confidence are filtered by the server
       const res = await fetch("http://127.0.0.1:5000/alerts/recent?limit=50");
-      let data = await res.json();
-
-      // filter weapon < 50% confidence
-      data = data.filter((d: AlertRow) => {
-        const isWeapon = d.type?.some((t) =>
-          t.toLowerCase().includes("weapon")
-        );
-        if (isWeapon) {
-          if (!d.confidence) return false;
-          return d.confidence >= 0.5;
-        }
-        return true;
-      });
-
-      setRecentAlerts(data);
+      setRecentAlerts(await res.json());
     } catch (_) {}
   }, []);
 
@@ -160,14 +148,24 @@ const AnalyticsDashboard: React.FC = () => {
   useEffect(() => {
     const iv1 = setInterval(fetchSummary, 30000);
     const iv2 = setInterval(fetchTrends, 60000);
-    const iv3 = setInterval(fetchAlerts, 10000);
     return () => {
       clearInterval(iv1);
       clearInterval(iv2);
-      clearInterval(iv3);
     };
   }, []);
 
+  // ================= LIVE ALERTS (/events) =================
+  useEffect(() => {
+    const events = new EventSource("http://127.0.0.1:5000/events");
+    events.addEventListener("alert", (e) => {
+      const alert = JSON.parse((e as MessageEvent).data) as AlertRow;
+      setRecentAlerts((prev) => [alert, ...prev].slice(0, 50));
+    });
+    // missed more than the server keeps: reload the list
+    events.addEventListener("reset", () => fetchAlerts());
+    return () => events.close();
+  }, [fetchAlerts]);
+
   // ================= VOICE (HINGLISH) =================
   const speakHinglish = (text: string) => {
     if (!text) return;
@@ -452,6 +450,7 @@ const AnalyticsDashboard: React.FC = () => {
           <table className="w-full text-sm">
             <thead className="text-slate-300 text-left">
               <tr>
+                <th className="pb-2">Snapshot</th>
                 <th className="pb-2">Type</th>
                 <th className="pb-2">Sub-Type / Person</th>
                 <th className="pb-2">Conf.</th>
@@ -469,6 +468,24 @@ const AnalyticsDashboard: React.FC = () => {
                   key={a._id}
                   className="border-t border-slate-800/60 hover:bg-slate-800/40"
                 >
+                  <td className="py-1">
+                    {a.evidence ? (
+                      <a
+                        href={`http://127.0.0.1:5000/evidence/${a.evidence.path}`}
+                        target="_blank"
+                        rel="noreferrer"
+                      >
+                        <img
+                          src={`http://127.0.0.1:5000/evidence/${a.evidence.thumb}`}
+                          alt="alert snapshot"
+                          loading="lazy"
+                          className="h-10 w-16 object-cover rounded"
+                        />
+                      </a>
+                    ) : (
+                      "—"
+                    )}
+                  </td>
                   <td>{a.type?.join(", ")}</td>
                   <td>{a.sub_type || a.person_name || "—"}</td>
                   <td>
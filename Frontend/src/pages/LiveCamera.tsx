@@ -79,75 +79,115 @@ const LiveCamera = () => {
   };
 
   // ==================================================================================
-  // FETCH STATUS FROM BACKEND
+  // STATUS FROM BACKEND
   // ==================================================================================
+  // Status is pushed over /events; the latest one is kept in a ref
+  const latestStatus = useRef<any>(null);
+  const primaryCamera = useRef<string | null>(null);
+  const streamUp = useRef(false);
+
+  const applyStatus = (data: any) => {
+    setIsBackendConnected(true);
+    setIsSystemBooted(data.system_active ?? false);
+
+    // -------- CROWD COUNT --------
+    const matchCrowd = (data.crowd_count ?? "").match(/\d+/);
+    const crowd = matchCrowd ? parseInt(matchCrowd[0], 10) : 0;
+    setPeopleCount(crowd);
+
+    // =====================================================
+    // WEAPON DETECTION WITH CONFIDENCE FILTER (≥ 0.60)
+    // =====================================================
+    let rawWeaponString = data.weapon_status ? data.weapon_status : "Safe";
+    let extractedConf = 0;
+
+    // Extract confidence from string like "Knife detected (0.62)"
+    const wm = rawWeaponString.match(/\((.*?)\)/);
+    if (wm) extractedConf = parseFloat(wm[1]);
+
+    // Only show weapon threat if confidence >= 0.60
+    if (extractedConf >= 0.60) {
+      setWeaponStatus(rawWeaponString);
+      setLastHighWeaponTime(Date.now()); // Remember when we saw high-confidence weapon
+    } else {
+      setWeaponStatus("Safe");
+    }
+
+    // -------- CRIMINAL DETECTION --------
+    setCriminalStatus(data.violence_status ?? "Safe");
+
+    // =====================================================
+    // THREAT LEVEL CALCULATION
+    // =====================================================
+    // Check if we recently saw a high-confidence weapon (within last 1.5 seconds)
+    const weaponThreat = Date.now() - lastHighWeaponTime < 1500;
+
+    // Check if criminal activity detected
+    const criminalThreat =
+      (data.violence_status ?? "").toUpperCase().includes("CRIMINAL") ||
+      (data.violence_status ?? "").toUpperCase().includes("ALERT");
+
+    // Set threat level based on all conditions
+    if (weaponThreat || criminalThreat) {
+      setThreatLevel("danger");
+    } else if (crowd > 35) {
+      setThreatLevel("warning");
+    } else {
+      setThreatLevel("safe");
+    }
+  };
+
   const fetchStatus = async () => {
     try {
       const res = await fetch("http://127.0.0.1:5000/get_status");
       if (!res.ok) throw new Error();
       const data = await res.json();
-
-      setIsBackendConnected(true);
-      setIsSystemBooted(data.system_active ?? false);
-
-      // -------- CROWD COUNT --------
-      const matchCrowd = (data.crowd_count ?? "").match(/\d+/);
-      const crowd = matchCrowd ? parseInt(matchCrowd[0], 10) : 0;
-      setPeopleCount(crowd);
-
-      // =====================================================
-      // WEAPON DETECTION WITH CONFIDENCE FILTER (≥ 0.60)
-      // =====================================================
-      let rawWeaponString = data.weapon_status ? data.weapon_status : "Safe";
-      let extractedConf = 0;
-
-      // Extract confidence from string like "Knife detected (0.62)"
-      const wm = rawWeaponString.match(/\((.*?)\)/);
-      if (wm) extractedConf = parseFloat(wm[1]);
-
-      // Only show weapon threat if confidence >= 0.60
-      if (extractedConf >= 0.60) {
-        setWeaponStatus(rawWeaponString);
-        setLastHighWeaponTime(Date.now()); // Remember when we saw high-confidence weapon
-      } else {
-        setWeaponStatus("Safe");
-      }
-
-      // -------- CRIMINAL DETECTION --------
-      setCriminalStatus(data.violence_status ?? "Safe");
-
-      // =====================================================
-      // THREAT LEVEL CALCULATION
-      // =====================================================
-      // Check if we recently saw a high-confidence weapon (within last 1.5 seconds)
-      const weaponThreat = Date.now() - lastHighWeaponTime < 1500;
-
-      // Check if criminal activity detected
-      const criminalThreat =
-        (data.violence_status ?? "").toUpperCase().includes("CRIMINAL") ||
-        (data.violence_status ?? "").toUpperCase().includes("ALERT");
-
-      // Set threat level based on all conditions
-      if (weaponThreat || criminalThreat) {
-        setThreatLevel("danger");
-      } else if (crowd > 35) {
-        setThreatLevel("warning");
-      } else {
-        setThreatLevel("safe");
-      }
+      primaryCamera.current = data.camera ?? primaryCamera.current;
+      latestStatus.current = data;
+      applyStatus(data);
     } catch {
       setIsBackendConnected(false);
       setIsSystemBooted(false);
     }
   };
 
-  // Poll backend every 1 second
+  const applyStatusRef = useRef(applyStatus);
+  applyStatusRef.current = applyStatus;
+
+  // Every second: re-evaluate the threat timers locally, or poll while the event stream is down
   useEffect(() => {
-    fetchStatus();
-    const timer = setInterval(fetchStatus, 1000);
+    const timer = setInterval(() => {
+      if (streamUp.current && latestStatus.current) applyStatus(latestStatus.current);
+      else fetchStatus();
+    }, 1000);
     return () => clearInterval(timer);
   }, [lastHighWeaponTime]); // Re-run when weapon time changes
 
+  // Live updates (Server-Sent Events): status changes arrive the moment they happen
+  useEffect(() => {
+    fetchStatus();
+    const events = new EventSource("http://127.0.0.1:5000/events");
+    events.onopen = () => {
+      streamUp.current = true;
+    };
+    events.onerror = () => {
+      streamUp.current = false; // the browser reconnects by itself; poll meanwhile
+    };
+    events.addEventListener("system", (e) => {
+      const data = JSON.parse((e as MessageEvent).data);
+      primaryCamera.current = data.cameras?.[0] ?? null;
+      latestStatus.current = { ...(latestStatus.current ?? {}), system_active: data.system_active };
+      setIsSystemBooted(data.system_active);
+    });
+    events.addEventListener("status", (e) => {
+      const data = JSON.parse((e as MessageEvent).data);
+      if (primaryCamera.current && data.camera !== primaryCamera.current) return;
+      latestStatus.current = { ...data, system_active: true };
+      applyStatusRef.current(latestStatus.current);
+    });
+    return () => events.close();
+  }, []);
+
   // ==================================================================================
   // ALARM SYSTEM - Rings when ANY threat is detected
   // ==================================================================================